@@ -12,6 +12,9 @@ from .config import Config
 from .dependencies.db import lifespan_factory as db_lifespan_factory
 from .dependencies.debug_flag import lifespan_factory as debug_flag_lifespan_factory
 from .dependencies.http_client import lifespan as http_client_lifespan
+from .dependencies.pending_activities import lifespan as pending_activities_lifespan
+from .dependencies.region_catalog import lifespan as region_catalog_lifespan
+from .dependencies.response_cache import lifespan as response_cache_lifespan
 from .dependencies.strava import lifespan_factory as strava_lifespan_factory
 from .routers import activities_router, athletes_router, auth_router, health_router, regions_router, user_router
 
@@ -20,8 +23,11 @@ def app_factory(config: Config, debug: bool = False) -> fastapi.FastAPI:
     mp, tp, lg = prepare_utils(config.otel)
     lifespans = [
         config_lifespan_factory(config),
-        db_lifespan_factory(config.db),
+        db_lifespan_factory(config.db, mp),
         broker_lifespan_factory(mp, tp, lg, config.nats),
+        region_catalog_lifespan,
+        pending_activities_lifespan,
+        response_cache_lifespan,
         http_client_lifespan,
         strava_lifespan_factory(config.strava),
         debug_flag_lifespan_factory(debug),
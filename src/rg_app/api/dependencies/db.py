@@ -3,17 +3,19 @@ from typing import Annotated
 
 import sqlalchemy.ext.asyncio as sa_async
 from fastapi import Depends, FastAPI, Request
+from opentelemetry.metrics import MeterProvider
 
 from rg_app.common.config import BaseDbConfig
+from rg_app.common.otel.db_pool import create_instrumented_engine
 
 _ENGINE_KEY = "SQLALCHEMY_ENGINE"
 _SESSIONMAKER_KEY = "SQLALCHEMY_SESSIONMAKER"
 
 
-def lifespan_factory(config_db: BaseDbConfig):
+def lifespan_factory(config_db: BaseDbConfig, meter_provider: MeterProvider):
     @asynccontextmanager
     async def lifespan(app: FastAPI):
-        engine = sa_async.create_async_engine(config_db.get_url())
+        engine = create_instrumented_engine(config_db, meter_provider, "api")
         sessionmaker = sa_async.async_sessionmaker(bind=engine)
         setattr(app.state, _ENGINE_KEY, engine)
         setattr(app.state, _SESSIONMAKER_KEY, sessionmaker)
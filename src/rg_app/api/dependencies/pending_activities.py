@@ -0,0 +1,94 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Annotated, cast
+
+from fastapi import Depends, FastAPI, Request
+from nats.aio.client import Client as NatsClient
+from nats.js.api import ConsumerConfig, DeliverPolicy
+
+from rg_app.nats_defs.local import CONSUMER_ACTIVITY_CMD_STD, STREAM_ACTIVITY_CMD
+
+_PENDING_ACTIVITIES_KEY = "PENDING_ACTIVITIES"
+
+# the frontend polls during imports, counts this old are good enough
+_TTL = 5.0
+
+
+class _PendingActivities:
+    """
+    Number of activity commands of a user not processed yet.
+    Counting needs a temporary JetStream consumer, so results are cached for a few seconds
+    and concurrent requests for the same user share a single count.
+    """
+
+    def __init__(self, ttl: float = _TTL):
+        self.ttl = ttl
+        self._cache: dict[int, tuple[float, int]] = {}
+        self._inflight: dict[int, asyncio.Task[int]] = {}
+
+    async def get(self, nats_client: NatsClient, user_id: int) -> int:
+        cached = self._cache.get(user_id)
+        if cached is not None and cached[0] > time.monotonic():
+            return cached[1]
+        task = self._inflight.get(user_id)
+        if task is None:
+            task = asyncio.create_task(self._count(nats_client, user_id))
+            self._inflight[user_id] = task
+            task.add_done_callback(lambda done: self._finished(user_id, done))
+        return await asyncio.shield(task)
+
+    def invalidate(self, user_id: int):
+        """Forget the cached count, e.g. after publishing commands for the user."""
+        self._cache.pop(user_id, None)
+        self._inflight.pop(user_id, None)
+
+    def _finished(self, user_id: int, task: asyncio.Task[int]):
+        # counts started before invalidation are not cached
+        if self._inflight.get(user_id) is not task:
+            return
+        del self._inflight[user_id]
+        if task.cancelled() or task.exception() is not None:
+            return
+        now = time.monotonic()
+        if len(self._cache) > 1000:
+            self._cache = {key: entry for key, entry in self._cache.items() if entry[0] > now}
+        self._cache[user_id] = (now + self.ttl, task.result())
+
+    @staticmethod
+    async def _count(nats_client: NatsClient, user_id: int) -> int:
+        js = nats_client.jetstream()
+        stream_name = cast(str, STREAM_ACTIVITY_CMD.name)
+        consumer_og = await js.consumer_info(stream_name, cast(str, CONSUMER_ACTIVITY_CMD_STD.name))
+        # rg.internal.cmd.activity.{type}.{athlete_id}.{activity_id?}
+        consumer = await js.add_consumer(
+            stream=stream_name,
+            config=ConsumerConfig(
+                filter_subjects=[
+                    f"rg.internal.cmd.activity.*.{user_id}.*",
+                    f"rg.internal.cmd.activity.*.{user_id}",
+                ],
+                opt_start_seq=consumer_og.ack_floor.stream_seq + 1 if consumer_og.ack_floor else None,
+                deliver_policy=DeliverPolicy.BY_START_SEQUENCE,
+                mem_storage=True,
+                # removed by the server if deleting it below fails
+                inactive_threshold=30,
+            ),
+        )
+        try:
+            return consumer.num_pending or 0
+        finally:
+            await js.delete_consumer(stream_name, cast(str, consumer.name))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    setattr(app.state, _PENDING_ACTIVITIES_KEY, _PendingActivities())
+    yield
+
+
+def _provide_pending_activities(request: Request) -> _PendingActivities:
+    return getattr(request.app.state, _PENDING_ACTIVITIES_KEY)
+
+
+PendingActivities = Annotated[_PendingActivities, Depends(_provide_pending_activities)]
@@ -0,0 +1,49 @@
+from contextlib import asynccontextmanager
+from typing import Annotated
+
+import sqlalchemy.ext.asyncio as sa_async
+from fastapi import Depends, FastAPI, Request
+from nats.aio.msg import Msg
+
+from rg_app.common.fastapi.dependencies.broker import get_broker_from_app
+from rg_app.common.msg.regions import RegionsReloadMsg
+from rg_app.db.catalog import RegionCatalog as _RegionCatalog
+from rg_app.nats_defs.subjects import INTERNAL_REGIONS_RELOAD_SUBJECT
+
+from .db import get_engine_from_app
+
+_REGION_CATALOG_KEY = "REGION_CATALOG"
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Load the region catalog and reload it on request, requires DB and broker lifespans to be entered first.
+    """
+    engine = get_engine_from_app(app)
+    catalog = _RegionCatalog()
+    async with sa_async.AsyncSession(engine) as session:
+        await catalog.reload(session)
+    setattr(app.state, _REGION_CATALOG_KEY, catalog)
+
+    async def reload(msg: Msg):
+        body = RegionsReloadMsg.model_validate_json(msg.data or b"{}")
+        if body.version is not None and body.version == catalog.version:
+            return
+        async with sa_async.AsyncSession(engine) as session:
+            await catalog.reload(session)
+
+    nats_conn = get_broker_from_app(app)._connection
+    if nats_conn is None:
+        raise RuntimeError("Broker not started")
+    # no queue group, every API process keeps its own catalog
+    subscription = await nats_conn.subscribe(INTERNAL_REGIONS_RELOAD_SUBJECT, cb=reload)
+    yield
+    await subscription.unsubscribe()
+
+
+def _provide_region_catalog(request: Request) -> _RegionCatalog:
+    return getattr(request.app.state, _REGION_CATALOG_KEY)
+
+
+RegionCatalog = Annotated[_RegionCatalog, Depends(_provide_region_catalog)]
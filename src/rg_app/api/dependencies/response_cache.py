@@ -0,0 +1,71 @@
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Annotated, Any, Awaitable, Callable, Hashable
+
+from fastapi import Depends, FastAPI, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+_RESPONSE_CACHE_KEY = "RESPONSE_CACHE"
+
+_MAX_ENTRIES = 10_000
+
+# responses are per user, clients must revalidate them every time
+_CACHE_CONTROL = "private, no-cache"
+
+
+class _ResponseCache:
+    """
+    Serialized responses of versioned data, evicted least recently used first.
+    Clients sending the current version in If-None-Match get 304 without the response being produced.
+    """
+
+    def __init__(self, max_entries: int = _MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[Hashable, tuple[str, bytes]] = OrderedDict()
+
+    async def respond(
+        self, request: Request, key: Hashable, version: str, produce: Callable[[], Awaitable[Any]]
+    ) -> Response:
+        """
+        Respond with the data of `key` in `version`, calling `produce` only if it is not cached.
+        `version` must change whenever the produced data would, it is used as the ETag.
+        """
+        etag = f'W/"{version}"'
+        headers = {"ETag": etag, "Cache-Control": _CACHE_CONTROL}
+        if_none_match = _parse_if_none_match(request.headers.get("if-none-match"))
+        if etag in if_none_match or "*" in if_none_match:
+            return Response(status_code=304, headers=headers)
+
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == version:
+            self._entries.move_to_end(key)
+            body = entry[1]
+        else:
+            body = bytes(JSONResponse(jsonable_encoder(await produce())).body)
+            self._entries[key] = (version, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return Response(body, media_type="application/json", headers=headers)
+
+
+def _parse_if_none_match(value: str | None) -> set[str]:
+    if not value:
+        return set()
+    # weak comparison, W/ prefix does not matter
+    tags = {tag.strip() for tag in value.split(",")}
+    return tags | {f"W/{tag}" for tag in tags if not tag.startswith("W/")}
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    setattr(app.state, _RESPONSE_CACHE_KEY, _ResponseCache())
+    yield
+
+
+def _provide_response_cache(request: Request) -> _ResponseCache:
+    return getattr(request.app.state, _RESPONSE_CACHE_KEY)
+
+
+ResponseCache = Annotated[_ResponseCache, Depends(_provide_response_cache)]
@@ -5,14 +5,16 @@ from fastapi import Depends, FastAPI, Request
 
 from rg_app.common.config import BaseStravaConfig
 from rg_app.common.fastapi.dependencies.broker import get_broker_from_app
+from rg_app.common.strava import RateLimitBudget, RLNatsConfig
 from rg_app.common.strava import RateLimitManager as _RateLimitManager
-from rg_app.common.strava import RLNatsConfig
 from rg_app.common.strava import StravaTokenManager as _StravaTokenManager
 
 from .db import get_engine_from_app
 
 _STRAVA_TOKEN_MANAGER_KEY = "strava_token_manager"
 _RATE_LIMIT_MANAGER_KEY = "rate_limit_manager"
+# requests are made while a client waits for the response
+_MAX_RATE_LIMIT_WAIT = 5.0
 
 
 def lifespan_factory(config_strava: BaseStravaConfig):
@@ -23,7 +25,7 @@ def lifespan_factory(config_strava: BaseStravaConfig):
         conn = broker._connection
         assert conn is not None
         async with AsyncExitStack() as aes:
-            rlm = _RateLimitManager(RLNatsConfig(conn))
+            rlm = _RateLimitManager(RLNatsConfig(conn), RateLimitBudget(max_wait=_MAX_RATE_LIMIT_WAIT))
             rlm = await aes.enter_async_context(rlm.begin())
             setattr(app.state, _RATE_LIMIT_MANAGER_KEY, rlm)
 
@@ -8,6 +8,8 @@ from rg_app.api.common import user_check_last_trigger
 from rg_app.api.dependencies.auth import UserInfoRequired
 from rg_app.api.dependencies.db import AsyncSession
 from rg_app.api.dependencies.debug_flag import DebugFlag
+from rg_app.api.dependencies.pending_activities import PendingActivities
+from rg_app.common.backlog import split_period
 from rg_app.common.fastapi.dependencies.broker import NatsBroker
 from rg_app.common.msg.base_model import BaseModel
 from rg_app.common.msg.cmd import BacklogActivityCmd
@@ -17,6 +19,7 @@ from rg_app.nats_defs.local import STREAM_ACTIVITY_CMD
 router = fastapi.APIRouter(tags=["activities"], prefix="/activities")
 
 BACKLOG_TRIGGER_TIMEOUT = timedelta(days=14)
+_PERIOD_STEP = timedelta(days=30)
 
 
 class BacklogRequest(BaseModel):
@@ -36,10 +39,8 @@ async def backlog(
     broker: NatsBroker,
     session: AsyncSession,
     debug: DebugFlag,
+    pending: PendingActivities,
 ) -> Literal["OK"]:
-    period_from = backlog_request.period_from
-    period_to = period_from + timedelta(days=30)
-    should_continue = True
     awaitables = []
     user = await session.get(User, user_info.user_id)
     if user is None:
@@ -48,11 +49,12 @@ async def backlog(
         raise fastapi.HTTPException(status_code=400, detail="Backlog trigger not allowed")
     user.last_backlog_sync = datetime.now(UTC)
     await session.commit()
-    while should_continue:
+    # dense periods are split further while importing, see rg_app.common.backlog
+    for period_from, period_to in split_period(backlog_request.period_from, backlog_request.period_to, _PERIOD_STEP):
         msg = BacklogActivityCmd(
             owner_id=user_info.user_id,
             period_from=period_from,
-            period_to=min(period_to, backlog_request.period_to),
+            period_to=period_to,
             type="backlog",
         )
         awaitables.append(
@@ -60,11 +62,7 @@ async def backlog(
                 msg, f"rg.internal.cmd.activity.backlog.{user_info.user_id}", stream=STREAM_ACTIVITY_CMD.name
             )
         )
-        if period_to > backlog_request.period_to:
-            should_continue = False
-        else:
-            period_from = period_to
-            period_to += timedelta(days=30)
 
     await asyncio.gather(*awaitables)
+    pending.invalidate(user_info.user_id)
     return "OK"
@@ -11,11 +11,13 @@ from rg_app.api.dependencies.debug_flag import DebugFlag
 from rg_app.api.dependencies.http_client import AsyncClient
 from rg_app.api.dependencies.strava import RateLimitManager, StravaTokenManager
 from rg_app.api.models.auth import LoginErrorCause, LoginRequest, LoginResponse, LoginResponseError, StravaScopes
+from rg_app.common.backlog import split_period
 from rg_app.common.fastapi.dependencies.broker import NatsBroker
 from rg_app.common.msg.cmd import BacklogActivityCmd
 from rg_app.common.strava.activities import verify_activities_accessible
 from rg_app.common.strava.athletes import get_athlete
 from rg_app.common.strava.auth import StravaAuth
+from rg_app.common.strava.rate_limits import RateLimitDeferred
 from rg_app.db import User
 from rg_app.nats_defs.local import STREAM_ACTIVITY_CMD
 
@@ -41,27 +43,21 @@ async def _initialize_backlog_import(
     broker: NatsBroker,
 ):
     now = datetime.now(UTC)
-    period_from = user.strava_account_created_at
-    period_to = period_from + _PERIOD_STEP
-    should_continue = True
     awaitables = []
 
-    print(f"Backlog import for {user.id} from {period_from} to {now}")
+    print(f"Backlog import for {user.id} from {user.strava_account_created_at} to {now}")
 
-    while should_continue:
+    # dense periods are split further while importing, see rg_app.common.backlog
+    for period_from, period_to in split_period(user.strava_account_created_at, now, _PERIOD_STEP):
         msg = BacklogActivityCmd(
             owner_id=user.id,
             period_from=period_from,
-            period_to=min(period_to, now),
+            period_to=period_to,
             type="backlog",
         )
         awaitables.append(
             broker.publish(msg, f"rg.internal.cmd.activity.backlog.{user.id}", stream=STREAM_ACTIVITY_CMD.name)
         )
-        if period_to >= now:
-            break
-        period_from = period_to
-        period_to = period_from + _PERIOD_STEP
     await asyncio.gather(*awaitables)
 
 
@@ -109,13 +105,18 @@ async def login(
         user.name = atr.friendly_name()
     else:
         auth = StravaAuth(atr.access_token)
-        accessible = await verify_activities_accessible(async_client, auth, rlm)
+        try:
+            accessible = await verify_activities_accessible(async_client, auth, rlm)
 
-        if not accessible:
-            resp.status_code = 400
-            return LoginResponseError(cause=LoginErrorCause.INVALID_SCOPE)
+            if not accessible:
+                resp.status_code = 400
+                return LoginResponseError(cause=LoginErrorCause.INVALID_SCOPE)
+
+            athlete_raw = await get_athlete(async_client, auth, rlm)
+        except RateLimitDeferred:
+            resp.status_code = 503
+            return LoginResponseError(cause=LoginErrorCause.STRAVA_ERROR)
 
-        athlete_raw = await get_athlete(async_client, auth, rlm)
         user = User(
             id=atr.athlete.id,
             access_token=atr.access_token,
@@ -1,14 +1,14 @@
-import asyncio
 from datetime import datetime
 
 import fastapi
-from sqlalchemy import cast, func, select
-from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy import select
 
 from rg_app.api.dependencies.auth import UserInfoRequired
 from rg_app.api.dependencies.db import AsyncSession
+from rg_app.api.dependencies.region_catalog import RegionCatalog
+from rg_app.api.dependencies.response_cache import ResponseCache
 from rg_app.common.msg.base_model import BaseModel
-from rg_app.db import Activity, Region
+from rg_app.db import User, UserRegion
 
 router = fastapi.APIRouter(tags=["regions"], prefix="/regions")
 
@@ -24,80 +24,62 @@ class UnlockedRegionDetail(UnlockedRegion):
     visited_count: int
 
 
-@router.get("/unlocked")
-async def unlocked(session: AsyncSession, user_info: UserInfoRequired) -> list[UnlockedRegion]:
+async def _data_version(session: AsyncSession, user_id: int) -> int:
+    result = await session.execute(select(User.data_version).where(User.id == user_id))
+    return result.scalar_one()
+
+
+@router.get("/unlocked", response_model=list[UnlockedRegion])
+async def unlocked(
+    request: fastapi.Request, session: AsyncSession, cache: ResponseCache, user_info: UserInfoRequired
+) -> fastapi.Response:
     """
     Get all the regions that the user has unlocked
     """
 
-    element = func.jsonb_array_elements(Activity.visited_regions).alias("element")
+    user_id = user_info.user_id
 
-    query = (
-        select(
-            element.column.label("element"),
+    async def produce() -> list[UnlockedRegion]:
+        query = select(UserRegion.region_id).where(
+            UserRegion.user_id == user_id,
+            UserRegion.additional.is_(False),
         )
-        .select_from(Activity, element)
-        .where(Activity.user_id == user_info.user_id)
-        .group_by(element.column)
-    )
-
-    result = await session.execute(query)
-    return [UnlockedRegion(region_id=row.element) for row in result]
-
-
-@router.get("/unlocked/{region_id}")
-async def unlocked_detail(region_id: str, session: AsyncSession, user_info: UserInfoRequired) -> UnlockedRegionDetail:
+        result = await session.execute(query)
+        return [UnlockedRegion(region_id=region_id) for region_id in result.scalars()]
+
+    version = f"{user_id}-{await _data_version(session, user_id)}"
+    return await cache.respond(request, ("unlocked", user_id), version, produce)
+
+
+@router.get("/unlocked/{region_id}", response_model=UnlockedRegionDetail)
+async def unlocked_detail(
+    request: fastapi.Request,
+    region_id: str,
+    session: AsyncSession,
+    catalog: RegionCatalog,
+    cache: ResponseCache,
+    user_info: UserInfoRequired,
+) -> fastapi.Response:
     """
     Get the details of a specific region that the user has unlocked
     """
 
-    query_region_exists = select(Region.id, Region.type).where(Region.id == region_id)
-
-    result_region_exists = (await session.execute(query_region_exists)).one_or_none()
-    if result_region_exists is None:
+    if region_id not in catalog:
         raise fastapi.HTTPException(status_code=404, detail="Region not found")
-    else:
-        region_type = result_region_exists.type
-
-    if region_type == "GMI":
-        cont_where_clause = Activity.visited_regions.contains(cast(region_id, JSONB))
-    else:
-        cont_where_clause = Activity.visited_regions_additional.contains(cast(region_id, JSONB))
-
-    query_stats = select(
-        func.min(Activity.start).label("first_visited"),
-        func.max(Activity.start).label("last_visited"),
-        func.count(Activity.id).label("visited_count"),
-    ).where(
-        Activity.user_id == user_info.user_id,
-        cont_where_clause,
-    )
-
-    query_last_activity_id = (
-        select(Activity.id)
-        .where(
-            Activity.user_id == user_info.user_id,
-            cont_where_clause,
-        )
-        .order_by(Activity.start.desc())
-        .limit(1)
-    )
-    aw_stats = session.execute(query_stats)
-    aw_last_activity_id = session.execute(query_last_activity_id)
 
-    result_stats, result_last_activity_id = await asyncio.gather(aw_stats, aw_last_activity_id)
+    user_id = user_info.user_id
 
-    row_stats = result_stats.fetchone()
-    scalar_last_activity_id = result_last_activity_id.scalar_one_or_none()
-
-    if row_stats is None or row_stats.first_visited is None:
-        return UnlockedRegionDetail(region_id=region_id, visited_count=0)
-    else:
-        la_id = str(scalar_last_activity_id) if scalar_last_activity_id is not None else None
+    async def produce() -> UnlockedRegionDetail:
+        user_region = await session.get(UserRegion, (user_id, region_id))
+        if user_region is None:
+            return UnlockedRegionDetail(region_id=region_id, visited_count=0)
         return UnlockedRegionDetail(
             region_id=region_id,
-            last_visited=row_stats.last_visited,
-            first_visited=row_stats.first_visited,
-            visited_count=row_stats.visited_count,
-            last_activity_id=la_id,
+            last_visited=user_region.last_visited,
+            first_visited=user_region.first_visited,
+            visited_count=user_region.visit_count,
+            last_activity_id=str(user_region.last_activity_id),
         )
+
+    version = f"{user_id}-{await _data_version(session, user_id)}"
+    return await cache.respond(request, ("unlocked_detail", user_id, region_id), version, produce)
@@ -0,0 +1,53 @@
+"""
+Windows of backlog imports.
+History of a user is imported by backlog commands, each covering a period (window) of it.
+Windows are refined while importing: when a period does not fit in one page of Strava activities,
+the rest of it is split into windows sized from the activity density of the first page.
+"""
+
+import math
+from datetime import datetime, timedelta
+
+from rg_app.common.strava.helpers import MAX_PAGE_SIZE
+
+# windows shorter than this are paged through instead of being split further
+MIN_WINDOW = timedelta(days=1)
+# at most this many windows per split, the last one is split again when processed if it is still too dense
+MAX_WINDOWS = 50
+# part of a page windows are sized for, leaves room for uneven density
+_PAGE_FILL = 0.8
+
+
+def split_period(period_from: datetime, period_to: datetime, step: timedelta) -> list[tuple[datetime, datetime]]:
+    """Split the period into consecutive windows of `step`, the last one may be shorter."""
+    windows = []
+    window_from = period_from
+    while window_from < period_to:
+        window_to = min(window_from + step, period_to)
+        windows.append((window_from, window_to))
+        window_from = window_to
+    return windows
+
+
+def adaptive_windows(
+    period_from: datetime,
+    cursor: datetime,
+    period_to: datetime,
+    observed: int,
+    page_size: int = MAX_PAGE_SIZE,
+) -> list[tuple[datetime, datetime]]:
+    """
+    Split the rest of a period, from `cursor` (up to which activities are imported) to `period_to`,
+    into windows expected to hold about one page of activities each,
+    given `observed` activities between `period_from` and `cursor`.
+    Returns no windows if the rest is shorter than MIN_WINDOW.
+    """
+    remaining = period_to - cursor
+    if remaining < MIN_WINDOW:
+        return []
+    elapsed = max((cursor - period_from).total_seconds(), 1.0)
+    density = max(observed, 1) / elapsed
+    window = max(timedelta(seconds=page_size * _PAGE_FILL / density), MIN_WINDOW)
+    count = min(math.ceil(remaining / window), MAX_WINDOWS)
+    bounds = [cursor + remaining * i / count for i in range(count)] + [period_to]
+    return list(zip(bounds[:-1], bounds[1:]))
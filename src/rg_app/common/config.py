@@ -1,5 +1,5 @@
 import os
-from typing import TypeVar
+from typing import Any, TypeVar
 
 from pydantic import SecretStr
 
@@ -80,10 +80,32 @@ class BaseDbConfig(BaseConfigModel):
     user: str
     password: SecretStr | SecretReference | EnvReference
     database: str
+    # connection pool, see SQLAlchemy create_engine
+    pool_size: int = 5
+    max_overflow: int = 10
+    pool_timeout: float = 30.0
+    pool_pre_ping: bool = False
+    pool_recycle: int = -1
+    # compiled statement cache of SQLAlchemy, per engine
+    query_cache_size: int = 500
+    # executions after which psycopg prepares statements server side, None disables it (e.g. behind pgbouncer)
+    prepare_threshold: int | None = 5
 
     def get_password(self) -> str | None:
         return unpack(self.password)
 
+    def get_engine_options(self) -> dict[str, Any]:
+        """Keyword arguments for SQLAlchemy create_engine/create_async_engine."""
+        return {
+            "pool_size": self.pool_size,
+            "max_overflow": self.max_overflow,
+            "pool_timeout": self.pool_timeout,
+            "pool_pre_ping": self.pool_pre_ping,
+            "pool_recycle": self.pool_recycle,
+            "query_cache_size": self.query_cache_size,
+            "connect_args": {"prepare_threshold": self.prepare_threshold},
+        }
+
     def get_url(self, scheme: str = "postgresql+psycopg") -> str:
         password = self.get_password()
         assert password, "Password is not set"
@@ -1,3 +1,4 @@
+import time
 from contextlib import AsyncExitStack, asynccontextmanager
 from typing import AsyncContextManager, Callable, ContextManager
 
@@ -7,15 +8,18 @@ import faststream
 def combined_lifespans_factory(
     *contexts: Callable[[faststream.ContextRepo], AsyncContextManager[None]]
     | Callable[[faststream.ContextRepo], ContextManager[None]],
+    on_enter: Callable[[str, float], None] | None = None,
 ) -> Callable[[faststream.ContextRepo], AsyncContextManager[None]]:
     """
     Create a combined lifespan context factory that combines multiple contexts into one!
+    If given, `on_enter` is called with module name of each context and seconds it took to enter it.
     """
 
     @asynccontextmanager
     async def combined_contexts(ctx_repo: faststream.ContextRepo):
         async with AsyncExitStack() as stack:
             for ctx in contexts:
+                started = time.monotonic()
                 context_invoked = ctx(ctx_repo)
                 if hasattr(context_invoked, "__aenter__"):
                     assert isinstance(context_invoked, AsyncContextManager)
@@ -25,6 +29,8 @@ def combined_lifespans_factory(
                     stack.enter_context(context_invoked)
                 else:
                     raise TypeError(f"Unsupported context type: {type(context_invoked)}")
+                if on_enter is not None:
+                    on_enter(ctx.__module__.rsplit(".", 1)[-1], time.monotonic() - started)
             yield
 
     return combined_contexts
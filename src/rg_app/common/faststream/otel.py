@@ -17,6 +17,7 @@ from rg_app.common.otel.config import BaseOtelConfig
 class OtelBundle:
     lifespan: Callable[[ContextRepo], AsyncContextManager[None]]
     middleware: NatsTelemetryMiddleware
+    meter_provider: MeterProvider
 
 
 def lifespan_factory(tracer_provider: TracerProvider, meter_provider: MeterProvider, otel_logger: Logger):
@@ -39,6 +40,7 @@ def direct_prepare_bundle(meter_prov: MeterProvider, tracer_prov: TracerProvider
     return OtelBundle(
         lifespan=lifespan_factory(tracer_provider=tracer_prov, meter_provider=meter_prov, otel_logger=logger),
         middleware=NatsTelemetryMiddleware(tracer_provider=tracer_prov, meter_provider=meter_prov),
+        meter_provider=meter_prov,
     )
 
 
@@ -0,0 +1,19 @@
+from .codec import decode_polyline
+from .duck_ext import bundle_extensions, connect
+from .duck_query import run_query, run_query_batch, run_query_hierarchical
+from .grid import BorderGrid
+from .index import BorderIndex, track_geometry
+from .store import GeometryStore
+
+__all__ = [
+    "BorderIndex",
+    "BorderGrid",
+    "GeometryStore",
+    "track_geometry",
+    "decode_polyline",
+    "connect",
+    "bundle_extensions",
+    "run_query",
+    "run_query_hierarchical",
+    "run_query_batch",
+]
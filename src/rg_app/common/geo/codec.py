@@ -0,0 +1,29 @@
+import numpy as np
+
+_EMPTY_COORDS = np.empty((0, 2), dtype=np.float64)
+
+
+def decode_polyline(data: str, precision: int = 5) -> np.ndarray:
+    """
+    Decode an encoded polyline into an (n, 2) array of (lng, lat) coordinates.
+    Same result as `polyline.decode(data, precision, geojson=True)`, but vectorized,
+    which matters for detailed tracks with tens of thousands of points.
+    """
+    if not data:
+        return _EMPTY_COORDS
+    chunks = np.frombuffer(data.encode("ascii"), dtype=np.uint8).astype(np.int64) - 63
+    if chunks.min() < 0 or chunks.max() > 63:
+        raise ValueError("Invalid polyline")
+    # every value is a run of 5 bit chunks, last chunk of a value has the continuation bit (0x20) unset
+    ends = (chunks & 0x20) == 0
+    if not ends[-1]:
+        raise ValueError("Invalid polyline, truncated value")
+    value_idx = np.concatenate(([0], np.cumsum(ends)[:-1]))
+    starts = np.flatnonzero(np.concatenate(([True], ends[:-1])))
+    shifts = 5 * (np.arange(len(chunks)) - starts[value_idx])
+    values = np.add.reduceat((chunks & 0x1F) << shifts, starts)
+    if len(values) % 2:
+        raise ValueError("Invalid polyline, odd number of values")
+    deltas = np.where(values & 1, ~(values >> 1), values >> 1)
+    lat_lng = np.cumsum(deltas.reshape(-1, 2), axis=0) / 10**precision
+    return lat_lng[:, ::-1].copy()
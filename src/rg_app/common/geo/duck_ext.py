@@ -0,0 +1,51 @@
+import os
+from typing import Sequence
+
+import duckdb
+
+ENV_EXTENSION_DIR = "RG_DUCKDB_EXTENSION_DIR"
+
+
+def connect(
+    database: str,
+    read_only: bool = False,
+    extensions: Sequence[str] = ("spatial",),
+    extension_dir: str | None = None,
+) -> duckdb.DuckDBPyConnection:
+    """
+    Connect to DuckDB and load extensions.
+    With an extension directory (argument or RG_DUCKDB_EXTENSION_DIR), prepared with bundle_extensions,
+    extensions are only loaded from it, without install checks, network access or autoloading.
+    Otherwise they are installed first, which may download them.
+    """
+    extension_dir = extension_dir or os.getenv(ENV_EXTENSION_DIR)
+    if extension_dir:
+        conn = duckdb.connect(
+            database,
+            read_only=read_only,
+            config={
+                "extension_directory": extension_dir,
+                "autoinstall_known_extensions": False,
+                "autoload_known_extensions": False,
+            },
+        )
+    else:
+        conn = duckdb.connect(database, read_only=read_only)
+    try:
+        for extension in extensions:
+            if not extension_dir:
+                conn.install_extension(extension)
+            conn.load_extension(extension)
+    except Exception:
+        conn.close()
+        raise
+    return conn
+
+
+def bundle_extensions(extension_dir: str, extensions: Sequence[str] = ("spatial",)) -> None:
+    """Install extensions into a local directory, for use with `connect` later on, and check they load."""
+    os.makedirs(extension_dir, exist_ok=True)
+    with duckdb.connect(":memory:", config={"extension_directory": extension_dir}) as conn:
+        for extension in extensions:
+            conn.install_extension(extension)
+    connect(":memory:", extensions=extensions, extension_dir=extension_dir).close()
@@ -0,0 +1,119 @@
+import duckdb
+
+
+def run_query(conn: duckdb.DuckDBPyConnection, wkb: bytes) -> list[tuple[str, str]]:
+    """Borders intersecting the track, given as WKB."""
+    return conn.execute(
+        """
+        WITH shp as (
+            SELECT ST_GeomFromWKB(?) as geom
+        )
+        SELECT borders.ID, borders.type
+        FROM borders
+        INNER JOIN shp ON ST_Intersects(shape, geom)
+        """,
+        [wkb],
+    ).fetchall()
+
+
+def run_query_hierarchical(conn: duckdb.DuckDBPyConnection, wkb: bytes) -> list[tuple[str, str]]:
+    """
+    Same as run_query, but each level is only matched against children of borders matched on the level above
+    (country -> voivodeships -> counties -> communes).
+    """
+    return conn.execute(
+        """
+        WITH shp as (
+            SELECT ST_GeomFromWKB(?) as geom
+        ),
+        pan as (
+            SELECT borders.ID, borders.type
+            FROM borders, shp
+            WHERE borders.parent_id IS NULL AND ST_Intersects(shape, geom)
+        ),
+        woj as (
+            SELECT borders.ID, borders.type
+            FROM borders, shp
+            WHERE borders.parent_id IN (SELECT ID FROM pan) AND ST_Intersects(shape, geom)
+        ),
+        pow as (
+            SELECT borders.ID, borders.type
+            FROM borders, shp
+            WHERE borders.parent_id IN (SELECT ID FROM woj) AND ST_Intersects(shape, geom)
+        ),
+        gmi as (
+            SELECT borders.ID, borders.type
+            FROM borders, shp
+            WHERE borders.parent_id IN (SELECT ID FROM pow) AND ST_Intersects(shape, geom)
+        )
+        SELECT * FROM pan
+        UNION ALL SELECT * FROM woj
+        UNION ALL SELECT * FROM pow
+        UNION ALL SELECT * FROM gmi
+        """,
+        [wkb],
+    ).fetchall()
+
+
+def run_query_batch(
+    conn: duckdb.DuckDBPyConnection, wkbs: list[bytes], hierarchical: bool = False
+) -> list[list[tuple[str, str]]]:
+    """
+    Match many tracks (as WKB) against borders in a single query.
+    Returns results in order of the given tracks.
+    """
+    if hierarchical:
+        query = """
+        WITH tracks as (
+            SELECT UNNEST(range(len($wkbs))) as idx, UNNEST($wkbs) as wkb
+        ),
+        shp as (
+            SELECT idx, ST_GeomFromWKB(wkb) as geom FROM tracks
+        ),
+        pan as (
+            SELECT shp.idx, borders.ID, borders.type
+            FROM borders, shp
+            WHERE borders.parent_id IS NULL AND ST_Intersects(shape, geom)
+        ),
+        woj as (
+            SELECT shp.idx, borders.ID, borders.type
+            FROM borders
+            INNER JOIN pan ON borders.parent_id = pan.ID
+            INNER JOIN shp ON shp.idx = pan.idx
+            WHERE ST_Intersects(shape, geom)
+        ),
+        pow as (
+            SELECT shp.idx, borders.ID, borders.type
+            FROM borders
+            INNER JOIN woj ON borders.parent_id = woj.ID
+            INNER JOIN shp ON shp.idx = woj.idx
+            WHERE ST_Intersects(shape, geom)
+        ),
+        gmi as (
+            SELECT shp.idx, borders.ID, borders.type
+            FROM borders
+            INNER JOIN pow ON borders.parent_id = pow.ID
+            INNER JOIN shp ON shp.idx = pow.idx
+            WHERE ST_Intersects(shape, geom)
+        )
+        SELECT * FROM pan
+        UNION ALL SELECT * FROM woj
+        UNION ALL SELECT * FROM pow
+        UNION ALL SELECT * FROM gmi
+        """
+    else:
+        query = """
+        WITH tracks as (
+            SELECT UNNEST(range(len($wkbs))) as idx, UNNEST($wkbs) as wkb
+        ),
+        shp as (
+            SELECT idx, ST_GeomFromWKB(wkb) as geom FROM tracks
+        )
+        SELECT shp.idx, borders.ID, borders.type
+        FROM borders
+        INNER JOIN shp ON ST_Intersects(shape, geom)
+        """
+    results: list[list[tuple[str, str]]] = [[] for _ in wkbs]
+    for idx, border_id, border_type in conn.execute(query, {"wkbs": wkbs}).fetchall():
+        results[idx].append((border_id, border_type))
+    return results
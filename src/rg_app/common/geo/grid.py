@@ -0,0 +1,116 @@
+from typing import TYPE_CHECKING, Self
+
+import numpy as np
+import shapely
+
+from .mmfile import read_arrays, write_arrays
+
+if TYPE_CHECKING:
+    from .index import BorderIndex
+
+_MAGIC = b"RGGRID01"
+
+# cell values other than leaf border positions
+BORDER = -1
+OUTSIDE = -2
+
+
+class BorderGrid:
+    """
+    Fixed resolution grid over leaf borders (communes).
+    Every cell holds position (in `ids`) of the leaf border containing the whole cell,
+    BORDER if the cell is crossed by a border line, or OUTSIDE if it touches no border at all.
+
+    Track segments whose bounding box only covers cells of one leaf border are resolved by lookup,
+    only the rest needs exact geometry tests.
+    """
+
+    def __init__(self, ids: list[str], origin: tuple[float, float], cell_size: float, cells: np.ndarray):
+        self.ids = ids
+        self.origin = np.asarray(origin, dtype=np.float64)
+        self.cell_size = cell_size
+        self.cells = cells
+
+    @classmethod
+    def build(cls, index: "BorderIndex", cell_size: float) -> Self:
+        leaves = index.leaves()
+        geometries = index.geometries[leaves]
+        shapely.prepare(geometries)
+        tree = shapely.STRtree(geometries)
+        min_x, min_y, max_x, max_y = shapely.total_bounds(geometries)
+        # one cell of margin, so that any point outside of the grid is surely outside of all borders
+        origin = (np.floor(min_x / cell_size) - 1) * cell_size, (np.floor(min_y / cell_size) - 1) * cell_size
+        cols = int(np.ceil((max_x - origin[0]) / cell_size)) + 1
+        rows = int(np.ceil((max_y - origin[1]) / cell_size)) + 1
+        cells = np.full((rows, cols), OUTSIDE, dtype=np.int32)
+        xs = origin[0] + np.arange(cols) * cell_size
+        for row in range(rows):
+            y = origin[1] + row * cell_size
+            boxes = shapely.box(xs, y, xs + cell_size, y + cell_size)
+            box_idx, leaf_idx = tree.query(boxes, predicate="intersects")
+            counts = np.bincount(box_idx, minlength=cols)
+            cells[row, counts > 0] = BORDER
+            single = counts[box_idx] == 1
+            box_idx, leaf_idx = box_idx[single], leaf_idx[single]
+            inside = shapely.contains_properly(geometries[leaf_idx], boxes[box_idx])
+            cells[row, box_idx[inside]] = leaf_idx[inside]
+        return cls([str(i) for i in index.ids[leaves]], origin, cell_size, cells)
+
+    def save(self, path: str) -> None:
+        meta = {"ids": self.ids, "origin": self.origin.tolist(), "cell_size": self.cell_size}
+        write_arrays(path, _MAGIC, meta, {"cells": self.cells})
+
+    @classmethod
+    def load(cls, path: str) -> Self:
+        meta, arrays = read_arrays(path, _MAGIC)
+        return cls(meta["ids"], tuple(meta["origin"]), meta["cell_size"], arrays["cells"])
+
+    def _lookup(self, cell_x: np.ndarray, cell_y: np.ndarray) -> np.ndarray:
+        rows, cols = self.cells.shape
+        valid = (cell_x >= 0) & (cell_x < cols) & (cell_y >= 0) & (cell_y < rows)
+        values = np.full(len(cell_x), OUTSIDE, dtype=np.int32)
+        values[valid] = self.cells[cell_y[valid], cell_x[valid]]
+        return values
+
+    def split(self, coords: np.ndarray) -> tuple[np.ndarray, shapely.Geometry | None]:
+        """
+        Split a track (coordinates of a point or a line) into leaf borders it surely intersects,
+        as positions in `ids`, and the remainder of the track that needs exact tests (None if there is none).
+        """
+        if len(coords) == 1:
+            start, end = coords, coords
+        else:
+            start, end = coords[:-1], coords[1:]
+        low = np.floor((np.minimum(start, end) - self.origin) / self.cell_size).astype(np.int64)
+        high = np.floor((np.maximum(start, end) - self.origin) / self.cell_size).astype(np.int64)
+        # segments spanning at most 2x2 cells are resolved by their corner cells
+        small = np.all(high - low <= 1, axis=1)
+        corners = np.stack(
+            [
+                self._lookup(low[:, 0], low[:, 1]),
+                self._lookup(high[:, 0], low[:, 1]),
+                self._lookup(low[:, 0], high[:, 1]),
+                self._lookup(high[:, 0], high[:, 1]),
+            ],
+            axis=1,
+        )
+        uniform = small & np.all(corners == corners[:, :1], axis=1)
+        resolved = uniform & (corners[:, 0] != BORDER)
+        leaves = np.unique(corners[resolved, 0])
+        leaves = leaves[leaves >= 0]
+
+        unresolved = np.flatnonzero(~resolved)
+        if len(unresolved) == 0:
+            return leaves, None
+        if len(coords) == 1:
+            return leaves, shapely.Point(coords[0])
+        # consecutive unresolved segments are joined back into lines
+        breaks = np.flatnonzero(np.diff(unresolved) != 1) + 1
+        run_starts = unresolved[np.concatenate(([0], breaks))]
+        run_ends = unresolved[np.concatenate((breaks - 1, [len(unresolved) - 1]))]
+        lengths = run_ends - run_starts + 2
+        offsets = np.cumsum(lengths) - lengths
+        point_idx = np.arange(lengths.sum()) - np.repeat(offsets - run_starts, lengths)
+        lines = np.asarray(shapely.linestrings(coords[point_idx], indices=np.repeat(np.arange(len(lengths)), lengths)))
+        remainder = lines[0] if len(lines) == 1 else shapely.MultiLineString(list(lines))
+        return leaves, remainder
@@ -0,0 +1,268 @@
+import threading
+from typing import TYPE_CHECKING, Self, Sequence
+
+import duckdb
+import numpy as np
+import shapely
+
+from .store import GeometryStore
+
+if TYPE_CHECKING:
+    from .grid import BorderGrid
+
+_EMPTY = np.empty(0, dtype=np.intp)
+_SLACK = 1.01
+
+
+def track_geometry(coordinates: Sequence[Sequence[float]] | np.ndarray) -> shapely.Geometry | None:
+    """
+    Build a geometry out of track coordinates (lng, lat).
+    Consecutive duplicate points (e.g. recorded while standing still) are dropped.
+    Single point tracks are returned as points, empty tracks as None.
+    """
+    if len(coordinates) == 0:
+        return None
+    coords = np.asarray(coordinates, dtype=np.float64)
+    coords = coords[np.concatenate(([True], np.any(coords[1:] != coords[:-1], axis=1)))]
+    if len(coords) == 1:
+        return shapely.Point(coords[0])
+    return shapely.LineString(coords)
+
+
+def simplify_tracks(tracks: np.ndarray, tolerance: float) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Simplify tracks with Douglas-Peucker.
+    Returns simplified tracks, every point of an original track lies within `tolerance` of its simplified track,
+    and vertices kept by the simplification (points of the original tracks) as multipoints.
+    """
+    simplified = shapely.simplify(tracks, tolerance, preserve_topology=False)
+    owners = np.repeat(np.arange(len(simplified)), shapely.get_num_coordinates(simplified))
+    vertices = shapely.multipoints(shapely.get_coordinates(simplified), indices=owners)
+    return np.asarray(simplified), np.asarray(vertices)
+
+
+class BorderIndex:
+    """
+    In-memory spatial index over the borders table of geo.db.
+
+    Candidates are preselected with an STRtree built over border bounding boxes,
+    exact intersection is tested only against those candidates.
+    With a grid attached, parts of tracks lying deep inside communes are resolved by grid lookup first.
+    Geometries are given up front, or materialized from a geometry store when a border first becomes a candidate.
+    """
+
+    def __init__(
+        self,
+        ids: Sequence[str],
+        types: Sequence[str],
+        parent_ids: Sequence[str | None],
+        ancestors: Sequence[Sequence[str]],
+        geometries: np.ndarray | None = None,
+        store: GeometryStore | None = None,
+    ):
+        if (geometries is None) == (store is None):
+            raise ValueError("Exactly one of geometries and store must be given")
+        self.ids = np.asarray(ids, dtype=object)
+        self.types = np.asarray(types, dtype=object)
+        self.parent_ids = np.asarray(parent_ids, dtype=object)
+        self.ancestors = [list(a) for a in ancestors]
+        self._store = store
+        self._materialize_lock = threading.Lock()
+        if geometries is not None:
+            self._geometries = geometries
+            shapely.prepare(self._geometries)
+            self._tree = shapely.STRtree(self._geometries)
+        else:
+            assert store is not None
+            self._geometries = np.full(len(self.ids), None, dtype=object)
+            self._tree = shapely.STRtree(shapely.box(*store.bounds.T))
+
+        self._grid: "BorderGrid | None" = None
+        self._grid_expansion: list[np.ndarray] = []
+        self._positions = positions = {border_id: pos for pos, border_id in enumerate(self.ids)}
+        children: dict[int, list[int]] = {}
+        roots: list[int] = []
+        for pos, parent_id in enumerate(self.parent_ids):
+            if parent_id is None or parent_id not in positions:
+                roots.append(pos)
+            else:
+                children.setdefault(positions[parent_id], []).append(pos)
+        self._roots = np.asarray(roots, dtype=np.intp)
+        self._children = {pos: np.asarray(c, dtype=np.intp) for pos, c in children.items()}
+
+    @classmethod
+    def from_duckdb(cls, conn: duckdb.DuckDBPyConnection) -> Self:
+        rows = conn.execute(
+            """
+            SELECT ID, type, parent_id, ancestors, ST_AsWKB(shape)
+            FROM borders
+            ORDER BY ID
+            """
+        ).fetchall()
+        return cls(
+            ids=[row[0] for row in rows],
+            types=[row[1] for row in rows],
+            parent_ids=[row[2] for row in rows],
+            ancestors=[row[3] or [] for row in rows],
+            geometries=shapely.from_wkb([bytes(row[4]) for row in rows]),
+        )
+
+    @classmethod
+    def from_store(cls, path: str) -> Self:
+        """Index over a geometry store written by GeometryStore.save, does not need DuckDB."""
+        store = GeometryStore.open(path)
+        return cls(store.ids, store.types, store.parent_ids, store.ancestors, store=store)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def geometries(self) -> np.ndarray:
+        return self._get_geometries(np.arange(len(self), dtype=np.intp))
+
+    def _get_geometries(self, positions: np.ndarray) -> np.ndarray:
+        """Prepared geometries of borders at the given positions, materialized from the store if needed."""
+        geometries = self._geometries[positions]
+        if self._store is None:
+            return geometries
+        missing = np.unique(positions[shapely.is_missing(geometries)])
+        if len(missing):
+            with self._materialize_lock:
+                missing = missing[shapely.is_missing(self._geometries[missing])]
+                loaded = self._store.materialize(missing)
+                shapely.prepare(loaded)
+                self._geometries[missing] = loaded
+            geometries = self._geometries[positions]
+        return geometries
+
+    def leaves(self) -> np.ndarray:
+        """Indices of borders without children (communes)."""
+        return np.asarray([pos for pos in range(len(self)) if pos not in self._children], dtype=np.intp)
+
+    def attach_grid(self, grid: "BorderGrid") -> None:
+        """Use the grid to resolve tracks before exact tests, grid must be built from the same borders."""
+        unknown = [border_id for border_id in grid.ids if border_id not in self._positions]
+        if unknown:
+            raise ValueError(f"Grid does not match borders, {len(unknown)} unknown IDs, e.g. {unknown[0]}")
+        # grid resolves leaves, their ancestors are intersected as well
+        self._grid_expansion = []
+        for border_id in grid.ids:
+            pos = self._positions[border_id]
+            expansion = {pos} | {self._positions[a] for a in self.ancestors[pos] if a in self._positions}
+            self._grid_expansion.append(np.asarray(sorted(expansion), dtype=np.intp))
+        self._grid = grid
+
+    def _grid_split(self, track: shapely.Geometry | None) -> tuple[np.ndarray, shapely.Geometry | None]:
+        """Borders (with ancestors) intersecting the track according to the grid, and the unresolved remainder."""
+        if self._grid is None or track is None:
+            return _EMPTY, track
+        leaves, remainder = self._grid.split(shapely.get_coordinates(track))
+        if not len(leaves):
+            return _EMPTY, remainder
+        return np.unique(np.concatenate([self._grid_expansion[leaf] for leaf in leaves])), remainder
+
+    def candidates(self, track: shapely.Geometry) -> np.ndarray:
+        """Indices of borders whose bounding box intersects the track."""
+        return self._tree.query(track)
+
+    def _candidate_pairs(
+        self, tracks: np.ndarray, tolerance: float
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray | None]:
+        """
+        (track, border) index pairs that may intersect, and simplified track vertices if tolerance is positive.
+        Without simplification candidates are borders with an intersecting bounding box.
+        With it, borders within tolerance of the simplified track, which contains every border
+        intersecting the original track, since the whole original track lies within tolerance of the simplified one.
+        """
+        if tolerance <= 0:
+            track_idx, border_idx = self._tree.query(tracks)
+            return track_idx, border_idx, None
+        present = np.flatnonzero(shapely.is_geometry(tracks))
+        simplified, present_vertices = simplify_tracks(tracks[present], tolerance)
+        vertices = np.full(len(tracks), None, dtype=object)
+        vertices[present] = present_vertices
+        # slack covers floating point error of the distance computations
+        track_idx, border_idx = self._tree.query(simplified, predicate="dwithin", distance=tolerance * _SLACK)
+        return present[track_idx], border_idx, vertices
+
+    def _intersects(
+        self, border_idx: np.ndarray, track_idx: np.ndarray, tracks: np.ndarray, vertices: np.ndarray | None
+    ) -> np.ndarray:
+        """
+        Pairwise intersection test of borders and tracks (given by positions in `tracks`).
+        A border containing a vertex kept by simplification surely intersects the track,
+        the exact track is only tested against the remaining ones.
+        """
+        geometries = self._get_geometries(border_idx)
+        if vertices is None:
+            return shapely.intersects(geometries, tracks[track_idx])
+        hits = shapely.intersects(geometries, vertices[track_idx])
+        rest = np.flatnonzero(~hits)
+        hits[rest] = shapely.intersects(geometries[rest], tracks[track_idx[rest]])
+        return hits
+
+    def intersecting(self, track: shapely.Geometry, tolerance: float = 0.0) -> np.ndarray:
+        """Indices of borders intersecting the track."""
+        tracks = np.asarray([track], dtype=object)
+        track_idx, border_idx, vertices = self._candidate_pairs(tracks, tolerance)
+        hits = self._intersects(border_idx, track_idx, tracks, vertices)
+        return np.sort(border_idx[hits])
+
+    def intersecting_hierarchical(self, track: shapely.Geometry, tolerance: float = 0.0) -> np.ndarray:
+        """
+        Indices of borders intersecting the track, found by descending the border tree.
+        Children are only tested when their parent intersects the track,
+        so a ride within one voivodeship never touches communes of the other ones.
+        """
+        tracks = np.asarray([track], dtype=object)
+        _, candidates, vertices = self._candidate_pairs(tracks, tolerance)
+        found = []
+        level = self._roots
+        while len(level):
+            level = level[np.isin(level, candidates)]
+            track_idx = np.zeros(len(level), dtype=np.intp)
+            level = level[self._intersects(level, track_idx, tracks, vertices)]
+            found.append(level)
+            level = np.concatenate([self._children.get(pos, _EMPTY) for pos in level] or [_EMPTY])
+        return np.sort(np.concatenate(found))
+
+    def query_batch(
+        self, tracks: Sequence[shapely.Geometry | None], hierarchical: bool = False, tolerance: float = 0.0
+    ) -> list[list[tuple[str, str]]]:
+        """Results of query for each of the tracks, empty tracks (None) match nothing."""
+        resolved, remainders = zip(*(self._grid_split(track) for track in tracks)) if tracks else ((), ())
+        if hierarchical:
+            found = [
+                self.intersecting_hierarchical(track, tolerance) if track is not None else _EMPTY
+                for track in remainders
+            ]
+        else:
+            found = self._intersecting_batch(np.asarray(remainders, dtype=object), tolerance)
+        return [self._result(np.union1d(f, r)) for f, r in zip(found, resolved)]
+
+    def _intersecting_batch(self, tracks: np.ndarray, tolerance: float) -> list[np.ndarray]:
+        track_idx, border_idx, vertices = self._candidate_pairs(tracks, tolerance)
+        hits = self._intersects(border_idx, track_idx, tracks, vertices)
+        track_idx, border_idx = track_idx[hits], border_idx[hits]
+        order = np.lexsort((border_idx, track_idx))
+        track_idx, border_idx = track_idx[order], border_idx[order]
+        return np.split(border_idx, np.searchsorted(track_idx, np.arange(1, len(tracks))))
+
+    def _result(self, found: np.ndarray) -> list[tuple[str, str]]:
+        return [(str(self.ids[i]), str(self.types[i])) for i in found]
+
+    def query(
+        self, track: shapely.Geometry, hierarchical: bool = False, tolerance: float = 0.0
+    ) -> list[tuple[str, str]]:
+        """
+        (ID, type) of borders intersecting the track, same shape as the DuckDB query result.
+        Positive tolerance enables Douglas-Peucker simplification of the track, results stay exact.
+        """
+        resolved, remainder = self._grid_split(track)
+        if remainder is None:
+            found = _EMPTY
+        elif hierarchical:
+            found = self.intersecting_hierarchical(remainder, tolerance)
+        else:
+            found = self.intersecting(remainder, tolerance)
+        return self._result(np.union1d(found, resolved))
@@ -0,0 +1,62 @@
+"""
+Simple container for numpy arrays that can be memory mapped, so that large lookup structures
+are shared between worker processes through the page cache instead of being loaded into each of them.
+
+Layout: magic (8 bytes), header length (uint64 little endian), JSON header, arrays aligned to 64 bytes.
+"""
+
+import json
+import struct
+from typing import Any
+
+import numpy as np
+
+_ALIGN = 64
+_LEN = struct.Struct("<Q")
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // _ALIGN) * _ALIGN
+
+
+def write_arrays(path: str, magic: bytes, meta: dict[str, Any], arrays: dict[str, np.ndarray]) -> None:
+    if len(magic) != 8:
+        raise ValueError("Magic must be 8 bytes long")
+    arrays = {name: np.ascontiguousarray(arr) for name, arr in arrays.items()}
+    # offsets are relative to the end of header, so they do not depend on header length
+    specs = {}
+    offset = 0
+    for name, arr in arrays.items():
+        if arr.dtype.hasobject:
+            raise ValueError(f"Array {name} has object dtype")
+        specs[name] = {"dtype": arr.dtype.str, "shape": list(arr.shape), "offset": offset}
+        offset = _aligned(offset + arr.nbytes)
+    header = json.dumps({"meta": meta, "arrays": specs}).encode()
+    data_start = _aligned(len(magic) + _LEN.size + len(header))
+    with open(path, "wb") as f:
+        f.write(magic)
+        f.write(_LEN.pack(len(header)))
+        f.write(header)
+        for name, arr in arrays.items():
+            f.seek(data_start + specs[name]["offset"])
+            f.write(arr.tobytes())
+
+
+def read_arrays(path: str, magic: bytes) -> tuple[dict[str, Any], dict[str, np.ndarray]]:
+    """Read metadata and memory map (read only) arrays written by write_arrays."""
+    with open(path, "rb") as f:
+        if f.read(len(magic)) != magic:
+            raise ValueError(f"{path} is not a valid file, magic mismatch")
+        (header_len,) = _LEN.unpack(f.read(_LEN.size))
+        header = json.loads(f.read(header_len))
+    data_start = _aligned(len(magic) + _LEN.size + header_len)
+    arrays = {}
+    for name, spec in header["arrays"].items():
+        shape = tuple(spec["shape"])
+        if np.prod(shape) == 0:
+            arrays[name] = np.empty(shape, dtype=np.dtype(spec["dtype"]))
+            continue
+        arrays[name] = np.memmap(
+            path, dtype=np.dtype(spec["dtype"]), mode="r", offset=data_start + spec["offset"], shape=shape
+        )
+    return header["meta"], arrays
@@ -0,0 +1,79 @@
+from typing import TYPE_CHECKING, Self
+
+import numpy as np
+import shapely
+
+from .mmfile import read_arrays, write_arrays
+
+if TYPE_CHECKING:
+    from .index import BorderIndex
+
+_MAGIC = b"RGGEOM01"
+
+
+class GeometryStore:
+    """
+    Read-only border geometries in a memory-mapped file, as flat coordinate arrays with offset tables
+    (shapely ragged array layout), together with border attributes and bounding boxes.
+    Geometries are only built when requested, so loading the store costs next to nothing
+    and untouched coordinates are never read from disk.
+    """
+
+    def __init__(
+        self,
+        meta: dict,
+        geometry_type: shapely.GeometryType,
+        coords: np.ndarray,
+        offsets: tuple[np.ndarray, ...],
+        bounds: np.ndarray,
+    ):
+        self.ids: list[str] = meta["ids"]
+        self.types: list[str] = meta["types"]
+        self.parent_ids: list[str | None] = meta["parent_ids"]
+        self.ancestors: list[list[str]] = meta["ancestors"]
+        self.bounds = bounds
+        self._geometry_type = geometry_type
+        self._coords = coords
+        self._offsets = offsets
+
+    @staticmethod
+    def save(path: str, index: "BorderIndex") -> None:
+        geometries = index.geometries
+        geometry_type, coords, offsets = shapely.to_ragged_array(geometries)
+        meta = {
+            "ids": index.ids.tolist(),
+            "types": index.types.tolist(),
+            "parent_ids": index.parent_ids.tolist(),
+            "ancestors": index.ancestors,
+            "geometry_type": int(geometry_type),
+            "offsets": len(offsets),
+        }
+        arrays: dict[str, np.ndarray] = {"coords": coords, "bounds": shapely.bounds(geometries)}
+        arrays.update({f"offsets_{level}": offset for level, offset in enumerate(offsets)})
+        write_arrays(path, _MAGIC, meta, arrays)
+
+    @classmethod
+    def open(cls, path: str) -> Self:
+        meta, arrays = read_arrays(path, _MAGIC)
+        offsets = tuple(arrays[f"offsets_{level}"] for level in range(meta["offsets"]))
+        return cls(meta, shapely.GeometryType(meta["geometry_type"]), arrays["coords"], offsets, arrays["bounds"])
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _geometry(self, pos: int) -> shapely.Geometry:
+        # offsets are ordered from coordinates up to geometries, walk them down from the geometry level
+        low, high = pos, pos + 1
+        sliced = []
+        for offsets in reversed(self._offsets):
+            part = np.asarray(offsets[low : high + 1])
+            sliced.append(part - part[0])
+            low, high = int(part[0]), int(part[-1])
+        coords = np.asarray(self._coords[low:high])
+        return shapely.from_ragged_array(self._geometry_type, coords, tuple(reversed(sliced)))[0]
+
+    def materialize(self, positions: np.ndarray) -> np.ndarray:
+        """Geometries of borders at the given positions."""
+        geometries = np.empty(len(positions), dtype=object)
+        geometries[:] = [self._geometry(int(pos)) for pos in positions]
+        return geometries
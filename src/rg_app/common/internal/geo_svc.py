@@ -20,3 +20,15 @@ class GeoSvcCheckResponseItem(BaseModel):
 
 class GeoSvcCheckResponse(BaseModel):
     items: list[GeoSvcCheckResponseItem]
+
+
+class GeoSvcCheckBatchRequest(BaseModel):
+    items: list[GeoSvcCheckRequest]
+
+
+class GeoSvcCheckPolylineBatchRequest(BaseModel):
+    items: list[GeoSvcCheckPolylineRequest]
+
+
+class GeoSvcCheckBatchResponse(BaseModel):
+    items: list[GeoSvcCheckResponse]
@@ -0,0 +1,6 @@
+from .base_model import BaseModel
+
+
+class RegionsReloadMsg(BaseModel):
+    # catalog version of the exported regions, processes already on it skip the reload
+    version: str | None = None
@@ -0,0 +1,78 @@
+import time
+from typing import Callable
+
+from opentelemetry.metrics import CallbackOptions, MeterProvider, Observation
+from sqlalchemy import exc
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from rg_app.common.config import BaseDbConfig
+
+from .base import LIBRARY_NAME
+
+
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool reporting how long every checkout took (waiting for a free connection included)."""
+
+    checkout_observer: Callable[[float, bool], None] | None = None
+
+    def connect(self):
+        started = time.perf_counter()
+        timed_out = False
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            timed_out = True
+            raise
+        finally:
+            if self.checkout_observer is not None:
+                self.checkout_observer(time.perf_counter() - started, timed_out)
+
+    def recreate(self):
+        pool = super().recreate()
+        assert isinstance(pool, InstrumentedAsyncQueuePool)
+        pool.checkout_observer = self.checkout_observer
+        return pool
+
+
+def create_instrumented_engine(config: BaseDbConfig, meter_provider: MeterProvider, pool_name: str) -> AsyncEngine:
+    """
+    Async engine configured by `config`, with pool metrics following OpenTelemetry database client conventions:
+    checkout wait time, timeouts, connections in use and idle, and pool limits.
+    """
+    engine = create_async_engine(config.get_url(), poolclass=InstrumentedAsyncQueuePool, **config.get_engine_options())
+    meter = meter_provider.get_meter(LIBRARY_NAME)
+    attributes = {"db.client.connection.pool.name": pool_name}
+    wait_time = meter.create_histogram(
+        "db.client.connection.wait_time", unit="s", description="Time it took to obtain a connection from the pool"
+    )
+    timeouts = meter.create_counter(
+        "db.client.connection.timeouts", description="Checkouts which timed out waiting for a free connection"
+    )
+
+    def observe_checkout(seconds: float, timed_out: bool):
+        wait_time.record(seconds, attributes)
+        if timed_out:
+            timeouts.add(1, attributes)
+
+    pool = engine.sync_engine.pool
+    assert isinstance(pool, InstrumentedAsyncQueuePool)
+    pool.checkout_observer = observe_checkout
+
+    def observe_count(options: CallbackOptions):
+        # pool is looked up on every call, it is replaced when the engine is disposed
+        pool = engine.sync_engine.pool
+        assert isinstance(pool, InstrumentedAsyncQueuePool)
+        yield Observation(pool.checkedout(), attributes | {"db.client.connection.state": "used"})
+        yield Observation(pool.checkedin(), attributes | {"db.client.connection.state": "idle"})
+
+    def observe_max(options: CallbackOptions):
+        yield Observation(config.pool_size + max(config.max_overflow, 0), attributes)
+
+    meter.create_observable_up_down_counter(
+        "db.client.connection.count", callbacks=[observe_count], description="Connections by state"
+    )
+    meter.create_observable_up_down_counter(
+        "db.client.connection.max", callbacks=[observe_max], description="Maximum number of open connections"
+    )
+    return engine
@@ -1,4 +1,12 @@
 from .auth import AthleteTokenResponse, StravaTokenManager
-from .rate_limits import RateLimitManager, RateLimitSet, RLNatsConfig
+from .rate_limits import RateLimitBudget, RateLimitDeferred, RateLimitManager, RateLimitSet, RLNatsConfig
 
-__all__ = ["StravaTokenManager", "AthleteTokenResponse", "RLNatsConfig", "RateLimitSet", "RateLimitManager"]
+__all__ = [
+    "StravaTokenManager",
+    "AthleteTokenResponse",
+    "RLNatsConfig",
+    "RateLimitSet",
+    "RateLimitManager",
+    "RateLimitBudget",
+    "RateLimitDeferred",
+]
@@ -8,7 +8,7 @@ from .auth import StravaAuth
 from .helpers import MAX_PAGE_SIZE
 from .models.activity import ActivityPartial, ActivityPatch, ActivityStreamSet
 from .models.base import PaginatedResult
-from .rate_limits import RateLimitManager
+from .rate_limits import Priority, RateLimitManager
 
 _activity_list_adapter = TypeAdapter(list[ActivityPartial])
 
@@ -20,10 +20,12 @@ async def get_activity_range(
     page: int,
     auth: StravaAuth,
     rlm: RateLimitManager,
+    priority: Priority = "high",
 ) -> PaginatedResult[ActivityPartial]:
     """
     Get activities for a given period
     page: 0-based
+    priority: of the request in the rate limit budget
     """
     query = {
         "before": int(period_to.timestamp()),
@@ -31,6 +33,7 @@ async def get_activity_range(
         "page": page + 1,
         "per_page": MAX_PAGE_SIZE,
     }
+    await rlm.reserve(priority=priority)
     resp = await client.get("https://www.strava.com/api/v3/athlete/activities", params=query, auth=auth)
     resp.raise_for_status()
     await rlm.feed_headers(resp.headers)
@@ -47,6 +50,7 @@ async def get_activity(
     auth: StravaAuth,
     rlm: RateLimitManager,
 ) -> ActivityPartial | None:
+    await rlm.reserve()
     try:
         resp = await client.get(f"https://www.strava.com/api/v3/activities/{activity_id}", auth=auth)
         await rlm.feed_headers(resp.headers)
@@ -67,6 +71,7 @@ async def update_activity(
     rlm: RateLimitManager,
     activity: ActivityPatch,
 ) -> ActivityPartial:
+    await rlm.reserve(read=False)
     resp = await client.put(
         f"https://www.strava.com/api/v3/activities/{activity_id}",
         auth=auth,
@@ -92,7 +97,9 @@ async def verify_activities_accessible(
         "page": 1,
         "per_page": MAX_PAGE_SIZE,
     }
+    await rlm.reserve()
     resp = await client.get("https://www.strava.com/api/v3/athlete/activities", params=query, auth=auth)
+    await rlm.feed_headers(resp.headers)
     if resp.status_code == 401:
         return False
     resp.raise_for_status()
@@ -103,6 +110,7 @@ async def get_activity_streams(
     client: AsyncClient, activity_id: int, auth: StravaAuth, rlm: RateLimitManager
 ) -> ActivityStreamSet:
     streams = ["time", "latlng", "altitude", "distance"]
+    await rlm.reserve()
     resp = await client.get(
         f"https://www.strava.com/api/v3/activities/{activity_id}/streams",
         params={"keys": ",".join(streams), "key_by_type": "true"},
@@ -13,6 +13,7 @@ async def get_athlete(
     """
     Get athlete info
     """
+    await rlm.reserve()
     resp = await client.get("https://www.strava.com/api/v3/athlete", auth=auth)
     resp.raise_for_status()
     await rlm.feed_headers(resp.headers)
@@ -1,9 +1,11 @@
 import asyncio
+import random
+import time
 from contextlib import asynccontextmanager
 from contextvars import ContextVar
 from dataclasses import dataclass
 from datetime import UTC, datetime
-from typing import AsyncGenerator, Self
+from typing import AsyncGenerator, Literal, Self
 
 import msgspec.json
 import nats.js.errors
@@ -100,6 +102,127 @@ def extract_limits(headers: Headers) -> RateLimitSet | None:
         return None
 
 
+# webhook traffic is high priority, backlog imports are low priority
+Priority = Literal["high", "low"]
+
+# Strava windows are aligned to the clock: quarters of an hour and UTC days
+_WINDOW_15M = 15 * 60
+_WINDOW_DAILY = 24 * 60 * 60
+# key of the shared scheduler state, in the same bucket as the limits reported by Strava
+_SCHEDULER_KEY = "scheduler"
+
+
+def _default_limits(now: datetime) -> RateLimitSet:
+    """Default limits of a Strava application, used until Strava reports the actual ones."""
+    return RateLimitSet(
+        read_15m=RateLimit(usage=0, limit=100),
+        read_daily=RateLimit(usage=0, limit=1000),
+        any_15m=RateLimit(usage=0, limit=200),
+        any_daily=RateLimit(usage=0, limit=2000),
+        updated_at=now,
+    )
+
+
+def _window_start(moment: datetime, length: int) -> float:
+    timestamp = moment.timestamp()
+    return timestamp - timestamp % length
+
+
+def _current_usage(limits: RateLimitSet, now: datetime) -> RateLimitSet:
+    """Limits as of `now`, with usage of windows which have passed since they were recorded reset."""
+    new_day = _window_start(limits.updated_at, _WINDOW_DAILY) != _window_start(now, _WINDOW_DAILY)
+    new_15m = new_day or _window_start(limits.updated_at, _WINDOW_15M) != _window_start(now, _WINDOW_15M)
+
+    def current(limit: RateLimit, reset: bool) -> RateLimit:
+        return RateLimit(usage=0 if reset else limit.usage, limit=limit.limit)
+
+    return RateLimitSet(
+        read_15m=current(limits.read_15m, new_15m),
+        read_daily=current(limits.read_daily, new_day),
+        any_15m=current(limits.any_15m, new_15m),
+        any_daily=current(limits.any_daily, new_day),
+        updated_at=now,
+    )
+
+
+def _counted(limits: RateLimitSet, read: bool) -> RateLimitSet:
+    """Limits with one more request counted, read requests count against read and overall limits."""
+
+    def plus_one(limit: RateLimit, counts: bool = True) -> RateLimit:
+        return RateLimit(usage=limit.usage + 1 if counts else limit.usage, limit=limit.limit)
+
+    return RateLimitSet(
+        read_15m=plus_one(limits.read_15m, read),
+        read_daily=plus_one(limits.read_daily, read),
+        any_15m=plus_one(limits.any_15m),
+        any_daily=plus_one(limits.any_daily),
+        updated_at=limits.updated_at,
+    )
+
+
+def _merged(state: RateLimitSet, observed: RateLimitSet, now: datetime) -> RateLimitSet:
+    """Scheduler state with limits reported by Strava and usage raised to the reported one."""
+    state = _current_usage(state, now)
+    observed = _current_usage(observed, now)
+
+    def merged(limit: RateLimit, observed_limit: RateLimit) -> RateLimit:
+        return RateLimit(usage=max(limit.usage, observed_limit.usage), limit=observed_limit.limit)
+
+    return RateLimitSet(
+        read_15m=merged(state.read_15m, observed.read_15m),
+        read_daily=merged(state.read_daily, observed.read_daily),
+        any_15m=merged(state.any_15m, observed.any_15m),
+        any_daily=merged(state.any_daily, observed.any_daily),
+        updated_at=now,
+    )
+
+
+@dataclass
+class RateLimitBudget:
+    # share of every Strava limit requests are scheduled up to, the rest covers requests made outside the scheduler
+    target: float = 0.95
+    # share of the target available to low priority requests, the rest is kept for high priority ones
+    low_priority_share: float = 0.8
+    # low priority requests are spread evenly over every window, running ahead of that pace by at most this many
+    burst: int = 10
+    # seconds a reservation may wait for capacity, RateLimitDeferred is raised if it would take longer
+    max_wait: float = 60.0
+
+
+def reservation_wait(
+    limits: RateLimitSet, now: datetime, read: bool, priority: Priority, budget: RateLimitBudget
+) -> float:
+    """
+    Seconds until one more request of `priority` fits the budget, 0 if it fits now.
+    `limits` are current as of `now` (usage of past windows reset).
+    """
+    share = budget.target if priority == "high" else budget.target * budget.low_priority_share
+    windows = [(limits.any_15m, _WINDOW_15M), (limits.any_daily, _WINDOW_DAILY)]
+    if read:
+        windows += [(limits.read_15m, _WINDOW_15M), (limits.read_daily, _WINDOW_DAILY)]
+    timestamp = now.timestamp()
+    wait = 0.0
+    for limit, length in windows:
+        allowed = limit.limit * share
+        elapsed = timestamp % length
+        if limit.usage + 1 > allowed:
+            # window is used up, until it resets
+            wait = max(wait, length - elapsed)
+        elif priority == "low":
+            # pace: allowed * elapsed / length + burst requests may be used at this point of the window
+            due = (limit.usage + 1 - budget.burst) * length / allowed
+            wait = max(wait, due - elapsed)
+    return wait
+
+
+class RateLimitDeferred(Exception):
+    """No capacity for a Strava request within the maximum wait of the budget, it should be retried after `delay`."""
+
+    def __init__(self, delay: float):
+        super().__init__(f"Strava rate limit budget exhausted, retry in {delay:.0f} s")
+        self.delay = delay
+
+
 @dataclass
 class RLNatsConfig:
     nats_conn: NATS
@@ -108,7 +231,13 @@ class RLNatsConfig:
 
 
 class RateLimitManager:
-    def __init__(self, rl_nats_config: RLNatsConfig | None = None):
+    """
+    Limits reported by Strava and a scheduler of requests within them.
+    Requests are reserved before they are made, against usage shared by all replicas through the KV bucket
+    (updated with compare-and-set on revisions), or kept in memory without NATS.
+    """
+
+    def __init__(self, rl_nats_config: RLNatsConfig | None = None, budget: RateLimitBudget | None = None):
         if rl_nats_config is not None:
             self._nc = rl_nats_config.nats_conn
             self._kv_name = rl_nats_config.kv_name
@@ -121,6 +250,8 @@ class RateLimitManager:
         self._kv = None
         self.limits_set = ContextVar[RateLimitSet | None]("limits_set", default=None)
         self._refresh_task = None
+        self.budget = budget or RateLimitBudget()
+        self._local_state: RateLimitSet | None = None
 
     async def refresh_task(self):
         assert self._kv is not None
@@ -177,6 +308,79 @@ class RateLimitManager:
             limits = await self._get_limits_fallback()
         return limits
 
+    async def _load_state(self, now: datetime) -> tuple[RateLimitSet, int | None]:
+        """Current scheduler state and its KV revision, None if it is not stored yet or kept in memory."""
+        state = None
+        revision = None
+        if self._kv is None:
+            state = self._local_state
+        else:
+            try:
+                entry = await self._kv.get(_SCHEDULER_KEY)
+                revision = entry.revision
+                if entry.value is not None:
+                    state = msgspec.json.decode(entry.value, type=RateLimitSet)
+            except nats.js.errors.KeyNotFoundError:
+                pass
+        if state is None:
+            state = self.limits_set.get() or _default_limits(now)
+        return _current_usage(state, now), revision
+
+    async def _store_state(self, state: RateLimitSet, revision: int | None) -> bool:
+        """Store the scheduler state unless it was changed since `revision` was loaded."""
+        if self._kv is None:
+            self._local_state = state
+            return True
+        try:
+            if revision is None:
+                await self._kv.create(_SCHEDULER_KEY, msgspec.json.encode(state))
+            else:
+                await self._kv.update(_SCHEDULER_KEY, msgspec.json.encode(state), last=revision)
+        except nats.js.errors.KeyWrongLastSequenceError:
+            return False
+        return True
+
+    async def estimate_wait(self, read: bool = True, priority: Priority = "high") -> float:
+        """Seconds until a request of `priority` could be reserved, without reserving it."""
+        now = datetime.now(UTC)
+        state, _ = await self._load_state(now)
+        return reservation_wait(state, now, read, priority, self.budget)
+
+    async def reserve(self, read: bool = True, priority: Priority = "high"):
+        """
+        Wait until a request of `priority` fits the budget and count it, before making the request.
+        Raises RateLimitDeferred if it does not fit within `max_wait` of the budget.
+        """
+        tp = get_tracer_provider()
+        tracer = tp.get_tracer(__name__)
+        with tracer.start_as_current_span("reserve_rate_limit") as span:
+            span.set_attribute("rate_limit.priority", priority)
+            started = time.monotonic()
+            while True:
+                now = datetime.now(UTC)
+                state, revision = await self._load_state(now)
+                wait = reservation_wait(state, now, read, priority, self.budget)
+                if wait <= 0:
+                    if await self._store_state(_counted(state, read), revision):
+                        span.set_attribute("rate_limit.waited", time.monotonic() - started)
+                        return
+                    # another reservation came first, retry with its state
+                    continue
+                if time.monotonic() - started + wait > self.budget.max_wait:
+                    span.set_attribute("rate_limit.deferred", wait)
+                    raise RateLimitDeferred(wait)
+                # jitter spreads retries of replicas waiting for the same moment
+                await asyncio.sleep(wait + random.uniform(0, 0.5))
+
+    async def _reconcile(self, observed: RateLimitSet):
+        """Raise scheduler usage to the one reported by Strava, which includes requests made outside the scheduler."""
+        while True:
+            now = datetime.now(UTC)
+            state, revision = await self._load_state(now)
+            merged = _merged(state, observed, now)
+            if merged == state or await self._store_state(merged, revision):
+                return
+
     async def feed_headers(self, headers: Headers):
         tp = get_tracer_provider()
         tracer = tp.get_tracer(__name__)
@@ -191,3 +395,4 @@ class RateLimitManager:
                     assert self._kv_name is not None
                     await self._kv.put(self._kv_name, msgspec.json.encode(limits))
                 self.limits_set.set(limits)
+                await self._reconcile(limits)
@@ -1,3 +1,3 @@
-from .models import Activity, Region, User
+from .models import Activity, Region, User, UserRegion
 
-__all__ = ["User", "Activity", "Region"]
+__all__ = ["User", "Activity", "Region", "UserRegion"]
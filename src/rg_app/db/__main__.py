@@ -2,6 +2,9 @@ import os
 
 import click
 
+from rg_app.db.manage import CLUSTER_TABLES, normalize_url
+from rg_app.db.manage import backfill_user_regions as manage_backfill_user_regions
+from rg_app.db.manage import cluster as manage_cluster
 from rg_app.db.manage import migrate as manage_migrate
 
 RG_DB_URL_ENV = "RG_DB_URL"
@@ -22,6 +25,74 @@ def migrate(url: str | None):
     manage_migrate(url)
 
 
+@cli.command(help="Rebuild per-user visited regions from activities", name="backfill-user-regions")
+@click.option("--url")
+@click.option("--user_id", type=int, default=None, help="Only rebuild regions of this user")
+def backfill_user_regions(url: str | None, user_id: int | None):
+    url = url or os.getenv(RG_DB_URL_ENV)
+    if url is None:
+        click.echo(f"Please provide DB URL via --url or {RG_DB_URL_ENV} environment variable")
+        exit(1)
+    rows = manage_backfill_user_regions(url, user_id)
+    click.echo(f"Rebuilt {rows} user regions")
+
+
+@cli.command(help="Benchmark region queries on a synthetic user, data is rolled back", name="bench-regions")
+@click.option("--url")
+@click.option("--activities", help="Number of activities of the synthetic user", default=10_000)
+@click.option("--regions", help="Number of distinct regions", default=2_500)
+@click.option("--per_activity", help="Regions visited per activity", default=15)
+@click.option("--repeat", type=click.IntRange(min=1), help="Runs of every query", default=20)
+def bench_regions(url: str | None, activities: int, regions: int, per_activity: int, repeat: int):
+    from rg_app.db.bench import bench_regions as run_bench_regions
+
+    url = url or os.getenv(RG_DB_URL_ENV)
+    if url is None:
+        click.echo(f"Please provide DB URL via --url or {RG_DB_URL_ENV} environment variable")
+        exit(1)
+    click.echo(f"Benchmarking region queries for a user with {activities} activities")
+    results = run_bench_regions(normalize_url(url), activities, regions, per_activity, repeat)
+    for query, variants in results.items():
+        for variant, (mean_time, same) in variants.items():
+            click.echo(f"{query:>12} {variant:>16}: {mean_time * 1000:8.2f} ms{'' if same else ', DIFFERENT RESULT'}")
+
+
+@cli.command(
+    help="Check that per-user queries use indexes, on synthetic users which are rolled back", name="check-plans"
+)
+@click.option("--url")
+@click.option("--users", help="Number of synthetic users", default=50)
+@click.option("--activities", help="Number of activities per synthetic user", default=200)
+def check_plans(url: str | None, users: int, activities: int):
+    from rg_app.db.bench import check_plans as run_check_plans
+
+    url = url or os.getenv(RG_DB_URL_ENV)
+    if url is None:
+        click.echo(f"Please provide DB URL via --url or {RG_DB_URL_ENV} environment variable")
+        exit(1)
+    failed = False
+    for query, seq_scans in run_check_plans(normalize_url(url), users, activities).items():
+        if seq_scans:
+            failed = True
+            click.echo(f"{query:>18}: FAIL, sequential scan of {', '.join(seq_scans)}")
+        else:
+            click.echo(f"{query:>18}: OK")
+    if failed:
+        exit(1)
+
+
+@cli.command(help="Physically order tables by user (locks tables while running)", name="cluster")
+@click.option("--url")
+@click.option("--table", "tables", multiple=True, help="Table to cluster, all clustered tables by default")
+def cluster(url: str | None, tables: tuple[str, ...]):
+    url = url or os.getenv(RG_DB_URL_ENV)
+    if url is None:
+        click.echo(f"Please provide DB URL via --url or {RG_DB_URL_ENV} environment variable")
+        exit(1)
+    manage_cluster(url, tables or CLUSTER_TABLES)
+    click.echo("Clustering complete")
+
+
 def main():
     cli()
 
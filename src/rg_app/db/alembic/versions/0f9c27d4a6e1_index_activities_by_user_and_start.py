@@ -0,0 +1,39 @@
+"""Index activities by user and start
+
+Revision ID: 0f9c27d4a6e1
+Revises: e6f1a93b2d57
+Create Date: 2025-05-24 10:48:13.660915
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0f9c27d4a6e1"
+down_revision: Union[str, None] = "e6f1a93b2d57"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# table -> index rows are physically ordered by with `rg-db cluster`, keeping rows of a user together
+CLUSTER_INDEXES = {
+    "activity": "ix_activity_user_id_start",
+    "activity_region": "ix_activity_region_user_id_region_id_start",
+    "user_region": "user_region_pkey",
+}
+
+
+def upgrade() -> None:
+    op.create_index("ix_activity_user_id_start", "activity", ["user_id", "start"], unique=False)
+    op.create_index("ix_ineligible_activity_user_id_start", "ineligible_activity", ["user_id", "start"], unique=False)
+    # only marks the index, clustering itself locks the table and is left to `rg-db cluster`
+    for table, index in CLUSTER_INDEXES.items():
+        op.execute(f"ALTER TABLE {table} CLUSTER ON {index}")
+
+
+def downgrade() -> None:
+    for table in CLUSTER_INDEXES:
+        op.execute(f"ALTER TABLE {table} SET WITHOUT CLUSTER")
+    op.drop_index("ix_ineligible_activity_user_id_start", table_name="ineligible_activity")
+    op.drop_index("ix_activity_user_id_start", table_name="activity")
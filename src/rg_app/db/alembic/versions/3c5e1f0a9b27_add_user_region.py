@@ -0,0 +1,65 @@
+"""Add user_region
+
+Revision ID: 3c5e1f0a9b27
+Revises: a11b2b488b7e
+Create Date: 2025-05-04 17:12:08.413092
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+import rg_app.db.decorators
+
+# revision identifiers, used by Alembic.
+revision: str = "3c5e1f0a9b27"
+down_revision: Union[str, None] = "a11b2b488b7e"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "user_region",
+        sa.Column("user_id", sa.BigInteger(), nullable=False),
+        sa.Column("region_id", sa.String(length=16), nullable=False),
+        sa.Column("additional", sa.Boolean(), nullable=False),
+        sa.Column("first_visited", rg_app.db.decorators.UTCDateTime(), nullable=False),
+        sa.Column("last_visited", rg_app.db.decorators.UTCDateTime(), nullable=False),
+        sa.Column("visit_count", sa.Integer(), nullable=False),
+        sa.Column("last_activity_id", sa.BigInteger(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["user_id"],
+            ["user.id"],
+        ),
+        sa.PrimaryKeyConstraint("user_id", "region_id"),
+    )
+    # fill from existing activities, later on the table is maintained by the worker
+    op.execute(
+        """
+        INSERT INTO user_region (
+            user_id, region_id, additional, first_visited, last_visited, visit_count, last_activity_id
+        )
+        SELECT
+            a.user_id,
+            r.region_id,
+            bool_and(r.additional),
+            min(a.start),
+            max(a.start),
+            count(DISTINCT a.id),
+            (array_agg(a.id ORDER BY a.start DESC, a.id DESC))[1]
+        FROM activity a
+        CROSS JOIN LATERAL (
+            SELECT value AS region_id, FALSE AS additional FROM jsonb_array_elements_text(a.visited_regions)
+            UNION ALL
+            SELECT value AS region_id, TRUE AS additional FROM jsonb_array_elements_text(a.visited_regions_additional)
+        ) r
+        GROUP BY a.user_id, r.region_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("user_region")
@@ -0,0 +1,26 @@
+"""User data version
+
+Revision ID: 5a3d8e2c7f14
+Revises: 0f9c27d4a6e1
+Create Date: 2025-05-26 19:12:40.218734
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "5a3d8e2c7f14"
+down_revision: Union[str, None] = "0f9c27d4a6e1"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("user", sa.Column("data_version", sa.BigInteger(), server_default="0", nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column("user", "data_version")
@@ -0,0 +1,58 @@
+"""Add activity_region
+
+Revision ID: 7d2a4c81e5f3
+Revises: 3c5e1f0a9b27
+Create Date: 2025-05-06 19:40:51.902317
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+import rg_app.db.decorators
+
+# revision identifiers, used by Alembic.
+revision: str = "7d2a4c81e5f3"
+down_revision: Union[str, None] = "3c5e1f0a9b27"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "activity_region",
+        sa.Column("activity_id", sa.BigInteger(), nullable=False),
+        sa.Column("region_id", sa.String(length=16), nullable=False),
+        sa.Column("user_id", sa.BigInteger(), nullable=False),
+        sa.Column("start", rg_app.db.decorators.UTCDateTime(), nullable=False),
+        sa.Column("additional", sa.Boolean(), nullable=False),
+        sa.ForeignKeyConstraint(["activity_id"], ["activity.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("activity_id", "region_id"),
+    )
+    # fill from existing activities, later on the table is maintained by the worker
+    op.execute(
+        """
+        INSERT INTO activity_region (activity_id, region_id, user_id, start, additional)
+        SELECT DISTINCT ON (a.id, r.region_id) a.id, r.region_id, a.user_id, a.start, r.additional
+        FROM activity a
+        CROSS JOIN LATERAL (
+            SELECT value AS region_id, FALSE AS additional FROM jsonb_array_elements_text(a.visited_regions)
+            UNION ALL
+            SELECT value AS region_id, TRUE AS additional FROM jsonb_array_elements_text(a.visited_regions_additional)
+        ) r
+        ORDER BY a.id, r.region_id, r.additional
+        """
+    )
+    op.create_index(
+        "ix_activity_region_user_id_region_id_start",
+        "activity_region",
+        ["user_id", "region_id", "start"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_activity_region_user_id_region_id_start", table_name="activity_region")
+    op.drop_table("activity_region")
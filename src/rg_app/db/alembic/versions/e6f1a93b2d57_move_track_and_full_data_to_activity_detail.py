@@ -0,0 +1,132 @@
+"""Move track and full_data to activity_detail
+
+Revision ID: e6f1a93b2d57
+Revises: b4e8f2d61c09
+Create Date: 2025-05-17 15:26:44.071358
+
+"""
+
+import json
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "e6f1a93b2d57"
+down_revision: Union[str, None] = "b4e8f2d61c09"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 1000
+
+
+def _round(value: float) -> int:
+    # rounding half away from zero, as the polyline package does
+    return int(value + 0.5) if value >= 0 else -int(-value + 0.5)
+
+
+def _encode(track: list[list[float]]) -> str:
+    """Encode [lng, lat] pairs as a polyline with precision 5."""
+    chunks = []
+    prev_lat, prev_lng = 0, 0
+    for lng, lat in track:
+        lat_i, lng_i = _round(lat * 1e5), _round(lng * 1e5)
+        for delta in (lat_i - prev_lat, lng_i - prev_lng):
+            value = ~(delta << 1) if delta < 0 else delta << 1
+            while value >= 0x20:
+                chunks.append(chr((0x20 | (value & 0x1F)) + 63))
+                value >>= 5
+            chunks.append(chr(value + 63))
+        prev_lat, prev_lng = lat_i, lng_i
+    return "".join(chunks)
+
+
+def _decode(data: str) -> list[list[float]]:
+    """Decode a polyline with precision 5 into [lng, lat] pairs."""
+    coords, values = [], [0, 0]
+    index = 0
+    while index < len(data):
+        for i in range(2):
+            shift, result = 0, 0
+            while True:
+                byte = ord(data[index]) - 63
+                index += 1
+                result |= (byte & 0x1F) << shift
+                shift += 5
+                if byte < 0x20:
+                    break
+            values[i] += ~(result >> 1) if result & 1 else result >> 1
+        coords.append([values[1] / 1e5, values[0] / 1e5])
+    return coords
+
+
+def upgrade() -> None:
+    op.create_table(
+        "activity_detail",
+        sa.Column("activity_id", sa.BigInteger(), nullable=False),
+        sa.Column("polyline", sa.Text(), nullable=True),
+        sa.Column("full_data", postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.ForeignKeyConstraint(["activity_id"], ["activity.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("activity_id"),
+    )
+
+    # convert in batches, tracks are encoded in Python
+    conn = op.get_bind()
+    select_batch = sa.text(
+        "SELECT id, track, full_data FROM activity WHERE id > :last_id ORDER BY id LIMIT :batch_size"
+    ).columns(id=sa.BigInteger(), track=postgresql.JSONB(), full_data=postgresql.JSONB())
+    insert_detail = sa.text(
+        "INSERT INTO activity_detail (activity_id, polyline, full_data) VALUES (:activity_id, :polyline, :full_data)"
+    ).bindparams(sa.bindparam("full_data", type_=postgresql.JSONB()))
+    last_id = -1
+    while True:
+        rows = conn.execute(select_batch, {"last_id": last_id, "batch_size": BATCH_SIZE}).all()
+        if not rows:
+            break
+        conn.execute(
+            insert_detail,
+            [
+                {
+                    "activity_id": row.id,
+                    "polyline": _encode(row.track) if row.track is not None else None,
+                    "full_data": row.full_data,
+                }
+                for row in rows
+            ],
+        )
+        last_id = rows[-1].id
+
+    op.drop_column("activity", "full_data")
+    op.drop_column("activity", "track")
+
+
+def downgrade() -> None:
+    op.add_column("activity", sa.Column("track", postgresql.JSONB(astext_type=sa.Text()), nullable=True))
+    op.add_column("activity", sa.Column("full_data", postgresql.JSONB(astext_type=sa.Text()), nullable=True))
+
+    conn = op.get_bind()
+    select_batch = sa.text(
+        "SELECT activity_id, polyline FROM activity_detail WHERE activity_id > :last_id "
+        "ORDER BY activity_id LIMIT :batch_size"
+    )
+    update_activity = sa.text(
+        "UPDATE activity SET track = CAST(:track AS JSONB), "
+        "full_data = (SELECT full_data FROM activity_detail WHERE activity_id = :activity_id) "
+        "WHERE id = :activity_id"
+    )
+    last_id = -1
+    while True:
+        rows = conn.execute(select_batch, {"last_id": last_id, "batch_size": BATCH_SIZE}).all()
+        if not rows:
+            break
+        conn.execute(
+            update_activity,
+            [{"activity_id": row.activity_id, "track": json.dumps(_decode(row.polyline or ""))} for row in rows],
+        )
+        last_id = rows[-1].activity_id
+
+    op.execute("UPDATE activity SET track = '[]' WHERE track IS NULL")
+    op.alter_column("activity", "track", nullable=False)
+    op.drop_table("activity_detail")
@@ -0,0 +1,206 @@
+import time
+
+from sqlalchemy import Connection, TextClause, create_engine, text
+
+from rg_app.db import user_regions
+
+# IDs far above Strava ones, rows are rolled back anyway
+_USER_ID = 10**15
+_ACTIVITY_ID_BASE = 10**15
+
+_CREATE_USER = """
+INSERT INTO "user" (id, access_token, refresh_token, expires_at, name)
+VALUES (:user_id, 'bench', 'bench', now(), 'bench')
+"""
+
+# Every activity visits `per_activity` pseudo-random regions out of `regions`
+_CREATE_ACTIVITIES = """
+INSERT INTO activity (
+    id, user_id, name, manual, start, moving_time, elapsed_time, distance, track_is_detailed, sport_type,
+    visited_regions, visited_regions_additional
+)
+SELECT
+    :activity_id_base + g, :user_id, 'bench', FALSE, now() - g * interval '1 hour', 3600, 3600, 30000, FALSE, 'Ride',
+    (
+        SELECT jsonb_agg(DISTINCT lpad(((g * 7919 + k * k * 104729) % :regions)::text, 7, '0'))
+        FROM generate_series(1, :per_activity) k
+    ),
+    '[]'::jsonb
+FROM generate_series(1, :activities) g
+"""
+
+QUERIES = {
+    "unlocked": {
+        "jsonb": """
+            SELECT DISTINCT element FROM activity, jsonb_array_elements_text(visited_regions) AS element
+            WHERE user_id = :user_id
+            ORDER BY 1
+        """,
+        "user_region": """
+            SELECT region_id FROM user_region
+            WHERE user_id = :user_id AND NOT additional
+            ORDER BY 1
+        """,
+    },
+    "detail": {
+        "jsonb": """
+            SELECT min(start), max(start), count(id) FROM activity
+            WHERE user_id = :user_id AND visited_regions @> to_jsonb(CAST(:region_id AS text))
+        """,
+        "activity_region": """
+            SELECT min(start), max(start), count(*) FROM activity_region
+            WHERE user_id = :user_id AND region_id = :region_id
+        """,
+        "user_region": """
+            SELECT first_visited, last_visited, visit_count FROM user_region
+            WHERE user_id = :user_id AND region_id = :region_id
+        """,
+    },
+    "new-regions": {
+        "jsonb": """
+            WITH target AS (SELECT id, user_id, start, visited_regions FROM activity WHERE id = :activity_id),
+            earlier AS (
+                SELECT DISTINCT jsonb_array_elements_text(a.visited_regions) AS region
+                FROM activity a JOIN target t ON a.user_id = t.user_id AND a.start < t.start AND a.id != t.id
+            )
+            SELECT region FROM target, jsonb_array_elements_text(target.visited_regions) AS region
+            WHERE region NOT IN (SELECT region FROM earlier)
+            ORDER BY 1
+        """,
+        "activity_region": """
+            SELECT t.region_id FROM activity_region t
+            WHERE t.activity_id = :activity_id AND NOT t.additional AND NOT EXISTS (
+                SELECT 1 FROM activity_region e
+                WHERE e.user_id = t.user_id AND e.region_id = t.region_id
+                AND e.start < t.start AND e.activity_id != t.activity_id AND NOT e.additional
+            )
+            ORDER BY 1
+        """,
+        "user_region": """
+            SELECT u.region_id FROM activity a
+            JOIN user_region u ON u.user_id = a.user_id AND u.first_visited >= a.start
+            WHERE a.id = :activity_id AND u.region_id IN (SELECT jsonb_array_elements_text(a.visited_regions))
+            ORDER BY 1
+        """,
+    },
+}
+
+
+def _prepare(conn: Connection, activities: int, regions: int, per_activity: int, users: int = 1) -> None:
+    """Create synthetic users (IDs from _USER_ID up) with activities and their region tables."""
+    for user_offset in range(users):
+        user_id = _USER_ID + user_offset
+        params = {"user_id": user_id, "activity_id_base": _ACTIVITY_ID_BASE + user_offset * activities}
+        conn.execute(text(_CREATE_USER), params)
+        conn.execute(
+            text(_CREATE_ACTIVITIES),
+            params | {"activities": activities, "regions": regions, "per_activity": per_activity},
+        )
+        statements = user_regions.rebuild_activity_region_statements(user_id) + user_regions.rebuild_statements(user_id)
+        for stmt, stmt_params in statements:
+            conn.execute(stmt, stmt_params)
+    conn.execute(text("ANALYZE activity, activity_region, user_region"))
+
+
+def _params(conn: Connection, activities: int) -> dict:
+    """Query parameters pointing at the first synthetic user, its most visited region and one of its activities."""
+    region_id = conn.execute(
+        text("SELECT region_id FROM user_region WHERE user_id = :user_id ORDER BY visit_count DESC LIMIT 1"),
+        {"user_id": _USER_ID},
+    ).scalar_one()
+    return {
+        "user_id": _USER_ID,
+        "region_id": region_id,
+        "activity_id": _ACTIVITY_ID_BASE + activities // 2,
+    }
+
+
+def _bind(sql: str, params: dict) -> TextClause:
+    return text(sql).bindparams(**{k: v for k, v in params.items() if f":{k}" in sql})
+
+
+def bench_regions(
+    db_url: str, activities: int = 10_000, regions: int = 2_500, per_activity: int = 15, repeat: int = 20
+) -> dict[str, dict[str, tuple[float, bool]]]:
+    """
+    Compare region queries on JSONB columns with activity_region and user_region for a synthetic user.
+    Synthetic data is created in a transaction which is rolled back at the end.
+    Returns query -> variant -> (mean seconds per query, result same as the JSONB variant).
+    """
+    engine = create_engine(db_url)
+    with engine.connect() as conn:
+        transaction = conn.begin()
+        try:
+            _prepare(conn, activities, regions, per_activity)
+            params = _params(conn, activities)
+            results: dict[str, dict[str, tuple[float, bool]]] = {}
+            for query_name, variants in QUERIES.items():
+                results[query_name] = {}
+                reference = None
+                for variant, sql in variants.items():
+                    stmt = _bind(sql, params)
+                    rows: list[tuple] = []
+                    started = time.perf_counter()
+                    for _ in range(repeat):
+                        rows = [tuple(row) for row in conn.execute(stmt)]
+                    elapsed = (time.perf_counter() - started) / max(repeat, 1)
+                    if reference is None:
+                        reference = rows
+                    results[query_name][variant] = (elapsed, rows == reference)
+            return results
+        finally:
+            transaction.rollback()
+
+
+# queries served by indexes, per-user lookups must never scan whole tables
+PLAN_QUERIES = {
+    "unlocked": QUERIES["unlocked"]["user_region"],
+    "detail": QUERIES["detail"]["user_region"],
+    "detail-activities": QUERIES["detail"]["activity_region"],
+    "new-regions": QUERIES["new-regions"]["user_region"],
+    "regions-so-far": """
+        SELECT count(*) FROM user_region
+        WHERE user_id = :user_id AND NOT additional AND first_visited <= now()
+    """,
+    "activities": """
+        SELECT id, name, start FROM activity
+        WHERE user_id = :user_id
+        ORDER BY start DESC
+        LIMIT 30
+    """,
+}
+
+_INDEXED_TABLES = {"activity", "activity_region", "user_region"}
+
+
+def _seq_scans(plan: dict) -> list[str]:
+    """Tables from _INDEXED_TABLES scanned sequentially anywhere in the plan."""
+    found = []
+    if plan.get("Node Type") == "Seq Scan" and plan.get("Relation Name") in _INDEXED_TABLES:
+        found.append(plan["Relation Name"])
+    for child in plan.get("Plans", []):
+        found.extend(_seq_scans(child))
+    return found
+
+
+def check_plans(
+    db_url: str, users: int = 50, activities: int = 200, regions: int = 2_500, per_activity: int = 15
+) -> dict[str, list[str]]:
+    """
+    Check that per-user queries are planned as index scans, on synthetic users added to the database.
+    Synthetic data is created in a transaction which is rolled back at the end.
+    Returns query -> tables scanned sequentially, empty lists mean the check passed.
+    """
+    engine = create_engine(db_url)
+    with engine.connect() as conn:
+        transaction = conn.begin()
+        try:
+            _prepare(conn, activities, regions, per_activity, users)
+            params = _params(conn, activities)
+            results: dict[str, list[str]] = {}
+            for query_name, sql in PLAN_QUERIES.items():
+                plan = conn.execute(_bind("EXPLAIN (FORMAT JSON) " + sql.strip(), params)).scalar_one()
+                results[query_name] = _seq_scans(plan[0]["Plan"])
+            return results
+        finally:
+            transaction.rollback()
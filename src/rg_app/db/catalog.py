@@ -0,0 +1,63 @@
+import asyncio
+import hashlib
+import json
+from collections import Counter
+from dataclasses import dataclass
+from typing import Iterable, Sequence
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from rg_app.db.models import Region
+
+
+@dataclass(frozen=True)
+class RegionInfo:
+    name: str | None
+    type: str
+    ancestors: list[str]
+
+
+def catalog_version(regions: Iterable[Sequence]) -> str:
+    """Version stamp of region rows (id, name, type, ancestors), independent of row order."""
+    rows = sorted([row[0], row[1], row[2], list(row[3] or [])] for row in regions)
+    return hashlib.sha1(json.dumps(rows).encode()).hexdigest()[:16]
+
+
+class RegionCatalog:
+    """
+    Process-local copy of the region table, which only changes with `rg-geo pg-export`.
+    Loaded once at startup and reloaded when `rg.internal.regions.reload` is published.
+    """
+
+    def __init__(self):
+        self._regions: dict[str, RegionInfo] = {}
+        self._totals: dict[str, int] = {}
+        self.version: str | None = None
+        self._lock = asyncio.Lock()
+
+    async def reload(self, session: AsyncSession) -> bool:
+        """Load regions from the database, returns True if the content has changed."""
+        async with self._lock:
+            result = await session.execute(select(Region.id, Region.name, Region.type, Region.ancestors))
+            rows = result.all()
+            version = catalog_version(rows)
+            if version == self.version:
+                return False
+            self._regions = {row.id: RegionInfo(row.name, row.type, list(row.ancestors or [])) for row in rows}
+            self._totals = dict(Counter(info.type for info in self._regions.values()))
+            self.version = version
+            return True
+
+    def __len__(self) -> int:
+        return len(self._regions)
+
+    def __contains__(self, region_id: str) -> bool:
+        return region_id in self._regions
+
+    def get(self, region_id: str) -> RegionInfo | None:
+        return self._regions.get(region_id)
+
+    def total(self, region_type: str) -> int:
+        """Number of regions of the given type, e.g. GMI."""
+        return self._totals.get(region_type, 0)
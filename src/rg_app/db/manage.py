@@ -1,15 +1,20 @@
 import os
 import re
 import time
+from typing import Sequence
 
 import alembic.command
 import alembic.config
 from sqlalchemy import MetaData, create_engine, text
 
 import rg_app.db.models
+from rg_app.db import user_regions
 
 _SCHEME = "postgresql+psycopg"
 
+# tables with a cluster index, see migration 0f9c27d4a6e1
+CLUSTER_TABLES = ("activity", "activity_region", "user_region")
+
 
 def generate_url(
     username: str, password: str, dbname: str = "postgres", host: str = "localhost", port: str = "5432"
@@ -17,11 +22,15 @@ def generate_url(
     return f"{_SCHEME}://{username}:{password}@{host}:{port}/{dbname}"
 
 
-def migrate(db_url: str):
-    pkg_path = os.path.dirname(rg_app.db.__file__)
-
+def normalize_url(db_url: str) -> str:
     if not re.match(r"^[a-z]+(\+[a-z]+)?://", db_url):
         db_url = f"{_SCHEME}://{db_url}"
+    return db_url
+
+
+def migrate(db_url: str):
+    pkg_path = os.path.dirname(rg_app.db.__file__)
+    db_url = normalize_url(db_url)
 
     alembic_cfg = alembic.config.Config(os.path.join(pkg_path, "alembic.ini"))
     alembic_cfg.set_main_option("sqlalchemy.url", db_url)
@@ -42,6 +51,34 @@ def migrate(db_url: str):
     alembic.command.upgrade(alembic_cfg, "head")
 
 
+def backfill_user_regions(db_url: str, user_id: int | None = None) -> int:
+    """
+    Rebuild activity_region and user_region from activities, for all users or only the given one.
+    Returns number of user_region rows.
+    """
+    engine = create_engine(normalize_url(db_url))
+    with engine.begin() as conn:
+        for stmt, params in user_regions.rebuild_activity_region_statements(user_id):
+            conn.execute(stmt, params)
+        delete_stmt, aggregate_stmt, bump_stmt = user_regions.rebuild_statements(user_id)
+        conn.execute(*delete_stmt)
+        rowcount = conn.execute(*aggregate_stmt).rowcount
+        conn.execute(*bump_stmt)
+    return rowcount
+
+
+def cluster(db_url: str, tables: Sequence[str] = CLUSTER_TABLES) -> None:
+    """
+    Rewrite tables in the order of their cluster index (set by migrations), so rows of a user are stored together.
+    Takes an exclusive lock on every table while it is rewritten, meant for maintenance windows.
+    """
+    engine = create_engine(normalize_url(db_url), isolation_level="AUTOCOMMIT")
+    with engine.connect() as conn:
+        for table in tables:
+            conn.execute(text(f'CLUSTER "{table}"'))
+            conn.execute(text(f'ANALYZE "{table}"'))
+
+
 def obtain_metadata() -> MetaData:
     from rg_app.db.models import Base
 
@@ -1,4 +1,4 @@
 from .base import Base
-from .models import Activity, IneligibleActivity, Region, User
+from .models import Activity, ActivityDetail, ActivityRegion, IneligibleActivity, Region, User, UserRegion
 
-__all__ = ["Base", "User", "Activity", "Region", "IneligibleActivity"]
+__all__ = ["Base", "User", "Activity", "ActivityDetail", "ActivityRegion", "Region", "IneligibleActivity", "UserRegion"]
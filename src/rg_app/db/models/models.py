@@ -2,7 +2,7 @@ from datetime import UTC, datetime
 from decimal import Decimal
 from typing import Any, Optional
 
-from sqlalchemy import BigInteger, Boolean, ForeignKey, Integer, Numeric, String, func
+from sqlalchemy import BigInteger, Boolean, ForeignKey, Index, Integer, Numeric, String, Text, func
 from sqlalchemy.dialects.postgresql import ARRAY, JSONB
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -30,6 +30,8 @@ class User(Base):
     strava_account_created_at: Mapped[datetime] = mapped_column(
         UTCDateTime, default=lambda: datetime.now(UTC), server_default=func.now()
     )
+    # bumped whenever user_region rows of the user change, used for HTTP caching
+    data_version: Mapped[int] = mapped_column(BigInteger, default=0, server_default="0")
     update_strava_desc: Mapped[int] = mapped_column(
         Integer, default=DescUpdateOptions.NONE.value, server_default=str(DescUpdateOptions.NONE.value)
     )
@@ -43,10 +45,16 @@ class User(Base):
         back_populates="user",
         cascade="all, delete",
     )
+    regions: Mapped[list["UserRegion"]] = relationship(
+        "UserRegion",
+        back_populates="user",
+        cascade="all, delete",
+    )
 
 
 class Activity(Base):
     __tablename__ = "activity"
+    __table_args__ = (Index("ix_activity_user_id_start", "user_id", "start"),)
 
     id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("user.id"))
@@ -58,7 +66,6 @@ class Activity(Base):
     elapsed_time: Mapped[int] = mapped_column(BigInteger)
     distance: Mapped[Decimal] = mapped_column(Numeric(8, 1))
 
-    track: Mapped[str] = mapped_column(JSONB)
     track_is_detailed: Mapped[bool] = mapped_column(Boolean)
 
     elevation_gain: Mapped[Optional[Decimal]] = mapped_column(Numeric(6, 1), nullable=True)
@@ -71,13 +78,48 @@ class Activity(Base):
     visited_regions: Mapped[list[str]] = mapped_column(JSONB)
     visited_regions_additional: Mapped[list[str]] = mapped_column(JSONB)
 
-    full_data: Mapped[dict[str, Any]] = mapped_column(JSONB, nullable=True)
-
     user: Mapped[User] = relationship("User", back_populates="activities")
+    # bulky data kept out of the activity row, loaded only when accessed
+    detail: Mapped[Optional["ActivityDetail"]] = relationship(
+        "ActivityDetail",
+        back_populates="activity",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+        uselist=False,
+    )
+
+
+class ActivityDetail(Base):
+    __tablename__ = "activity_detail"
+
+    activity_id: Mapped[int] = mapped_column(ForeignKey("activity.id", ondelete="CASCADE"), primary_key=True)
+    # encoded polyline (precision 5), as received from Strava
+    polyline: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    full_data: Mapped[Optional[dict[str, Any]]] = mapped_column(JSONB, nullable=True)
+
+    activity: Mapped[Activity] = relationship("Activity", back_populates="detail")
+
+
+class ActivityRegion(Base):
+    """
+    Regions visited by an activity, one row per region, mirrors visited_regions and visited_regions_additional.
+    Denormalized user_id and start allow indexed per-user lookups without touching activities.
+    """
+
+    __tablename__ = "activity_region"
+    __table_args__ = (Index("ix_activity_region_user_id_region_id_start", "user_id", "region_id", "start"),)
+
+    activity_id: Mapped[int] = mapped_column(ForeignKey("activity.id", ondelete="CASCADE"), primary_key=True)
+    region_id: Mapped[str] = mapped_column(String(16), primary_key=True)
+    user_id: Mapped[int] = mapped_column(BigInteger)
+    start: Mapped[datetime] = mapped_column(UTCDateTime)
+    # True for regions from visited_regions_additional (not GMI)
+    additional: Mapped[bool] = mapped_column(Boolean)
 
 
 class IneligibleActivity(Base):
     __tablename__ = "ineligible_activity"
+    __table_args__ = (Index("ix_ineligible_activity_user_id_start", "user_id", "start"),)
 
     id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("user.id"))
@@ -95,3 +137,24 @@ class Region(Base):
     name: Mapped[str | None] = mapped_column(String(255), nullable=True)
     type: Mapped[str] = mapped_column(String(8), index=True)
     ancestors: Mapped[list[str]] = mapped_column(ARRAY(String(16), dimensions=1))
+
+
+class UserRegion(Base):
+    """
+    Regions visited by the user, aggregated over activities.
+    Maintained by rg_app.db.user_regions whenever activities change.
+    """
+
+    __tablename__ = "user_region"
+    __table_args__ = (Index("ix_user_region_user_id_first_visited", "user_id", "first_visited"),)
+
+    user_id: Mapped[int] = mapped_column(ForeignKey("user.id"), primary_key=True)
+    region_id: Mapped[str] = mapped_column(String(16), primary_key=True)
+    # True for regions from visited_regions_additional (not GMI)
+    additional: Mapped[bool] = mapped_column(Boolean)
+    first_visited: Mapped[datetime] = mapped_column(UTCDateTime)
+    last_visited: Mapped[datetime] = mapped_column(UTCDateTime)
+    visit_count: Mapped[int] = mapped_column(Integer)
+    last_activity_id: Mapped[int] = mapped_column(BigInteger)
+
+    user: Mapped[User] = relationship("User", back_populates="regions")
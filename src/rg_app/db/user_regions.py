@@ -0,0 +1,181 @@
+"""
+Maintenance of the activity_region and user_region tables.
+
+activity_region mirrors visited regions of each activity as rows,
+user_region aggregates them per user. New activities are added to user_region incrementally,
+changed and deleted ones trigger a recomputation of the affected regions from activity_region.
+Every change bumps user.data_version.
+"""
+
+from typing import Iterable
+
+from sqlalchemy import String, bindparam, case, delete, func, text, tuple_, update
+from sqlalchemy.dialects.postgresql import ARRAY, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.elements import TextClause
+
+from rg_app.db.models import Activity, ActivityRegion, User, UserRegion
+
+_DELETE_ACTIVITY_REGIONS = "DELETE FROM activity_region WHERE TRUE"
+
+# activity JSONB exploded into one row per region
+_EXPLODE_ACTIVITY_REGIONS = """
+INSERT INTO activity_region (activity_id, region_id, user_id, start, additional)
+SELECT DISTINCT ON (a.id, r.region_id) a.id, r.region_id, a.user_id, a.start, r.additional
+FROM activity a
+CROSS JOIN LATERAL (
+    SELECT value AS region_id, FALSE AS additional FROM jsonb_array_elements_text(a.visited_regions)
+    UNION ALL
+    SELECT value AS region_id, TRUE AS additional FROM jsonb_array_elements_text(a.visited_regions_additional)
+) r
+WHERE TRUE {filters}
+ORDER BY a.id, r.region_id, r.additional
+"""
+
+_DELETE_USER_REGIONS = "DELETE FROM user_region WHERE TRUE"
+
+# activity regions aggregated per (user, region)
+_AGGREGATE_USER_REGIONS = """
+INSERT INTO user_region (
+    user_id, region_id, additional, first_visited, last_visited, visit_count, last_activity_id
+)
+SELECT
+    user_id,
+    region_id,
+    bool_and(additional),
+    min(start),
+    max(start),
+    count(*),
+    (array_agg(activity_id ORDER BY start DESC, activity_id DESC))[1]
+FROM activity_region
+WHERE TRUE {filters}
+GROUP BY user_id, region_id
+ON CONFLICT (user_id, region_id) DO UPDATE SET
+    additional = EXCLUDED.additional,
+    first_visited = EXCLUDED.first_visited,
+    last_visited = EXCLUDED.last_visited,
+    visit_count = EXCLUDED.visit_count,
+    last_activity_id = EXCLUDED.last_activity_id
+"""
+
+_BUMP_DATA_VERSION = 'UPDATE "user" SET data_version = data_version + 1 WHERE TRUE'
+
+
+def activity_regions(activity: Activity) -> set[str]:
+    """All regions visited by the activity, GMI and additional ones."""
+    return set(activity.visited_regions or []) | set(activity.visited_regions_additional or [])
+
+
+def _additional_flags(activity: Activity) -> dict[str, bool]:
+    """Regions visited by the activity, mapped to whether they are additional (not GMI)."""
+    flags = {region_id: True for region_id in activity.visited_regions_additional or []}
+    flags.update({region_id: False for region_id in activity.visited_regions or []})
+    return flags
+
+
+def rebuild_statements(
+    user_id: int | None = None, region_ids: Iterable[str] | None = None
+) -> list[tuple[TextClause, dict]]:
+    """
+    Statements (with parameters) recomputing user_region rows from activity_region,
+    for all users or only the given one, for all regions or only the given ones.
+    Rows of regions no longer visited are removed and data versions of affected users are bumped.
+    Upserting makes concurrent recomputations of the same rows safe.
+    """
+    filters, params, user_filters = "", {}, ""
+    if user_id is not None:
+        filters += " AND user_id = :user_id"
+        user_filters = " AND id = :user_id"
+        params["user_id"] = user_id
+    if region_ids is not None:
+        filters += " AND region_id = ANY(:region_ids)"
+        params["region_ids"] = sorted(region_ids)
+
+    statements = [text(_DELETE_USER_REGIONS + filters), text(_AGGREGATE_USER_REGIONS.format(filters=filters))]
+    if region_ids is not None:
+        statements = [stmt.bindparams(bindparam("region_ids", type_=ARRAY(String))) for stmt in statements]
+    bump_params = {"user_id": user_id} if user_id is not None else {}
+    return [(stmt, params) for stmt in statements] + [(text(_BUMP_DATA_VERSION + user_filters), bump_params)]
+
+
+def rebuild_activity_region_statements(user_id: int | None = None) -> list[tuple[TextClause, dict]]:
+    """Statements (with parameters) recreating activity_region rows from activities, of all users or the given one."""
+    delete_filters, explode_filters, params = "", "", {}
+    if user_id is not None:
+        delete_filters = " AND user_id = :user_id"
+        explode_filters = " AND a.user_id = :user_id"
+        params["user_id"] = user_id
+    return [
+        (text(_DELETE_ACTIVITY_REGIONS + delete_filters), params),
+        (text(_EXPLODE_ACTIVITY_REGIONS.format(filters=explode_filters)), params),
+    ]
+
+
+async def store_activity_regions(session: AsyncSession, activity: Activity) -> None:
+    """Replace activity_region rows of the activity, which must be flushed already."""
+    await store_activity_regions_bulk(session, [activity])
+
+
+async def store_activity_regions_bulk(session: AsyncSession, activities: list[Activity]) -> None:
+    """Replace activity_region rows of the activities, which must be stored already, with one insert."""
+    if not activities:
+        return
+    await session.execute(delete(ActivityRegion).where(ActivityRegion.activity_id.in_([a.id for a in activities])))
+    rows = [
+        {
+            "activity_id": activity.id,
+            "region_id": region_id,
+            "user_id": activity.user_id,
+            "start": activity.start,
+            "additional": additional,
+        }
+        for activity in activities
+        for region_id, additional in _additional_flags(activity).items()
+    ]
+    if rows:
+        await session.execute(insert(ActivityRegion).values(rows))
+
+
+async def refresh(session: AsyncSession, user_id: int, region_ids: Iterable[str]) -> None:
+    """Recompute the given regions of the user, activity_region must be up to date and flushed first."""
+    region_ids = set(region_ids)
+    if not region_ids:
+        return
+    for stmt, params in rebuild_statements(user_id, region_ids):
+        await session.execute(stmt, params)
+
+
+async def add_activity(session: AsyncSession, activity: Activity) -> None:
+    """Account for an activity not counted in user_region yet."""
+    flags = _additional_flags(activity)
+    if not flags:
+        return
+
+    stmt = insert(UserRegion).values(
+        [
+            {
+                "user_id": activity.user_id,
+                "region_id": region_id,
+                "additional": additional,
+                "first_visited": activity.start,
+                "last_visited": activity.start,
+                "visit_count": 1,
+                "last_activity_id": activity.id,
+            }
+            for region_id, additional in flags.items()
+        ]
+    )
+    newer = tuple_(stmt.excluded.last_visited, stmt.excluded.last_activity_id) > tuple_(
+        UserRegion.last_visited, UserRegion.last_activity_id
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[UserRegion.user_id, UserRegion.region_id],
+        set_={
+            "first_visited": func.least(UserRegion.first_visited, stmt.excluded.first_visited),
+            "last_visited": func.greatest(UserRegion.last_visited, stmt.excluded.last_visited),
+            "visit_count": UserRegion.visit_count + 1,
+            "last_activity_id": case((newer, stmt.excluded.last_activity_id), else_=UserRegion.last_activity_id),
+        },
+    )
+    await session.execute(stmt)
+    await session.execute(update(User).where(User.id == activity.user_id).values(data_version=User.data_version + 1))
@@ -1,10 +1,11 @@
 import os
+import time
 
 import click
 
-from .duck_export import pg_export
+from .duck_export import notify_regions_reload, pg_export
 from .duck_source import create_db
-from .preprocessing import preprocess_gml
+from .preprocessing import FORMATS, preprocess_dir, preprocess_gml
 
 ENV_PG_CONN = "PG_CONN"
 
@@ -45,22 +46,120 @@ def cmd_preprocess(path: str):
     click.echo("Preprocessing complete")
 
 
-@cli.command(help="Perform DB migrations", name="pg-export")
+@cli.command(help="Preprocess all PRG layers in a directory concurrently", name="preprocess-all")
+@click.option("--path", help="Path to the dir with PRG GML files", required=True)
+@click.option(
+    "--format",
+    "formats",
+    help="Output format, may be repeated",
+    type=click.Choice(list(FORMATS)),
+    multiple=True,
+    default=["parquet"],
+)
+@click.option("--workers", help="Number of worker processes, defaults to one per file", type=int, default=None)
+def cmd_preprocess_all(path: str, formats: list[str], workers: int | None):
+    click.echo(f"Preprocessing PRG layers in {path} to {', '.join(formats)}")
+    for target_path in preprocess_dir(path, formats, workers):
+        click.echo(f"Created {target_path}")
+    click.echo("Preprocessing complete")
+
+
+@cli.command(help="Export regions to Postgres", name="pg-export")
 @click.option(
     "--pg_conn",
     help="Postgres connection string like 'dbname=postgres host=localhost user=postgres password=postgres'",
     default=None,
 )
 @click.option("--db_path", help="Path to the DuckDB database file", default=None)
-def cmd_pg_export(pg_conn: str | None, db_path: str | None = None):
-    click.echo("Exporting DuckDB regions to Postgres")
+@click.option("--nats_url", help="NATS URL, if given region catalogs of running services are reloaded", default=None)
+@click.option("--nats_creds", help="Path to NATS credentials file", default=None)
+@click.option("--dry-run", "dry_run", is_flag=True, help="Only report regions that would change")
+def cmd_pg_export(
+    pg_conn: str | None,
+    db_path: str | None = None,
+    nats_url: str | None = None,
+    nats_creds: str | None = None,
+    dry_run: bool = False,
+):
+    click.echo("Exporting DuckDB regions to Postgres" + (" (dry run)" if dry_run else ""))
     pg_conn = pg_conn or os.getenv(ENV_PG_CONN)
     if not pg_conn:
         click.echo(f"Missing required argument --pg_conn or environment variable {ENV_PG_CONN}", err=True)
         exit(1)
 
-    pg_export(pg_conn, db_path)
+    started = time.monotonic()
+    version, diff = pg_export(pg_conn, db_path, dry_run)
+    elapsed = time.monotonic() - started
+    if dry_run:
+        for kind in ("inserted", "updated", "missing"):
+            for region_id in getattr(diff, kind):
+                click.echo(f"{kind:>8}: {region_id}")
+    click.echo(
+        f"{len(diff.inserted)} new, {len(diff.updated)} changed, {len(diff.missing)} only in Postgres (kept), "
+        f"region catalog version {version}, took {elapsed:.2f} s"
+    )
+    if dry_run:
+        return
     click.echo("Export complete")
+    if nats_url:
+        notify_regions_reload(nats_url, version, nats_creds)
+        click.echo("Region catalog reload requested")
+
+
+@cli.command(help="Build commune grid index for geo checks", name="mkgrid")
+@click.option("--db_path", help="Path to the DuckDB database file", default="data/geo.db")
+@click.option("--cell_size", help="Grid cell size in degrees", default=0.005)
+@click.option("--output", help="Output path", default="data/geo.grid")
+def cmd_mkgrid(db_path: str, cell_size: float, output: str):
+    from rg_app.common.geo import BorderGrid, BorderIndex, connect
+
+    click.echo(f"Building commune grid with cell size {cell_size}")
+    with connect(db_path, read_only=True) as conn:
+        index = BorderIndex.from_duckdb(conn)
+    grid = BorderGrid.build(index, cell_size)
+    grid.save(output)
+    resolved = (grid.cells >= 0).mean()
+    click.echo(
+        f"Saved {grid.cells.shape[1]}x{grid.cells.shape[0]} grid to {output}, {resolved:.1%} cells inside a commune"
+    )
+
+
+@cli.command(help="Export border geometries to a memory-mappable geometry store", name="mkstore")
+@click.option("--db_path", help="Path to the DuckDB database file", default="data/geo.db")
+@click.option("--output", help="Output path", default="data/geo.store")
+def cmd_mkstore(db_path: str, output: str):
+    from rg_app.common.geo import BorderIndex, GeometryStore, connect
+
+    click.echo("Exporting border geometries")
+    with connect(db_path, read_only=True) as conn:
+        index = BorderIndex.from_duckdb(conn)
+    GeometryStore.save(output, index)
+    click.echo(f"Saved {len(index)} borders to {output}")
+
+
+@cli.command(help="Install DuckDB extensions into a local directory for offline use", name="bundle-ext")
+@click.option("--output", help="Extension directory", default="data/duckdb-ext")
+@click.option("--extension", "extensions", help="Extension to bundle", multiple=True, default=["spatial", "postgres"])
+def cmd_bundle_ext(output: str, extensions: list[str]):
+    from rg_app.common.geo import bundle_extensions
+    from rg_app.common.geo.duck_ext import ENV_EXTENSION_DIR
+
+    bundle_extensions(output, extensions)
+    click.echo(f"Bundled {', '.join(extensions)} into {output}, set {ENV_EXTENSION_DIR}={output} to use them")
+
+
+@cli.command(help="Benchmark region lookup modes on synthetic tracks", name="bench-lookup")
+@click.option("--db_path", help="Path to the DuckDB database file", default="data/geo.db")
+@click.option("--count", help="Number of tracks", default=200)
+@click.option("--points", help="Points per track", default=500)
+@click.option("--seed", help="Random seed", default=0)
+@click.option("--tolerance", help="Simplification tolerance for the strtree-simplified mode", default=1e-4)
+def cmd_bench_lookup(db_path: str, count: int, points: int, seed: int, tolerance: float):
+    from .bench import bench_lookup
+
+    click.echo(f"Benchmarking region lookup on {count} tracks with {points} points each")
+    for mode, (mean_time, mismatches) in bench_lookup(db_path, count, points, seed, tolerance).items():
+        click.echo(f"{mode:>22}: {mean_time * 1000:8.2f} ms/track, {mismatches} mismatches")
 
 
 def main():
@@ -0,0 +1,80 @@
+import time
+from typing import Callable
+
+import duckdb
+import numpy as np
+import shapely
+
+from rg_app.common.geo import BorderIndex, connect, run_query, run_query_hierarchical, track_geometry
+
+# Mean step of a synthetic track in degrees, ~250 m in Poland
+_STEP = 0.0025
+
+
+def random_tracks(
+    conn: duckdb.DuckDBPyConnection, count: int, points: int, seed: int = 0
+) -> list[list[tuple[float, float]]]:
+    """
+    Generate random-walk tracks starting inside the country border.
+    Heading changes slowly, so tracks resemble rides rather than noise.
+    """
+    wkb = conn.execute("SELECT ST_AsWKB(shape) FROM borders WHERE parent_id IS NULL").fetchone()
+    assert wkb is not None, "Country border not found"
+    country = shapely.from_wkb(bytes(wkb[0]))
+    shapely.prepare(country)
+    min_x, min_y, max_x, max_y = country.bounds
+    rng = np.random.default_rng(seed)
+    tracks = []
+    while len(tracks) < count:
+        start = rng.uniform((min_x, min_y), (max_x, max_y))
+        if not country.contains(shapely.points(start)):
+            continue
+        heading = rng.uniform(0, 2 * np.pi) + np.cumsum(rng.normal(0, 0.15, points))
+        steps = np.column_stack((np.cos(heading), np.sin(heading))) * _STEP * rng.uniform(0.5, 1.5, (points, 1))
+        coords = start + np.cumsum(steps, axis=0)
+        tracks.append([(float(x), float(y)) for x, y in coords])
+    return tracks
+
+
+def _geometry(track: list[tuple[float, float]]) -> shapely.Geometry:
+    geometry = track_geometry(track)
+    assert geometry is not None, "Empty tracks are not benchmarked"
+    return geometry
+
+
+def _time(fn: Callable[[list[tuple[float, float]]], list[tuple[str, str]]], tracks: list[list[tuple[float, float]]]):
+    results = []
+    started = time.perf_counter()
+    for track in tracks:
+        results.append(sorted(fn(track)))
+    return time.perf_counter() - started, results
+
+
+def bench_lookup(
+    db_path: str, count: int, points: int, seed: int = 0, tolerance: float = 1e-4
+) -> dict[str, tuple[float, int]]:
+    """
+    Compare region lookup modes on synthetic tracks.
+    Returns mode -> (mean seconds per track, number of tracks with results different from flat DuckDB query).
+    """
+    with connect(db_path, read_only=True) as conn:
+        # empty tracks (no points) match nothing in every mode
+        tracks = [track for track in random_tracks(conn, count, points, seed) if track]
+        index = BorderIndex.from_duckdb(conn)
+
+        modes: dict[str, Callable[[list[tuple[float, float]]], list[tuple[str, str]]]] = {
+            "duckdb-flat": lambda t: run_query(conn, shapely.to_wkb(_geometry(t))),
+            "duckdb-hierarchical": lambda t: run_query_hierarchical(conn, shapely.to_wkb(_geometry(t))),
+            "strtree-flat": lambda t: index.query(_geometry(t)),
+            "strtree-hierarchical": lambda t: index.query(_geometry(t), hierarchical=True),
+            "strtree-simplified": lambda t: index.query(_geometry(t), tolerance=tolerance),
+        }
+        results: dict[str, tuple[float, int]] = {}
+        reference = None
+        for mode, fn in modes.items():
+            elapsed, found = _time(fn, tracks)
+            if reference is None:
+                reference = found
+            mismatches = sum(1 for a, b in zip(reference, found) if a != b)
+            results[mode] = (elapsed / max(len(tracks), 1), mismatches)
+        return results
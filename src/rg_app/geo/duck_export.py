@@ -1,48 +1,97 @@
-import duckdb
+import asyncio
+from dataclasses import dataclass, field
 
+from rg_app.common.geo import connect
 
-def pg_export(pg_url: str, db_path: str | None = None) -> None:
+_CREATE_STAGING = """
+CREATE TEMPORARY TABLE region_staging (LIKE region INCLUDING DEFAULTS) ON COMMIT DROP
+"""
+
+_COPY_STAGING = "COPY region_staging (id, name, type, ancestors) FROM STDIN"
+
+# kind of change (RegionDiff field) for every region differing between staging and region table
+_DIFF = """
+SELECT CASE WHEN r.id IS NULL THEN 'inserted' WHEN s.id IS NULL THEN 'missing' ELSE 'updated' END, COALESCE(s.id, r.id)
+FROM region_staging s
+FULL JOIN region r ON r.id = s.id
+WHERE r.id IS NULL OR s.id IS NULL OR (s.name, s.type, s.ancestors) IS DISTINCT FROM (r.name, r.type, r.ancestors)
+ORDER BY 2
+"""
+
+_UPSERT = """
+INSERT INTO region (id, name, type, ancestors)
+SELECT id, name, type, ancestors FROM region_staging
+ON CONFLICT (id) DO UPDATE
+SET name = EXCLUDED.name, type = EXCLUDED.type, ancestors = EXCLUDED.ancestors
+WHERE (region.name, region.type, region.ancestors) IS DISTINCT FROM (EXCLUDED.name, EXCLUDED.type, EXCLUDED.ancestors)
+"""
+
+
+@dataclass
+class RegionDiff:
+    """IDs of regions new to Postgres, changed, and present in Postgres only (these are left untouched)."""
+
+    inserted: list[str] = field(default_factory=list)
+    updated: list[str] = field(default_factory=list)
+    missing: list[str] = field(default_factory=list)
+
+
+def pg_export(pg_url: str, db_path: str | None = None, dry_run: bool = False) -> tuple[str, RegionDiff]:
+    """
+    Export regions to Postgres, returns region catalog version of the exported regions and differences found.
+    Regions are copied into a staging table with COPY and upserted in one statement, only changed rows are written.
+    With dry_run, differences are only reported and nothing is written.
+    """
     try:
         import psycopg as _  # noqa
         import sqlalchemy as sa
-        from sqlalchemy.dialects.postgresql import insert
-        from rg_app.db import Region
+        from rg_app.db.catalog import catalog_version
     except ImportError:
         raise ImportError(
             "This command requires sqlalchemy and psycopg, install oprional dependencies named db (rg-app[db])"
         )
     db_path = db_path or "data/geo.db"
-    conn = duckdb.connect(db_path, read_only=True)
-    conn.install_extension("postgres")
-    conn.install_extension("spatial")
-    conn.load_extension("postgres")
-    conn.load_extension("spatial")
-    # Below won't work due to DuckDB not recognizing ON CONFLICT and postgresql primary keys
-    # conn.execute("""
-    #         INSERT INTO pdb.region
-    #         (SELECT ID as id, type as type, ancestors as ancestors FROM borders)
-    #         ON CONFLICT (id) DO UPDATE
-    #         SET type = EXCLUDED.type,
-    #             ancestors = EXCLUDED.ancestors
-    #         """)
-
-    # Get all regions from DuckDB
-    regions = conn.execute("SELECT ID as id, type, ancestors, name FROM borders").fetchall()
+    with connect(db_path, read_only=True) as conn:
+        regions = conn.execute("SELECT ID, name, type, ancestors FROM borders").fetchall()
 
     engine = sa.create_engine(pg_url)
+    raw_conn = engine.raw_connection()
+    try:
+        pg_conn = raw_conn.driver_connection
+        assert pg_conn is not None
+        with pg_conn.transaction(force_rollback=dry_run), pg_conn.cursor() as cursor:
+            cursor.execute(_CREATE_STAGING)
+            with cursor.copy(_COPY_STAGING) as copy:
+                for region in regions:
+                    copy.write_row(region)
+            diff = RegionDiff()
+            for kind, region_id in cursor.execute(_DIFF).fetchall():
+                getattr(diff, kind).append(region_id)
+            if not dry_run:
+                cursor.execute(_UPSERT)
+    finally:
+        raw_conn.close()
+    return catalog_version(regions), diff
+
 
-    with engine.connect() as pg_conn:
-        for region in regions:
-            insert_stmt = (
-                insert(Region)
-                .values(id=region[0], type=region[1], ancestors=region[2], name=region[3])
-                .on_conflict_do_update(
-                    index_elements=[Region.id],
-                    set_={"type": region[1], "ancestors": region[2], "name": region[3]},
-                )
+def notify_regions_reload(nats_url: str, version: str, creds_path: str | None = None) -> None:
+    """Ask workers and API processes to reload their region catalogs."""
+    import nats
+
+    from rg_app.common.msg.regions import RegionsReloadMsg
+    from rg_app.nats_defs.subjects import INTERNAL_REGIONS_RELOAD_SUBJECT
+
+    async def _notify():
+        nc = await nats.connect(nats_url, user_credentials=creds_path)
+        try:
+            await nc.publish(
+                INTERNAL_REGIONS_RELOAD_SUBJECT, RegionsReloadMsg(version=version).model_dump_json().encode()
             )
-            pg_conn.execute(insert_stmt)
-        pg_conn.commit()
+            await nc.flush()
+        finally:
+            await nc.close()
+
+    asyncio.run(_notify())
 
 
 if __name__ == "__main__":
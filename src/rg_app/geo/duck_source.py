@@ -1,15 +1,36 @@
 import asyncio
+import os
 
 import duckdb
 
+from rg_app.common.geo import connect
+
+from .preprocessing import FORMATS
+
+
+def _layer_source(data_dir: str, layer: str) -> str:
+    """
+    Table expression reading a preprocessed layer, preferring columnar formats over GeoJSON.
+    Geometry column is exposed as geom, like ST_Read does.
+    """
+    for fmt, ext in FORMATS.items():
+        path = os.path.join(data_dir, layer + ext)
+        if not os.path.exists(path):
+            continue
+        if fmt == "parquet":
+            # GeoParquet geometry is converted to GEOMETRY by the spatial extension
+            return f"(SELECT * EXCLUDE (geometry), geometry AS geom FROM read_parquet('{path}'))"
+        return f"ST_Read('{path}')"
+    raise FileNotFoundError(f"Layer {layer} not found in {data_dir}")
+
 
 def create_db(json_dir: str | None = None, db_path: str | None = None) -> duckdb.DuckDBPyConnection:
+    """
+    Create borders table out of PRG layers preprocessed into json_dir (GeoParquet, FlatGeobuf or GeoJSON).
+    """
     json_dir = json_dir or "data/gml"
     db_path = db_path or "data/geo.db"
-    conn = duckdb.connect(db_path)
-    conn.install_extension("spatial")
-    conn.install_extension("postgres")
-    conn.load_extension("spatial")
+    conn = connect(db_path)
 
     conn.sql("""
              DROP TABLE IF EXISTS borders
@@ -25,7 +46,6 @@ def create_db(json_dir: str | None = None, db_path: str | None = None) -> duckdb
         ancestors VARCHAR[]
     )""")
 
-    communes_json = f"{json_dir}/A03_Granice_gmin.json"
     conn.sql(
         f"""INSERT INTO borders
         SELECT 
@@ -35,10 +55,9 @@ def create_db(json_dir: str | None = None, db_path: str | None = None) -> duckdb
             JPT_NAZWA_ as name,
             CONCAT('PL', LPAD(CAST(JPT_KOD_JE AS VARCHAR), 4, '0')) as parent_id,
             ['PL', CONCAT('PL', LPAD(CAST(JPT_KOD_JE AS VARCHAR), 2, '0')), CONCAT('PL', LPAD(CAST(JPT_KOD_JE AS VARCHAR), 4, '0'))] as ancestors
-        FROM ST_Read('{communes_json}')"""
+        FROM {_layer_source(json_dir, "A03_Granice_gmin")}"""
     )
 
-    counties_json = f"{json_dir}/A02_Granice_powiatow.json"
     conn.sql(
         f"""INSERT INTO borders
         SELECT 
@@ -48,10 +67,9 @@ def create_db(json_dir: str | None = None, db_path: str | None = None) -> duckdb
             JPT_NAZWA_ as name,
             CONCAT('PL', LPAD(CAST(JPT_KOD_JE AS VARCHAR), 2, '0')) as parent_id,
             ['PL', CONCAT('PL', LPAD(CAST(JPT_KOD_JE AS VARCHAR), 2, '0'))] as ancestors
-        FROM ST_Read('{counties_json}')"""
+        FROM {_layer_source(json_dir, "A02_Granice_powiatow")}"""
     )
 
-    voivodeships_json = f"{json_dir}/A01_Granice_wojewodztw.json"
     conn.sql(
         f"""INSERT INTO borders
         SELECT 
@@ -61,10 +79,9 @@ def create_db(json_dir: str | None = None, db_path: str | None = None) -> duckdb
             JPT_NAZWA_ as name,
             'PL' as parent_id,
             ['PL'] as ancestors
-        FROM ST_Read('{voivodeships_json}')"""
+        FROM {_layer_source(json_dir, "A01_Granice_wojewodztw")}"""
     )
 
-    country_json = f"{json_dir}/A00_Granice_panstwa.json"
     conn.sql(
         f"""INSERT INTO borders
         SELECT 
@@ -74,7 +91,7 @@ def create_db(json_dir: str | None = None, db_path: str | None = None) -> duckdb
             JPT_NAZWA_ as name,
             NULL as parent_id,
             [] as ancestors
-        FROM ST_Read('{country_json}')"""
+        FROM {_layer_source(json_dir, "A00_Granice_panstwa")}"""
     )
 
     return conn
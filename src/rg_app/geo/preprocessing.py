@@ -1,22 +1,56 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Sequence
+
 import geopandas
 
 TARGET_CRS = "EPSG:4326"
 SOURCE_CRS = "EPSG:2180"
 
+# PRG layers used to build geo.db: country, voivodeships, counties, communes
+PRG_LAYERS = ("A00_Granice_panstwa", "A01_Granice_wojewodztw", "A02_Granice_powiatow", "A03_Granice_gmin")
+
+# output format -> file extension, in order of preference for create_db
+FORMATS = {
+    "parquet": ".parquet",
+    "fgb": ".fgb",
+    "json": ".json",
+}
 
-def preprocess_gml(path: str) -> None:
-    """Preprocess GML file."""
+
+def preprocess_gml(path: str, formats: Sequence[str] = ("json",)) -> list[str]:
+    """Preprocess GML file, reproject it and save it next to the source in the given formats."""
     gdf = geopandas.read_file(path)
     gdf.geometry.set_crs(crs=SOURCE_CRS, inplace=True, allow_override=True)
     gdf.geometry = gdf.geometry.to_crs(crs=TARGET_CRS)
 
-    if path.endswith(".gml"):
-        target_path = path[:-4] + ".json"
-    else:
-        target_path = path + ".json"
-    print(f"Saving to {target_path}")
-
-    gdf.to_file(target_path, driver="GeoJSON")
+    base_path = path[:-4] if path.endswith(".gml") else path
+    target_paths = []
+    for fmt in formats:
+        target_path = base_path + FORMATS[fmt]
+        print(f"Saving to {target_path}")
+        if fmt == "parquet":
+            gdf.to_parquet(target_path)
+        elif fmt == "fgb":
+            gdf.to_file(target_path, driver="FlatGeobuf")
+        else:
+            gdf.to_file(target_path, driver="GeoJSON")
+        target_paths.append(target_path)
+    return target_paths
+
+
+def preprocess_dir(path: str, formats: Sequence[str] = ("parquet",), workers: int | None = None) -> list[str]:
+    """
+    Preprocess all PRG layers found in the directory concurrently, one process per file.
+    Returns paths of created files.
+    """
+    sources = [os.path.join(path, f"{layer}.gml") for layer in PRG_LAYERS]
+    missing = [source for source in sources if not os.path.exists(source)]
+    if missing:
+        raise FileNotFoundError(f"Missing PRG layers: {', '.join(missing)}")
+    with ProcessPoolExecutor(max_workers=workers or min(len(sources), os.cpu_count() or 1)) as executor:
+        results = executor.map(preprocess_gml, sources, [formats] * len(sources))
+        return [target_path for target_paths in results for target_path in target_paths]
 
 
 if __name__ == "__main__":
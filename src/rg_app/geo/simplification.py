@@ -1,16 +1,15 @@
 import typing as ty
 
-import duckdb
 import geopandas as gpd
 import topojson as tp
 
+from rg_app.common.geo import connect
+
 
 def toposimplify_duckdb(path: str, toposimplify: float) -> str:
     """Create a topology to ensure proper boundaries between regions and simplify it."""
     # shamelessly stolen from https://github.com/kraina-ai/srai/blob/main/srai%2Fregionalizers%2Fadministrative_boundary_regionalizer.py#L313-L332
-    with duckdb.connect(path) as conn:
-        conn.load_extension("spatial")
-
+    with connect(path) as conn:
         df = conn.execute(
             "SELECT borders.ID , ST_AsText(borders.shape) as shape, type, parent_id FROM borders"  # WHERE type='WOJ' OR type='PAN' WHERE type='GMI'
         ).df()
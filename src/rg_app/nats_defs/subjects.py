@@ -2,3 +2,7 @@ def internal_cmd_activity_subject(type: str, athlete_id: int, activity_id: int |
     if activity_id is None:
         return f"rg.internal.cmd.activity.{type}.{athlete_id}"
     return f"rg.internal.cmd.activity.{type}.{athlete_id}.{activity_id}"
+
+
+# core NATS, every worker and API process reloads its region catalog
+INTERNAL_REGIONS_RELOAD_SUBJECT = "rg.internal.regions.reload"
@@ -9,6 +9,13 @@ class NATSConfig(BaseNatsConfig):
     inbox_prefix: str = "_inbox.wkk"
     login_kv: str = "wkk-auth"
     rate_limits_kv: str = "rate-limits"
+    # messages fetched per pull request, at most max_concurrency: fetched messages wait for handling
+    # within ack_wait of the consumer (nats_defs.local), handling one takes several seconds
+    fetch_batch: int = 1
+    # seconds to wait for messages of a pull request
+    fetch_timeout: float = 5.0
+    # messages processed concurrently, activities are uploaded with deliberate pauses between requests
+    max_concurrency: int = 1
 
 
 class Config(BaseConfigModel):
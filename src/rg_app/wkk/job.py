@@ -19,12 +19,22 @@ from sqlalchemy.ext.asyncio import create_async_engine
 
 from rg_app.common.internal.helpers import RIDE_LIKE_TYPES
 from rg_app.common.msg import BaseStruct
-from rg_app.common.strava import RateLimitManager, RLNatsConfig, StravaTokenManager
+from rg_app.common.strava import (
+    RateLimitBudget,
+    RateLimitDeferred,
+    RateLimitManager,
+    RLNatsConfig,
+    StravaTokenManager,
+)
 from rg_app.common.strava.activities import get_activity, get_activity_streams
 from rg_app.common.strava.models.activity import ActivityStreamSet
 
 from .config import Config
 
+# a message makes two reservations and pauses up to ~13 s, all within the 30 s ack_wait of the wkk consumer,
+# longer waits nak it with a delay
+_MAX_RATE_LIMIT_WAIT = 5.0
+
 logging.basicConfig(level=logging.INFO)
 
 
@@ -203,12 +213,13 @@ async def main(config: Config):
         login_kv = await js.key_value(config.nats.login_kv)
         logging.info(f"Connected to JetStream at {config.nats.js_domain}")
 
-        sa_engine = create_async_engine(
-            config.db.get_url(),
-        )
+        sa_engine = create_async_engine(config.db.get_url(), **config.db.get_engine_options())
         ae_stack.push_async_callback(sa_engine.dispose)
 
-        rlm = RateLimitManager(RLNatsConfig(nc, config.nats.rate_limits_kv, config.nats.js_domain))
+        rlm = RateLimitManager(
+            RLNatsConfig(nc, config.nats.rate_limits_kv, config.nats.js_domain),
+            RateLimitBudget(max_wait=_MAX_RATE_LIMIT_WAIT),
+        )
         rlm = await ae_stack.enter_async_context(rlm.begin())
 
         client_secret = config.strava.get_client_secret()
@@ -231,13 +242,26 @@ async def main(config: Config):
         sub = await js.pull_subscribe_bind(config.nats.consumer_name, config.nats.stream_name, inbox_prefix=ps_inbox)
         has_msgs = True
         handle_update = hadnle_update_factory(login_kv, stm, rlm, common_http_client, config)
+        semaphore = asyncio.Semaphore(config.nats.max_concurrency)
+        # every fetched message is handled at once, none waits long for the semaphore
+        fetch_batch = min(config.nats.fetch_batch, config.nats.max_concurrency)
+
+        async def handle_limited(msg: Msg):
+            async with semaphore:
+                # restarts ack_wait of a message which waited for the semaphore
+                await msg.in_progress()
+                try:
+                    await handle_update(msg)
+                except RateLimitDeferred as e:
+                    logging.info(f"Rate limit budget exhausted, message delayed by {e.delay:.0f} s")
+                    await msg.nak(delay=e.delay)
+
         while has_msgs:
             try:
-                msgs = await sub.fetch(1)
+                msgs = await sub.fetch(fetch_batch, timeout=config.nats.fetch_timeout)
             except asyncio.TimeoutError:
                 has_msgs = False
                 break
-            for msg in msgs:
-                await handle_update(msg)
+            await asyncio.gather(*(handle_limited(msg) for msg in msgs))
 
         logging.info(f"Emptied consumer {config.nats.consumer_name} for stream {config.nats.stream_name}")
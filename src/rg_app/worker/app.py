@@ -1,4 +1,5 @@
 import logging
+import time
 from typing import AsyncContextManager, Callable
 
 from faststream import ContextRepo, FastStream
@@ -7,34 +8,53 @@ from faststream.nats import NatsBroker
 
 from rg_app.common.faststream.dep_util import combined_lifespans_factory
 from rg_app.common.faststream.otel import prepare_bundle
+from rg_app.common.otel.base import LIBRARY_NAME
 
 from .config import Config
 from .dependencies.config import lifespan_factory as config_lifespan_factory
 from .dependencies.db import lifespan_factory as db_lifespan_factory
 from .dependencies.duckdb import lifespan_factory as duckdb_lifespan_factory
+from .dependencies.geo_index import lifespan_factory as geo_index_lifespan_factory
 from .dependencies.http_client import lifespan as http_client_lifespan
+from .dependencies.region_catalog import lifespan as region_catalog_lifespan
 from .dependencies.strava import lifespan_factory as strava_lifespan_factory
 from .routers import (
-    activity_cmd_router,
+    activity_cmd_router_factory,
     activity_svc_router,
     geo_svc_router,
+    regions_router,
     user_svc_router,
     webhook_activities_router,
     webhook_revocations_router,
 )
 
 
-def app_factory(config: Config, debug: bool) -> FastStream:
+def app_factory(config: Config, debug: bool, services_only: bool = False) -> FastStream:
+    """Worker application, with `services_only` without stream consumers (e.g. for benchmarks)."""
+    started = time.monotonic()
     log_level = logging.DEBUG if debug else logging.INFO
     otel_bundle = prepare_bundle(config.otel)
+    startup_duration = otel_bundle.meter_provider.get_meter(LIBRARY_NAME).create_histogram(
+        "rg.worker.startup.duration", unit="s", description="Time to start the worker, per lifespan and in total"
+    )
+
+    def record_startup(lifespan: str, seconds: float):
+        startup_duration.record(seconds, {"lifespan": lifespan})
 
     lifespans: list[Callable[[ContextRepo], AsyncContextManager[None]]] = [
         config_lifespan_factory(config),
-        db_lifespan_factory(config.db.get_url()),
-        duckdb_lifespan_factory(config.duck_db_path),
+        db_lifespan_factory(config.db, otel_bundle.meter_provider),
+        region_catalog_lifespan,
+        duckdb_lifespan_factory(
+            None if config.geo.engine == "strtree" and config.geo.store_path else config.duck_db_path,
+            config.geo.pool_size,
+            config.geo.extension_dir,
+        ),
         http_client_lifespan,
         strava_lifespan_factory(config.strava),
     ]
+    if config.geo.engine == "strtree":
+        lifespans.append(geo_index_lifespan_factory(config.geo.store_path, config.geo.grid_path))
     if otel_bundle:
         lifespans.append(otel_bundle.lifespan)
 
@@ -45,19 +65,28 @@ def app_factory(config: Config, debug: bool) -> FastStream:
         user_credentials=config.nats.creds_path,
         middlewares=(otel_bundle.middleware,) if otel_bundle else [],
     )
-    broker.include_routers(
-        webhook_revocations_router,
-        webhook_activities_router,
-        activity_cmd_router,
-        geo_svc_router,
-        activity_svc_router,
-        user_svc_router,
-    )
+    if services_only:
+        broker.include_routers(geo_svc_router, activity_svc_router, user_svc_router)
+    else:
+        broker.include_routers(
+            webhook_revocations_router,
+            webhook_activities_router,
+            activity_cmd_router_factory(config.activity_cmd),
+            geo_svc_router,
+            activity_svc_router,
+            user_svc_router,
+            regions_router,
+        )
 
     app = FastStream(
         broker,
-        lifespan=combined_lifespans_factory(*lifespans),
+        lifespan=combined_lifespans_factory(*lifespans, on_enter=record_startup),
     )
+
+    @app.after_startup
+    async def record_total_startup():
+        record_startup("total", time.monotonic() - started)
+
     return app
 
 
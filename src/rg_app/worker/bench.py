@@ -0,0 +1,163 @@
+"""
+End-to-end latency of activity ingestion, with activity and geo services called over NATS and in-process.
+Needs NATS, the database and geo data of a worker config, meant for development environments:
+other workers subscribed to the same NATS services would take part in the NATS mode.
+"""
+
+import asyncio
+import math
+import random
+import statistics
+import time
+from datetime import UTC, datetime, timedelta
+from decimal import Decimal
+
+import click
+import polyline
+from faststream import context
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from rg_app.common.internal.activity_svc import UpsertModel
+from rg_app.db.models import Activity, User, UserRegion
+from rg_app.worker.app import app_factory
+from rg_app.worker.config import Config
+from rg_app.worker.dependencies.db import DB_SESSIONMAKER_REPO_KEY
+from rg_app.worker.dependencies.geo_batcher import GeoCheckBatcher, local_check_from_context
+from rg_app.worker.routers.activity_svc import upsert_activity
+
+# IDs far above Strava ones, removed at the end
+_USER_ID = 10**15
+_ACTIVITY_ID_BASE = 10**15
+
+# bounding box of Poland (lng, lat), random walks starting inside mostly cross some communes
+_BOUNDS = ((14.2, 49.1), (24.1, 54.8))
+# mean step of a synthetic track in degrees, ~250 m
+_STEP = 0.0025
+
+
+def synthetic_activities(count: int, points: int, id_base: int, seed: int = 0) -> list[UpsertModel]:
+    """Activities of the synthetic user with random-walk tracks, tracks are the same for the same seed."""
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1, tzinfo=UTC)
+    activities = []
+    for i in range(count):
+        lng, lat = rng.uniform(_BOUNDS[0][0], _BOUNDS[1][0]), rng.uniform(_BOUNDS[0][1], _BOUNDS[1][1])
+        heading = rng.uniform(0, 2 * math.pi)
+        coords = []
+        for _ in range(points):
+            # heading changes slowly, so tracks resemble rides rather than noise
+            heading += rng.gauss(0, 0.15)
+            step = _STEP * rng.uniform(0.5, 1.5)
+            lng, lat = lng + step * math.cos(heading), lat + step * math.sin(heading)
+            coords.append((lat, lng))
+        activities.append(
+            UpsertModel(
+                id=id_base + i,
+                user_id=_USER_ID,
+                name="bench",
+                manual=False,
+                start=start + timedelta(hours=i),
+                moving_time=3600,
+                elapsed_time=3600,
+                distance=Decimal(points * 250),
+                track_is_detailed=False,
+                sport_type="Ride",
+                polyline=polyline.encode(coords),
+                full_data={"bench": True},
+            )
+        )
+    return activities
+
+
+async def _cleanup(sessionmaker: async_sessionmaker[AsyncSession]) -> None:
+    async with sessionmaker() as session:
+        await session.execute(delete(UserRegion).where(UserRegion.user_id == _USER_ID))
+        # details and activity regions are removed by foreign key cascades
+        await session.execute(delete(Activity).where(Activity.user_id == _USER_ID))
+        await session.execute(delete(User).where(User.id == _USER_ID))
+        await session.commit()
+
+
+async def _visited(sessionmaker: async_sessionmaker[AsyncSession], ids: list[int]) -> list[list[str]]:
+    async with sessionmaker() as session:
+        result = await session.execute(select(Activity.id, Activity.visited_regions).where(Activity.id.in_(ids)))
+        visited = {row.id: sorted(row.visited_regions) for row in result}
+    return [visited.get(activity_id, []) for activity_id in ids]
+
+
+async def bench_ingest(
+    config: Config, count: int = 50, points: int = 500, seed: int = 0
+) -> dict[str, tuple[float, float, int]]:
+    """
+    Upsert the same synthetic activities through rg.svc.activity.upsert and by calling the service in-process,
+    one at a time. The synthetic user and its activities are removed at the end.
+    Returns mode -> (mean seconds per activity, 95th percentile, activities with regions different from NATS mode).
+    """
+    app = app_factory(config, False, services_only=True)
+    async with app.lifespan_context():
+        await app.start()
+        sessionmaker: async_sessionmaker[AsyncSession] = context.get(DB_SESSIONMAKER_REPO_KEY)
+        geo_config = config.geo
+        local_batcher = GeoCheckBatcher(
+            app.broker,  # type: ignore
+            window=geo_config.check_batch_window,
+            max_size=geo_config.check_batch_max_size,
+            max_bytes=geo_config.check_batch_max_bytes,
+            local=local_check_from_context(context),
+        )
+        try:
+            await _cleanup(sessionmaker)
+            async with sessionmaker() as session:
+                session.add(
+                    User(
+                        id=_USER_ID,
+                        access_token="bench",
+                        refresh_token="bench",
+                        expires_at=datetime.now(UTC),
+                        name="bench",
+                    )
+                )
+                await session.commit()
+
+            results: dict[str, tuple[float, float, int]] = {}
+            reference: list[list[str]] | None = None
+            for offset, mode in enumerate(("nats", "local")):
+                activities = synthetic_activities(count, points, _ACTIVITY_ID_BASE + offset * count, seed)
+                timings = []
+                for activity in activities:
+                    started = time.perf_counter()
+                    if mode == "nats":
+                        resp = await app.broker.request(activity, "rg.svc.activity.upsert", timeout=30)  # type: ignore
+                        assert resp.body.decode() == "OK"
+                    else:
+                        async with sessionmaker() as session:
+                            await upsert_activity(session, local_batcher, activity)
+                            await session.commit()
+                    timings.append(time.perf_counter() - started)
+                visited = await _visited(sessionmaker, [activity.id for activity in activities])
+                if reference is None:
+                    reference = visited
+                mismatches = sum(a != b for a, b in zip(visited, reference))
+                p95 = statistics.quantiles(timings, n=20)[-1] if len(timings) > 1 else timings[0]
+                results[mode] = (statistics.fmean(timings), p95, mismatches)
+            return results
+        finally:
+            await _cleanup(sessionmaker)
+            await app.stop()
+
+
+@click.command(help="Benchmark activity ingestion over NATS services and in-process")
+@click.option("-c", "--config", "config_path", type=click.Path(exists=True), help="Worker config path", required=True)
+@click.option("--count", type=int, default=50, help="Number of synthetic activities per mode")
+@click.option("--points", type=int, default=500, help="Points per synthetic track")
+@click.option("--seed", type=int, default=0, help="Random seed")
+def main(config_path: str, count: int, points: int, seed: int):
+    config = Config.from_file(config_path)
+    results = asyncio.run(bench_ingest(config, count, points, seed))
+    for mode, (mean_time, p95, mismatches) in results.items():
+        click.echo(f"{mode}: {mean_time * 1000:.2f} ms/activity, p95 {p95 * 1000:.2f} ms, {mismatches} mismatches")
+
+
+if __name__ == "__main__":
+    main()
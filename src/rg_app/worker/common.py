@@ -1 +1,3 @@
 DEFAULT_QUEUE = "default"
+# concurrent handlers for request/reply services, lets concurrent requests share geo check batches
+SVC_MAX_WORKERS = 10
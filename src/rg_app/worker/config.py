@@ -1,4 +1,5 @@
-from typing import Annotated
+import os
+from typing import Annotated, Literal
 
 from faststream import Depends
 from pydantic import Field
@@ -9,11 +10,59 @@ from rg_app.common.otel.config import BaseOtelConfig
 from .dependencies.config import get_config
 
 
+class GeoConfig(BaseConfigModel):
+    engine: Literal["duckdb", "strtree"] = "strtree"
+    # descend country -> voivodeships -> counties -> communes instead of testing every border
+    hierarchical: bool = False
+    # Douglas-Peucker tolerance (degrees) applied to tracks before intersection by the strtree engine, 0 disables it.
+    # Results stay exact, the full track is only tested against borders not decided by the simplified one.
+    simplify_tolerance: float = Field(default=1e-4, ge=0)
+    # commune grid built with `rg-geo mkgrid`, resolves parts of tracks deep inside communes by lookup
+    grid_path: str | None = None
+    # geometry store built with `rg-geo mkstore`, with strtree engine geo.db is not opened at all then
+    store_path: str | None = None
+    # client side batching of geo checks, window in seconds, 0 disables batching
+    check_batch_window: float = 0.05
+    check_batch_max_size: int = 50
+    # encoded polyline bytes per batch, keeps batch requests well below NATS max payload
+    check_batch_max_bytes: int = 512_000
+    # local DuckDB extension directory prepared with `rg-geo bundle-ext`, extensions are not installed at startup then
+    # (RG_DUCKDB_EXTENSION_DIR environment variable is used if not set)
+    extension_dir: str | None = None
+    # threads running geo queries, each with its own DuckDB cursor, defaults to number of cores
+    pool_size: int = Field(default_factory=lambda: os.cpu_count() or 1, ge=1)
+
+
+class PullConsumerConfig(BaseConfigModel):
+    # messages fetched per pull request
+    batch_size: int = Field(default=10, ge=1)
+    # seconds to wait for a full batch before processing what has arrived
+    max_wait: float = Field(default=5.0, gt=0)
+    # messages processed concurrently, each acked on its own
+    # fetched messages wait for a worker and count against max_ack_pending of the consumer (nats_defs.local)
+    max_workers: int = Field(default=10, ge=1)
+
+
+class ActivityCmdConfig(BaseConfigModel):
+    std: PullConsumerConfig = Field(default_factory=lambda: PullConsumerConfig())
+    # backlog commands fetch whole periods of activities from Strava, fewer run at once
+    backlog: PullConsumerConfig = Field(
+        default_factory=lambda: PullConsumerConfig.model_validate({"batchSize": 5, "maxWorkers": 5})
+    )
+    # backlog pages are stored by the backlog handler at once, instead of republishing every activity for std_handle
+    backlog_bulk: bool = False
+
+
 class Config(BaseConfigModel):
     strava: BaseStravaConfig
     nats: BaseNatsConfig
     db: BaseDbConfig
     duck_db_path: str = Field(default="data/geo.db")
+    geo: GeoConfig = Field(default_factory=lambda: GeoConfig())
+    activity_cmd: ActivityCmdConfig = Field(default_factory=lambda: ActivityCmdConfig())
+    # activity and geo services of this process are called directly by activity commands and activity upserts,
+    # instead of over NATS, which is kept for deployments running services in separate workers
+    colocated_services: bool = False
     otel: BaseOtelConfig = Field(default_factory=lambda: BaseOtelConfig())
 
 
@@ -2,18 +2,20 @@ from contextlib import asynccontextmanager
 from typing import Annotated
 
 from faststream import ContextRepo, Depends
-from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from opentelemetry.metrics import MeterProvider
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+
+from rg_app.common.config import BaseDbConfig
+from rg_app.common.otel.db_pool import create_instrumented_engine
 
 DB_ENGINE_REPO_KEY = "db_engine"
 DB_SESSIONMAKER_REPO_KEY = "db_sessionmaker"
 
 
-def lifespan_factory(db_url: str):
+def lifespan_factory(config_db: BaseDbConfig, meter_provider: MeterProvider):
     @asynccontextmanager
     async def lifespan(context: ContextRepo):
-        sa_engine = create_async_engine(
-            db_url,
-        )
+        sa_engine = create_instrumented_engine(config_db, meter_provider, "worker")
         sa_sm = async_sessionmaker(sa_engine, expire_on_commit=False)
         context.set_global(DB_ENGINE_REPO_KEY, sa_engine)
         context.set_global(DB_SESSIONMAKER_REPO_KEY, sa_sm)
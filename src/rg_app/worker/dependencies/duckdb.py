@@ -1,20 +1,95 @@
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import asynccontextmanager
-from typing import Annotated
+from typing import Annotated, Any, Callable, Concatenate, ParamSpec, TypeVar
 
 import duckdb
 from faststream import ContextRepo, Depends
 
+from rg_app.common.geo import connect
+
 DUCKDB_REPO_KEY = "duck_conn"
+DUCKDB_POOL_REPO_KEY = "duck_pool"
+
+P = ParamSpec("P")
+T = TypeVar("T")
+
+
+class DuckDBPool:
+    """
+    Bounded thread pool for geo queries.
+    DuckDB connections must not be used by many threads at once,
+    so every pool thread lazily opens its own cursor (a connection to the same database instance).
+    Without a connection (geo.db not opened) only `run_plain` is available.
+    """
+
+    def __init__(self, conn: duckdb.DuckDBPyConnection | None, size: int):
+        self._conn = conn
+        self._size = size
+        self._executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix="duckdb")
+        self._local = threading.local()
+        self._cursors: list[duckdb.DuckDBPyConnection] = []
+        self._cursors_lock = threading.Lock()
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def _cursor(self) -> duckdb.DuckDBPyConnection:
+        cursor: duckdb.DuckDBPyConnection | None = getattr(self._local, "cursor", None)
+        if cursor is None:
+            if self._conn is None:
+                raise RuntimeError("DuckDB database is not opened")
+            cursor = self._conn.cursor()
+            with self._cursors_lock:
+                self._cursors.append(cursor)
+            self._local.cursor = cursor
+        return cursor
 
+    def _call_with_cursor(self, fn: Callable[..., T], args: tuple[Any, ...], kwargs: dict[str, Any]) -> T:
+        return fn(self._cursor(), *args, **kwargs)
 
-def lifespan_factory(db_path: str):
+    async def run(
+        self, fn: Callable[Concatenate[duckdb.DuckDBPyConnection, P], T], *args: P.args, **kwargs: P.kwargs
+    ) -> T:
+        """Run fn(cursor, *args, **kwargs) on a pool thread."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(self._call_with_cursor, fn, args, kwargs))
+
+    async def run_plain(self, fn: Callable[P, T], *args: P.args, **kwargs: P.kwargs) -> T:
+        """Run fn(*args, **kwargs) on a pool thread, for CPU bound geo work not touching DuckDB."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+        with self._cursors_lock:
+            for cursor in self._cursors:
+                cursor.close()
+            self._cursors.clear()
+
+
+def lifespan_factory(db_path: str | None, pool_size: int, extension_dir: str | None = None):
     @asynccontextmanager
     async def lifespan(context: ContextRepo):
-        with duckdb.connect(db_path, read_only=True) as conn:
-            conn.install_extension("spatial")
-            conn.load_extension("spatial")
+        if db_path is None:
+            pool = DuckDBPool(None, pool_size)
+            context.set_global(DUCKDB_POOL_REPO_KEY, pool)
+            try:
+                yield
+            finally:
+                pool.close()
+            return
+        with connect(db_path, read_only=True, extension_dir=extension_dir) as conn:
+            pool = DuckDBPool(conn, pool_size)
             context.set_global(DUCKDB_REPO_KEY, conn)
-            yield
+            context.set_global(DUCKDB_POOL_REPO_KEY, pool)
+            try:
+                yield
+            finally:
+                pool.close()
 
     return lifespan
 
@@ -24,4 +99,12 @@ async def duck_conn(context: ContextRepo) -> duckdb.DuckDBPyConnection:
     return conn
 
 
+async def duck_pool(context: ContextRepo) -> DuckDBPool:
+    pool = context.get(DUCKDB_POOL_REPO_KEY)
+    if pool is None:
+        raise ValueError("Key not found in context")
+    return pool
+
+
 DuckDBConnDI = Annotated[duckdb.DuckDBPyConnection, Depends(duck_conn)]
+DuckDBPoolDI = Annotated[DuckDBPool, Depends(duck_pool)]
@@ -0,0 +1,148 @@
+"""
+Coalesce concurrent geo checks into batched requests
+"""
+
+import asyncio
+from typing import TYPE_CHECKING, Annotated, Awaitable, Callable, cast
+
+from faststream import ContextRepo, Depends
+from faststream.nats import NatsBroker as _NatsBroker
+from faststream.nats.annotations import NatsBroker
+
+from rg_app.common.faststream.otel import tracer_fn, tracer_provider
+from rg_app.common.internal.geo_svc import (
+    GeoSvcCheckBatchResponse,
+    GeoSvcCheckPolylineBatchRequest,
+    GeoSvcCheckPolylineRequest,
+    GeoSvcCheckResponse,
+)
+from rg_app.worker.geo_check import check_tracks, decode_track
+
+from .config import get_config
+from .duckdb import DUCKDB_POOL_REPO_KEY
+from .geo_index import GEO_INDEX_REPO_KEY
+
+if TYPE_CHECKING:
+    from rg_app.worker.config import Config
+
+GEO_BATCHER_REPO_KEY = "geo_batcher"
+
+batcher_lock = asyncio.Lock()
+
+LocalCheck = Callable[[list[GeoSvcCheckPolylineRequest]], Awaitable[GeoSvcCheckBatchResponse]]
+
+
+class GeoCheckBatcher:
+    """
+    Collects geo check requests and sends them as a single rg.svc.geo.check-polyline-batch request.
+    A batch is sent when `window` seconds passed since its first request,
+    or earlier when it reaches `max_size` tracks or `max_bytes` of encoded polylines in total.
+    With `window` equal to 0 requests are sent one by one to rg.svc.geo.check-polyline.
+    With `local` given, batches are checked by calling it in this process instead of NATS requests.
+    """
+
+    def __init__(
+        self,
+        broker: _NatsBroker,
+        window: float,
+        max_size: int,
+        max_bytes: int,
+        timeout: float = 30,
+        local: LocalCheck | None = None,
+    ) -> None:
+        self._broker = broker
+        self._local = local
+        self._window = window
+        self._max_size = max_size
+        self._max_bytes = max_bytes
+        self._timeout = timeout
+        self._pending: list[tuple[GeoSvcCheckPolylineRequest, asyncio.Future[GeoSvcCheckResponse]]] = []
+        self._pending_bytes = 0
+        self._timer: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task] = set()
+
+    async def check(self, request: GeoSvcCheckPolylineRequest) -> GeoSvcCheckResponse:
+        if self._window <= 0:
+            if self._local is not None:
+                return (await self._local([request])).items[0]
+            resp = await self._broker.request(request, "rg.svc.geo.check-polyline", timeout=self._timeout)
+            return GeoSvcCheckResponse.model_validate_json(resp.body)
+
+        loop = asyncio.get_running_loop()
+        if self._pending and self._pending_bytes + len(request.data) > self._max_bytes:
+            self._flush()
+        future: asyncio.Future[GeoSvcCheckResponse] = loop.create_future()
+        self._pending.append((request, future))
+        self._pending_bytes += len(request.data)
+        if len(self._pending) >= self._max_size or self._pending_bytes >= self._max_bytes:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self._window, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        self._pending_bytes = 0
+        if batch:
+            task = asyncio.create_task(self._send(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, batch: list[tuple[GeoSvcCheckPolylineRequest, asyncio.Future[GeoSvcCheckResponse]]]) -> None:
+        requests = [request for request, _ in batch]
+        try:
+            if self._local is not None:
+                resp_parsed = await self._local(requests)
+            else:
+                resp = await self._broker.request(
+                    GeoSvcCheckPolylineBatchRequest(items=requests),
+                    "rg.svc.geo.check-polyline-batch",
+                    timeout=self._timeout,
+                )
+                resp_parsed = GeoSvcCheckBatchResponse.model_validate_json(resp.body)
+            if len(resp_parsed.items) != len(batch):
+                raise ValueError(f"Expected {len(batch)} results, got {len(resp_parsed.items)}")
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), item in zip(batch, resp_parsed.items):
+            if not future.done():
+                future.set_result(item)
+
+
+def local_check_from_context(context: ContextRepo) -> LocalCheck:
+    """Geo checks run in this process, requires DuckDB and geo index lifespans to be entered first."""
+    geo_config = cast("Config", get_config(context)).geo
+    pool = context.get(DUCKDB_POOL_REPO_KEY)
+    index = context.get(GEO_INDEX_REPO_KEY)
+    tracer = tracer_fn(tracer_provider(context))
+
+    async def check(requests: list[GeoSvcCheckPolylineRequest]) -> GeoSvcCheckBatchResponse:
+        tracks = [decode_track(request.data) for request in requests]
+        return await check_tracks(tracks, pool, index, geo_config, tracer)
+
+    return check
+
+
+async def get_geo_batcher(context: ContextRepo, broker: NatsBroker) -> GeoCheckBatcher:
+    async with batcher_lock:
+        batcher: GeoCheckBatcher | None = context.get(GEO_BATCHER_REPO_KEY)
+        if batcher is None:
+            config = cast("Config", get_config(context))
+            batcher = GeoCheckBatcher(
+                broker,
+                window=config.geo.check_batch_window,
+                max_size=config.geo.check_batch_max_size,
+                max_bytes=config.geo.check_batch_max_bytes,
+                local=local_check_from_context(context) if config.colocated_services else None,
+            )
+            context.set_global(GEO_BATCHER_REPO_KEY, batcher)
+    return batcher
+
+
+GeoCheckBatcherDI = Annotated[GeoCheckBatcher, Depends(get_geo_batcher)]
@@ -0,0 +1,47 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Annotated
+
+import duckdb
+from faststream import ContextRepo, Depends
+
+from rg_app.common.geo import BorderGrid, BorderIndex
+
+from .duckdb import DUCKDB_REPO_KEY
+
+GEO_INDEX_REPO_KEY = "geo_index"
+
+
+def _load_index(conn: duckdb.DuckDBPyConnection | None, store_path: str | None, grid_path: str | None) -> BorderIndex:
+    if store_path is not None:
+        index = BorderIndex.from_store(store_path)
+    elif conn is not None:
+        index = BorderIndex.from_duckdb(conn)
+    else:
+        raise ValueError("DuckDB connection not found in context")
+    if grid_path is not None:
+        index.attach_grid(BorderGrid.load(grid_path))
+    return index
+
+
+def lifespan_factory(store_path: str | None = None, grid_path: str | None = None):
+    @asynccontextmanager
+    async def lifespan(context: ContextRepo):
+        """
+        Load border geometries into an in-memory spatial index,
+        from the geometry store if given, otherwise from DuckDB (requires DuckDB lifespan to be entered first).
+        """
+        conn = context.get(DUCKDB_REPO_KEY)
+        loop = asyncio.get_running_loop()
+        index = await loop.run_in_executor(None, _load_index, conn, store_path, grid_path)
+        context.set_global(GEO_INDEX_REPO_KEY, index)
+        yield
+
+    return lifespan
+
+
+async def get_geo_index(context: ContextRepo) -> BorderIndex | None:
+    return context.get(GEO_INDEX_REPO_KEY)
+
+
+BorderIndexDI = Annotated[BorderIndex | None, Depends(get_geo_index)]
@@ -1,20 +1,33 @@
 """
-Delay messages if rate limits are close to being reached
+Delay messages if the Strava rate limit budget has no capacity for them
 """
 
 from faststream import Depends
 from faststream.exceptions import NackMessage
+from faststream.nats.annotations import NatsMessage
 
+from rg_app.common.strava.rate_limits import Priority, RateLimitDeferred
 from rg_app.worker.dependencies.strava import RateLimitManagerDI
 
 
-def rate_limit_percent_below(percent: float):
+def rate_limit_budget(priority: Priority):
+    """
+    Delay messages until requests of `priority` fit the budget, also when the handler could not reserve one in time.
+    Messages are nacked here, as consumers acknowledge them in handlers.
+    """
+
     async def rl_dep(
         rate_limit_manager: RateLimitManagerDI,
+        message: NatsMessage,
     ):
-        limits_set = await rate_limit_manager.get_limits()
-        if limits_set is not None:
-            if limits_set.current_read_percent >= percent:
-                raise NackMessage(delay=120)
+        wait = await rate_limit_manager.estimate_wait(priority=priority)
+        if wait > rate_limit_manager.budget.max_wait:
+            await message.nack(delay=wait)
+            raise NackMessage(delay=wait)
+        try:
+            yield
+        except RateLimitDeferred as e:
+            await message.nack(delay=e.delay)
+            raise NackMessage(delay=e.delay)
 
     return Depends(rl_dep)
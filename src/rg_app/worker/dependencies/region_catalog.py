@@ -0,0 +1,32 @@
+from contextlib import asynccontextmanager
+from typing import Annotated
+
+from faststream import ContextRepo, Depends
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from rg_app.db.catalog import RegionCatalog
+
+from .db import DB_SESSIONMAKER_REPO_KEY
+
+REGION_CATALOG_REPO_KEY = "region_catalog"
+
+
+@asynccontextmanager
+async def lifespan(context: ContextRepo):
+    """Load the region catalog, requires DB lifespan to be entered first."""
+    sa_sm: async_sessionmaker = context.get(DB_SESSIONMAKER_REPO_KEY)
+    catalog = RegionCatalog()
+    async with sa_sm() as session:
+        await catalog.reload(session)
+    context.set_global(REGION_CATALOG_REPO_KEY, catalog)
+    yield
+
+
+async def get_region_catalog(context: ContextRepo) -> RegionCatalog:
+    catalog = context.get(REGION_CATALOG_REPO_KEY)
+    if catalog is None:
+        raise ValueError("Key not found in context")
+    return catalog
+
+
+RegionCatalogDI = Annotated[RegionCatalog, Depends(get_region_catalog)]
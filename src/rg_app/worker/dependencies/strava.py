@@ -7,7 +7,7 @@ from faststream.nats.annotations import NatsBroker
 
 from rg_app.common.config import BaseStravaConfig
 from rg_app.common.strava.auth import StravaTokenManager
-from rg_app.common.strava.rate_limits import RateLimitManager, RLNatsConfig
+from rg_app.common.strava.rate_limits import RateLimitBudget, RateLimitManager, RLNatsConfig
 
 from .db import AsyncEngineDI
 
@@ -18,6 +18,8 @@ TOKEN_MGR_REPO_KEY = "token_manager"
 RATE_LIMIT_MGR_REPO_KEY = "rate_limit_manager"
 STRAVA_EXIT_STACK_REPO_KEY = "strava_exit_stack"
 STRAVA_CONFIG_REPO_KEY = "strava_config"
+# reservations wait within handlers, well below ack_wait of activity command consumers (nats_defs.local)
+_MAX_RATE_LIMIT_WAIT = 10.0
 
 
 def lifespan_factory(config: BaseStravaConfig):
@@ -41,7 +43,7 @@ async def get_rate_limit_manager(context: ContextRepo, broker: NatsBroker) -> Ra
             nats_conn = broker._connection
             if nats_conn is None or not nats_conn.is_connected:
                 raise ValueError("NATS connection is not established")
-            rlm = RateLimitManager(RLNatsConfig(nats_conn))
+            rlm = RateLimitManager(RLNatsConfig(nats_conn), RateLimitBudget(max_wait=_MAX_RATE_LIMIT_WAIT))
             rlm = await aes.enter_async_context(rlm.begin())
             context.set_global(RATE_LIMIT_MGR_REPO_KEY, rlm)
             rate_limit_manager = rlm
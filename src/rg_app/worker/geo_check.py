@@ -0,0 +1,132 @@
+"""
+Region checks of tracks, run in the worker process with its DuckDB pool and border index.
+Used by rg.svc.geo services and directly by colocated activity ingestion.
+"""
+
+import duckdb
+import shapely
+from opentelemetry import trace
+
+from rg_app.common.geo import (
+    BorderIndex,
+    decode_polyline,
+    run_query,
+    run_query_batch,
+    run_query_hierarchical,
+    track_geometry,
+)
+from rg_app.common.internal.geo_svc import GeoSvcCheckBatchResponse, GeoSvcCheckResponse, GeoSvcCheckResponseItem
+from rg_app.worker.config import GeoConfig
+from rg_app.worker.dependencies.duckdb import DuckDBPool
+
+
+def decode_track(data: str) -> shapely.Geometry | None:
+    """Decode a polyline of a request, malformed polylines match nothing instead of failing the request or its batch."""
+    try:
+        return track_geometry(decode_polyline(data))
+    except ValueError:
+        return None
+
+
+async def _aio_run_query(pool: DuckDBPool, wkb: bytes, hierarchical: bool):
+    query_fn = run_query_hierarchical if hierarchical else run_query
+    return await pool.run(query_fn, wkb)
+
+
+async def _aio_run_index_query(
+    pool: DuckDBPool, index: BorderIndex, track: shapely.Geometry, hierarchical: bool, tolerance: float
+):
+    return await pool.run_plain(index.query, track, hierarchical, tolerance)
+
+
+def run_query_batch_safe(
+    conn: duckdb.DuckDBPyConnection, wkbs: list[bytes], hierarchical: bool
+) -> list[list[tuple[str, str]]]:
+    """
+    Run batch query, if it fails (e.g. on a malformed track) fall back to querying tracks one by one,
+    so that a single bad track does not empty results of the whole batch.
+    """
+    try:
+        return run_query_batch(conn, wkbs, hierarchical)
+    except duckdb.Error:
+        query_fn = run_query_hierarchical if hierarchical else run_query
+        results = []
+        for item in wkbs:
+            try:
+                results.append(query_fn(conn, item))
+            except duckdb.Error:
+                results.append([])
+        return results
+
+
+async def _aio_run_query_batch(pool: DuckDBPool, wkbs: list[bytes], hierarchical: bool):
+    return await pool.run(run_query_batch_safe, wkbs, hierarchical)
+
+
+async def _aio_run_index_query_batch(
+    pool: DuckDBPool, index: BorderIndex, tracks: list[shapely.Geometry | None], hierarchical: bool, tolerance: float
+):
+    return await pool.run_plain(index.query_batch, tracks, hierarchical, tolerance)
+
+
+def _mk_response(result: list[tuple[str, str]]) -> GeoSvcCheckResponse:
+    return GeoSvcCheckResponse(items=[GeoSvcCheckResponseItem(id=row[0], type=row[1]) for row in result])  # type: ignore
+
+
+async def check_tracks(
+    tracks: list[shapely.Geometry | None],
+    pool: DuckDBPool,
+    index: BorderIndex | None,
+    geo_config: GeoConfig,
+    tracer: trace.Tracer,
+) -> GeoSvcCheckBatchResponse:
+    hierarchical = geo_config.hierarchical
+    with tracer.start_as_current_span("geo_svc_check_batch") as span:
+        span.set_attribute("hierarchical", hierarchical)
+        span.set_attribute("batch_size", len(tracks))
+        if index is not None:
+            span.set_attribute("engine", "strtree")
+            span.set_attribute("simplify_tolerance", geo_config.simplify_tolerance)
+            results = await _aio_run_index_query_batch(pool, index, tracks, hierarchical, geo_config.simplify_tolerance)
+        else:
+            span.set_attribute("engine", "duckdb")
+            present = [(i, track) for i, track in enumerate(tracks) if track is not None]
+            wkbs = [shapely.to_wkb(track) for _, track in present]
+            results: list[list[tuple[str, str]]] = [[] for _ in tracks]
+            for (i, _), result in zip(present, await _aio_run_query_batch(pool, wkbs, hierarchical)):
+                results[i] = result
+        span.set_status(trace.Status(trace.StatusCode.OK))
+    return GeoSvcCheckBatchResponse(items=[_mk_response(result) for result in results])
+
+
+async def check_track(
+    track: shapely.Geometry | None,
+    pool: DuckDBPool,
+    index: BorderIndex | None,
+    geo_config: GeoConfig,
+    tracer: trace.Tracer,
+) -> GeoSvcCheckResponse:
+    hierarchical = geo_config.hierarchical
+    span = trace.get_current_span()
+    try:
+        with tracer.start_as_current_span("geo_svc_check") as span:
+            span.set_attribute("hierarchical", hierarchical)
+            if track is None:
+                result = []
+            elif index is not None:
+                span.set_attribute("engine", "strtree")
+                span.set_attribute("simplify_tolerance", geo_config.simplify_tolerance)
+                result = await _aio_run_index_query(pool, index, track, hierarchical, geo_config.simplify_tolerance)
+            else:
+                span.set_attribute("engine", "duckdb")
+                result = await _aio_run_query(pool, shapely.to_wkb(track), hierarchical)
+            span.set_attribute("result_count", len(result))
+            span.set_status(trace.Status(trace.StatusCode.OK))
+    except duckdb.Error as e:
+        span.record_exception(e)
+        span.set_status(trace.Status(trace.StatusCode.ERROR, str(e)))
+        result = []
+    resp = _mk_response(result)
+    trace.get_current_span().set_status(trace.Status(trace.StatusCode.OK))
+
+    return resp
@@ -1,15 +1,17 @@
-from .activity_cmd import router as activity_cmd_router
+from .activity_cmd import router_factory as activity_cmd_router_factory
 from .activity_svc import activity_svc_router
 from .geo_svc import geo_svc_router
+from .regions import regions_router
 from .user_svc import user_svc_router
 from .webhook_activities import router as webhook_activities_router
 from .webhook_revocations import router as webhook_revocations_router
 
 __all__ = [
     "webhook_revocations_router",
-    "activity_cmd_router",
+    "activity_cmd_router_factory",
     "geo_svc_router",
     "activity_svc_router",
     "user_svc_router",
+    "regions_router",
     "webhook_activities_router",
 ]
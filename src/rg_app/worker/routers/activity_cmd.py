@@ -1,4 +1,5 @@
 import typing as ty
+from datetime import timedelta
 from decimal import Decimal
 from logging import Logger
 
@@ -7,9 +8,10 @@ from faststream.nats import JStream, NatsRouter, PullSub
 from faststream.nats.annotations import NatsBroker, NatsMessage
 from httpx import AsyncClient, HTTPStatusError
 from opentelemetry import trace
-from sqlalchemy import and_, func, not_, select
+from sqlalchemy import func, select
 
 from rg_app.api.dependencies.db import AsyncSession
+from rg_app.common import backlog
 from rg_app.common.enums import DescUpdateOptions
 from rg_app.common.faststream.otel import otel_logger, tracer_fn
 from rg_app.common.internal import activity_filter
@@ -17,21 +19,33 @@ from rg_app.common.internal.activity_svc import DeleteModel, UpsertModel, Upsert
 from rg_app.common.msg.cmd import BacklogActivityCmd, StdActivityCmd
 from rg_app.common.strava.activities import get_activity, get_activity_range, update_activity
 from rg_app.common.strava.auth import StravaAuth
+from rg_app.common.strava.helpers import MAX_PAGE_SIZE
 from rg_app.common.strava.models.activity import ActivityPartial, ActivityPatch
 from rg_app.common.strava.rate_limits import RateLimitManager
+from rg_app.db.catalog import RegionCatalog
 from rg_app.db.models import User
-from rg_app.db.models.models import Activity, Region
+from rg_app.db.models.models import Activity, UserRegion
 from rg_app.nats_defs.local import CONSUMER_ACTIVITY_CMD_BACKLOG, CONSUMER_ACTIVITY_CMD_STD, STREAM_ACTIVITY_CMD
+from rg_app.worker.config import ActivityCmdConfig, ConfigDI, PullConsumerConfig
 from rg_app.worker.dependencies.db import AsyncSessionDI
+from rg_app.worker.dependencies.geo_batcher import GeoCheckBatcher, GeoCheckBatcherDI
 from rg_app.worker.dependencies.http_client import AsyncClientDI
-from rg_app.worker.dependencies.message_delayer import rate_limit_percent_below
+from rg_app.worker.dependencies.message_delayer import rate_limit_budget
+from rg_app.worker.dependencies.region_catalog import RegionCatalogDI
 from rg_app.worker.dependencies.strava import RateLimitManagerDI, StravaTokenManagerDI
+from rg_app.worker.routers.activity_svc import (
+    delete_activity,
+    upsert_activities_bulk,
+    upsert_activity,
+    upsert_ineligible_activity,
+)
 
 router = NatsRouter()
 
 stream = JStream(name=ty.cast(str, STREAM_ACTIVITY_CMD.name), declare=False)
 
 pub_activity_std = router.publisher("rg.internal.cmd.activity.create.{athlete_id}.{activity_id}", stream=stream)
+pub_activity_backlog = router.publisher("rg.internal.cmd.activity.backlog.{athlete_id}", stream=stream)
 
 req_upsert = router.publisher("rg.svc.activity.upsert", schema=UpsertModel)
 req_upsert_ineligible = router.publisher("rg.svc.activity.upsert-ineligible", schema=UpsertModel)
@@ -71,14 +85,23 @@ def _mk_upsert_model(activity: ActivityPartial, polyline_str: str, is_detailed:
     return activity_model
 
 
-@router.subscriber(
-    config=CONSUMER_ACTIVITY_CMD_BACKLOG,
-    stream=stream,
-    durable=CONSUMER_ACTIVITY_CMD_BACKLOG.durable_name,
-    pull_sub=PullSub(),
-    no_ack=True,
-    dependencies=[rate_limit_percent_below(50)],
-)
+async def _store_backlog_page(
+    session: AsyncSession, geo_batcher: GeoCheckBatcher, activities: ty.Sequence[ActivityPartial]
+) -> None:
+    """Filter a page of backlog activities and store it with a single bulk upsert, descriptions are not updated."""
+    eligible, ineligible = [], []
+    for activity in activities:
+        is_eligible, reason = activity_filter(activity)
+        if not is_eligible:
+            ineligible.append(_mk_ineligible_activity(activity, reason or "Unknown"))
+            continue
+        assert activity.map is not None
+        polyline_str = activity.map.summary_polyline or activity.map.polyline
+        assert polyline_str is not None
+        eligible.append(_mk_upsert_model(activity, polyline_str, False))
+    await upsert_activities_bulk(session, geo_batcher, eligible, ineligible)
+
+
 async def backlog_handle(
     body: BacklogActivityCmd,
     broker: NatsBroker,
@@ -87,6 +110,8 @@ async def backlog_handle(
     rlm: RateLimitManagerDI,
     stm: StravaTokenManagerDI,
     session: AsyncSessionDI,
+    config: ConfigDI,
+    geo_batcher: GeoCheckBatcherDI,
     tracer: trace.Tracer = Depends(tracer_fn),
     otel_logger: Logger = Depends(otel_logger),
 ):
@@ -97,27 +122,48 @@ async def backlog_handle(
         otel_logger.error(f"User {body.owner_id} not found")
         await nats_msg.ack()
         return
-    has_more = True
     page = 0
-    while has_more:
-        activity_range = await get_activity_range(http_client, body.period_from, body.period_to, page, auth, rlm)
-        has_more = activity_range.has_more
-        page += 1
-        if page >= 50:
-            print("Too many pages!")
+    while True:
+        activity_range = await get_activity_range(
+            http_client, body.period_from, body.period_to, page, auth, rlm, priority="low"
+        )
+        if config.activity_cmd.backlog_bulk:
+            await _store_backlog_page(session, geo_batcher, activity_range.items)
+            await session.commit()
+        else:
+            for activity in activity_range.items:
+                # republish activity, for std handle
+                activity_cmd = StdActivityCmd(
+                    owner_id=activity.athlete.id,
+                    activity_id=activity.id,
+                    type="create",
+                    activity=activity,
+                    is_from_backlog=True,
+                )
+                subject = f"rg.internal.cmd.activity.create.{activity.athlete.id}.{activity.id}"
+
+                await pub_activity_std.publish(activity_cmd, subject)
+        if len(activity_range.items) < MAX_PAGE_SIZE:
             break
-        for activity in activity_range.items:
-            # republish activity, for std handle
-            activity_cmd = StdActivityCmd(
-                owner_id=activity.athlete.id,
-                activity_id=activity.id,
-                type="create",
-                activity=activity,
-                is_from_backlog=True,
-            )
-            subject = f"rg.internal.cmd.activity.create.{activity.athlete.id}.{activity.id}"
-
-            await pub_activity_std.publish(activity_cmd, subject)
+        # activities are imported up to the cursor, a second earlier catches ones sharing the last start time
+        cursor = max(activity.start_date for activity in activity_range.items) - timedelta(seconds=1)
+        windows = []
+        if cursor > body.period_from:
+            observed = len(activity_range.items) * (page + 1)
+            windows = backlog.adaptive_windows(body.period_from, cursor, body.period_to, observed)
+        if windows:
+            # rest of the period continues in windows of about a page each, imported concurrently by the consumer
+            for window_from, window_to in windows:
+                window_cmd = BacklogActivityCmd(
+                    owner_id=body.owner_id, period_from=window_from, period_to=window_to, type="backlog"
+                )
+                await pub_activity_backlog.publish(window_cmd, f"rg.internal.cmd.activity.backlog.{body.owner_id}")
+            span = trace.get_current_span()
+            span.add_event("backlog_split", {"windows": len(windows), "cursor": cursor.isoformat()})
+            break
+        # too short to split, page through it, every page may wait for the rate limit budget
+        await nats_msg.in_progress()
+        page += 1
     await nats_msg.ack()
 
 
@@ -145,55 +191,41 @@ def _declinate_new(count: int) -> str:
         return "nowych"
 
 
-async def _get_activity_description_content(session: AsyncSession, db_activity: Activity) -> tuple[list[str], bool]:
+async def _get_activity_description_content(
+    session: AsyncSession, catalog: RegionCatalog, db_activity: Activity
+) -> tuple[list[str], bool]:
     """
     Generate activity description content with commune and town information.
     Returns a list of lines to be inserted in the activity description and a boolean indicating if any new regions were found.
+    A region is new when no earlier activity of the user visited it, regardless of the order activities were imported in,
+    which is looked up by first visit dates of user_region.
     """
-    # Target record CTE
-    target_record_cte = (
-        select(Activity.id, Activity.user_id, Activity.visited_regions, Activity.start)
-        .where(Activity.id == db_activity.id)
-        .cte("target_record")
+    # Regions of the activity not visited before its start
+    new_regions_query = select(UserRegion.region_id).where(
+        UserRegion.user_id == db_activity.user_id,
+        UserRegion.region_id.in_(db_activity.visited_regions),
+        UserRegion.first_visited >= db_activity.start,
     )
 
-    # Earlier regions CTE
-    earlier_regions_cte = (
-        select(func.jsonb_array_elements_text(Activity.visited_regions).label("region"))
-        .select_from(Activity)
-        .join(
-            target_record_cte,
-            and_(
-                Activity.user_id == target_record_cte.c.user_id,
-                Activity.start < target_record_cte.c.start,
-                Activity.id != target_record_cte.c.id,
-            ),
+    # Regions visited up to the activity start
+    so_far_query = (
+        select(func.count())
+        .select_from(UserRegion)
+        .where(
+            UserRegion.user_id == db_activity.user_id,
+            UserRegion.additional.is_(False),
+            UserRegion.first_visited <= db_activity.start,
         )
-        .distinct()
-        .cte("earlier_regions")
     )
 
-    # Target record array elements CTE
-    target_regions_cte = select(
-        func.jsonb_array_elements_text(target_record_cte.c.visited_regions).label("region")
-    ).cte("target_record_ael")
-
-    # Final query - find regions in target activity that aren't in earlier activities
-    new_regions_query = (
-        select(target_regions_cte.c.region, Region.name)
-        .select_from(target_regions_cte.join(Region, target_regions_cte.c.region == Region.id))
-        .where(not_(target_regions_cte.c.region.in_(select(earlier_regions_cte.c.region))))
-    )
-
-    # Execute the query to get the new regions
     result = await session.execute(new_regions_query)
     new_communes = []
     new_towns = []
-    for row in result:
-        region_id: str = row[0]
-        region_name = row[1]
+    for region_id in result.scalars():
+        region_info = catalog.get(region_id)
+        region_name = region_info.name if region_info else None
         if not region_name:
-            # Region not found in DB or is nameless, skip it
+            # Region not found in catalog or is nameless, skip it
             continue
         if region_id.endswith("1"):
             new_towns.append((region_id, region_name))
@@ -202,21 +234,8 @@ async def _get_activity_description_content(session: AsyncSession, db_activity:
     activity_new_count = len(new_communes) + len(new_towns)
     activity_total_count = len(db_activity.visited_regions)
 
-    so_far_regions_cte = (
-        select(target_regions_cte.c.region).union(select(earlier_regions_cte.c.region)).cte("total_regions")
-    )
-    so_far_regions_unique_cte = select(so_far_regions_cte.c.region).distinct().cte("total_regions_unique")
-    so_far_regions_unique_count_result = await session.execute(
-        select(func.count(so_far_regions_unique_cte.c.region).label("count"))
-    )
-    so_far_regions_unique_count = so_far_regions_unique_count_result.scalar_one_or_none() or 0
-
-    total_achievable_count = await session.execute(
-        select(func.count(Region.id).label("count")).where(
-            Region.type == "GMI",
-        )
-    )
-    total_achievable_count = total_achievable_count.scalar_one_or_none() or 0
+    so_far_regions_unique_count = (await session.execute(so_far_query)).scalar_one()
+    total_achievable_count = catalog.total("GMI")
 
     desc_lines = []
     desc_lines.append(DESC_SECTION_START)
@@ -244,6 +263,7 @@ async def _get_activity_description_content(session: AsyncSession, db_activity:
 
 async def _update_activity_desc(
     session: AsyncSession,
+    catalog: RegionCatalog,
     http_client: AsyncClient,
     activity: ActivityPartial,
     auth: StravaAuth,
@@ -264,7 +284,7 @@ async def _update_activity_desc(
         # No regions visited, no need to update desc
         return
 
-    desc_content, new_regions_visited = await _get_activity_description_content(session, db_activity)
+    desc_content, new_regions_visited = await _get_activity_description_content(session, catalog, db_activity)
 
     if not new_regions_visited and update_desc == DescUpdateOptions.NEW_ONLY:
         desc_content = []
@@ -301,14 +321,6 @@ async def _update_activity_desc(
     )
 
 
-@router.subscriber(
-    config=CONSUMER_ACTIVITY_CMD_STD,
-    stream=stream,
-    durable=CONSUMER_ACTIVITY_CMD_STD.durable_name,
-    pull_sub=PullSub(),
-    no_ack=True,
-    dependencies=[rate_limit_percent_below(90)],
-)
 async def std_handle(
     body: StdActivityCmd,
     broker: NatsBroker,
@@ -317,6 +329,9 @@ async def std_handle(
     rlm: RateLimitManagerDI,
     stm: StravaTokenManagerDI,
     session: AsyncSessionDI,
+    catalog: RegionCatalogDI,
+    config: ConfigDI,
+    geo_batcher: GeoCheckBatcherDI,
     tracer: trace.Tracer = Depends(tracer_fn),
     otel_logger: Logger = Depends(otel_logger),
 ):
@@ -355,9 +370,13 @@ async def std_handle(
             span.add_event("activity_filter_failed", {"reason": reason, "activity_id": body.activity_id})
             print(f"Activity {body.activity_id} filtered out: {reason}")
             umi = _mk_ineligible_activity(activity_expanded, reason)
-            resp = await req_upsert_ineligible.request(umi, timeout=30)
-            resp_parsed = resp.body.decode()
-            assert resp_parsed == "OK"
+            if config.colocated_services:
+                await upsert_ineligible_activity(session, umi)
+                await session.commit()
+            else:
+                resp = await req_upsert_ineligible.request(umi, timeout=30)
+                resp_parsed = resp.body.decode()
+                assert resp_parsed == "OK"
             print(f"Activity {body.activity_id} processed as ineligible ({reason})!")
         else:
             assert activity_expanded.map is not None
@@ -368,9 +387,13 @@ async def std_handle(
 
             activity_model = _mk_upsert_model(activity_expanded, polyline_str, body.type == "update")
 
-            resp = await req_upsert.request(activity_model, timeout=30)
-            resp_parsed = resp.body.decode()
-            assert resp_parsed == "OK"
+            if config.colocated_services:
+                await upsert_activity(session, geo_batcher, activity_model)
+                await session.commit()
+            else:
+                resp = await req_upsert.request(activity_model, timeout=30)
+                resp_parsed = resp.body.decode()
+                assert resp_parsed == "OK"
 
             # Acitivity desc update
             update_desc = DescUpdateOptions(user.update_strava_desc)
@@ -378,7 +401,9 @@ async def std_handle(
                 if auth is None:
                     auth = await stm.get_httpx_auth(body.owner_id)
                 try:
-                    await _update_activity_desc(session, http_client, activity_expanded, auth, rlm, update_desc)
+                    await _update_activity_desc(
+                        session, catalog, http_client, activity_expanded, auth, rlm, update_desc
+                    )
                 except HTTPStatusError as e:
                     if e.response.status_code == 401:
                         # User not authorized to update activity
@@ -399,8 +424,46 @@ async def std_handle(
 
             print(f"Activity {body.activity_id} processed!")
     elif body.type == "delete":
-        resp = await req_delete.request(DeleteModel(id=body.activity_id, user_id=body.owner_id), timeout=30)
-        resp_parsed = resp.body.decode()
-        assert resp_parsed == "OK"
+        delete_model = DeleteModel(id=body.activity_id, user_id=body.owner_id)
+        if config.colocated_services:
+            await delete_activity(session, delete_model)
+            await session.commit()
+        else:
+            resp = await req_delete.request(delete_model, timeout=30)
+            resp_parsed = resp.body.decode()
+            assert resp_parsed == "OK"
         print(f"Activity {body.activity_id} deleted!")
     await nats_msg.ack()
+
+
+def _pull_options(config: PullConsumerConfig) -> dict[str, ty.Any]:
+    return {
+        "pull_sub": PullSub(batch_size=config.batch_size, timeout=config.max_wait),
+        "max_workers": config.max_workers,
+    }
+
+
+def router_factory(config: ActivityCmdConfig) -> NatsRouter:
+    """
+    Router with activity command consumers, fetching messages in batches processed concurrently as set in `config`.
+    Publishers of this module are included.
+    """
+    cmd_router = NatsRouter()
+    cmd_router.subscriber(
+        config=CONSUMER_ACTIVITY_CMD_BACKLOG,
+        stream=stream,
+        durable=CONSUMER_ACTIVITY_CMD_BACKLOG.durable_name,
+        no_ack=True,
+        dependencies=[rate_limit_budget("low")],
+        **_pull_options(config.backlog),
+    )(backlog_handle)
+    cmd_router.subscriber(
+        config=CONSUMER_ACTIVITY_CMD_STD,
+        stream=stream,
+        durable=CONSUMER_ACTIVITY_CMD_STD.durable_name,
+        no_ack=True,
+        dependencies=[rate_limit_budget("high")],
+        **_pull_options(config.std),
+    )(std_handle)
+    cmd_router.include_router(router)
+    return cmd_router
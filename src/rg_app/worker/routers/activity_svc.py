@@ -1,26 +1,30 @@
+import asyncio
 from typing import Literal
 
-import polyline
+import sqlalchemy as sa
 from faststream.nats import NatsRouter
-from faststream.nats.annotations import NatsBroker
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.exc import NoResultFound
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from rg_app.common.internal.activity_svc import DeleteModel, UpsertModel, UpsertModelIneligible
-from rg_app.common.internal.geo_svc import GeoSvcCheckRequest, GeoSvcCheckResponse
-from rg_app.db.models import Activity, IneligibleActivity
-from rg_app.worker.common import DEFAULT_QUEUE
+from rg_app.common.internal.geo_svc import GeoSvcCheckPolylineBatchRequest, GeoSvcCheckPolylineRequest
+from rg_app.db import user_regions
+from rg_app.db.models import Activity, ActivityDetail, ActivityRegion, IneligibleActivity
+from rg_app.worker.common import DEFAULT_QUEUE, SVC_MAX_WORKERS
 from rg_app.worker.dependencies.db import AsyncSessionDI
+from rg_app.worker.dependencies.geo_batcher import GeoCheckBatcher, GeoCheckBatcherDI
 
 activity_svc_router = NatsRouter("rg.svc.activity.")
 
-req_check = activity_svc_router.publisher("rg.svc.geo.check", schema=GeoSvcCheckRequest)
+req_check = activity_svc_router.publisher("rg.svc.geo.check-polyline", schema=GeoSvcCheckPolylineRequest)
+req_check_batch = activity_svc_router.publisher(
+    "rg.svc.geo.check-polyline-batch", schema=GeoSvcCheckPolylineBatchRequest
+)
 
 
-@activity_svc_router.subscriber("upsert-ineligible", DEFAULT_QUEUE)
-async def upsert_ineligible(
-    body: UpsertModelIneligible,
-    session: AsyncSessionDI,
-) -> Literal["OK"]:
+async def upsert_ineligible_activity(session: AsyncSession, body: UpsertModelIneligible) -> None:
+    """Store an ineligible activity, replacing the activity if it was eligible before. Not committed."""
     try:
         activity = await session.get_one(IneligibleActivity, body.id)
         for k, v in body.model_dump(by_alias=False).items():
@@ -33,35 +37,30 @@ async def upsert_ineligible(
     activity_old = await session.get(Activity, body.id)
     if activity_old is not None:
         await session.delete(activity_old)
-
-    await session.commit()
-    return "OK"
+        await session.flush()
+        await user_regions.refresh(session, activity_old.user_id, user_regions.activity_regions(activity_old))
 
 
-@activity_svc_router.subscriber("upsert", DEFAULT_QUEUE)
-async def upsert(
-    body: UpsertModel,
-    broker: NatsBroker,
-    session: AsyncSessionDI,
-) -> Literal["OK"]:
+async def upsert_activity(session: AsyncSession, geo_batcher: GeoCheckBatcher, body: UpsertModel) -> None:
+    """Store an activity with its visited regions and update region tables of the user. Not committed."""
     try:
         activity = await session.get_one(Activity, body.id)
     except NoResultFound:
         activity = None
+    if activity is None:
+        old_regions, old_start = None, None
+    else:
+        old_regions, old_start = user_regions.activity_regions(activity), activity.start
 
     polyline_str = body.polyline
 
-    geojson_list = polyline.decode(polyline_str, precision=5, geojson=True)
-
-    resp = await broker.request(GeoSvcCheckRequest(coordinates=geojson_list), "rg.svc.geo.check", timeout=30)
-
-    resp_parsed = GeoSvcCheckResponse.model_validate_json(resp.body)
+    resp_parsed = await geo_batcher.check(GeoSvcCheckPolylineRequest(data=polyline_str))
     main_regions = [x.id for x in resp_parsed.items if x.type == "GMI"]
     additional_regions = [x.id for x in resp_parsed.items if x.type != "GMI"]
     dct = body.model_dump(by_alias=False)
     dct.pop("polyline")
+    full_data = dct.pop("full_data")
 
-    dct["track"] = geojson_list
     dct["visited_regions"] = main_regions
     dct["visited_regions_additional"] = additional_regions
 
@@ -73,10 +72,127 @@ async def upsert(
                 setattr(activity, k, v)
     session.add(activity)
 
+    detail = await session.get(ActivityDetail, body.id)
+    if detail is None:
+        detail = ActivityDetail(activity_id=body.id)
+    detail.polyline = polyline_str
+    detail.full_data = full_data
+    session.add(detail)
+
     activity_ineligible = await session.get(IneligibleActivity, body.id)
     if activity_ineligible is not None:
         await session.delete(activity_ineligible)
 
+    await session.flush()
+    if old_regions is None:
+        await user_regions.store_activity_regions(session, activity)
+        await user_regions.add_activity(session, activity)
+    elif old_regions != user_regions.activity_regions(activity) or old_start != activity.start:
+        await user_regions.store_activity_regions(session, activity)
+        await user_regions.refresh(session, activity.user_id, old_regions | user_regions.activity_regions(activity))
+
+
+async def delete_activity(session: AsyncSession, body: DeleteModel) -> None:
+    """Delete an activity and update region tables of the user. Not committed."""
+    activity = await session.get(Activity, body.id)
+    if not activity:
+        return
+    assert activity.user_id == body.user_id
+    await session.delete(activity)
+    await session.flush()
+    await user_regions.refresh(session, activity.user_id, user_regions.activity_regions(activity))
+
+
+async def upsert_activities_bulk(
+    session: AsyncSession,
+    geo_batcher: GeoCheckBatcher,
+    activities: list[UpsertModel],
+    ineligible: list[UpsertModelIneligible],
+) -> None:
+    """
+    Store a page of activities of a single user at once, e.g. from a backlog import.
+    Geo checks are sent together, activities, details and ineligible activities are written
+    with one multi-row upsert each and regions of the user are recomputed once. Not committed.
+    """
+    eligible_by_id = {body.id: body for body in activities}
+    ineligible_by_id = {body.id: body for body in ineligible if body.id not in eligible_by_id}
+    user_ids = {body.user_id for body in eligible_by_id.values()} | {body.user_id for body in ineligible_by_id.values()}
+    if not user_ids:
+        return
+    assert len(user_ids) == 1, "Bulk upsert of activities of many users"
+    user_id = user_ids.pop()
+    eligible_ids, ineligible_ids = list(eligible_by_id), list(ineligible_by_id)
+
+    # regions of stored activities may be no longer visited
+    result = await session.execute(
+        sa.select(ActivityRegion.region_id)
+        .where(ActivityRegion.activity_id.in_(eligible_ids + ineligible_ids))
+        .distinct()
+    )
+    affected_regions = set(result.scalars())
+
+    if eligible_by_id:
+        responses = await asyncio.gather(
+            *(geo_batcher.check(GeoSvcCheckPolylineRequest(data=body.polyline)) for body in eligible_by_id.values())
+        )
+        rows, detail_rows = [], []
+        for body, resp_parsed in zip(eligible_by_id.values(), responses):
+            dct = body.model_dump(by_alias=False)
+            detail_rows.append(
+                {"activity_id": body.id, "polyline": dct.pop("polyline"), "full_data": dct.pop("full_data")}
+            )
+            dct["visited_regions"] = [x.id for x in resp_parsed.items if x.type == "GMI"]
+            dct["visited_regions_additional"] = [x.id for x in resp_parsed.items if x.type != "GMI"]
+            rows.append(dct)
+
+        stmt = insert(Activity).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Activity.id], set_={k: stmt.excluded[k] for k in rows[0] if k != "id"}
+        )
+        await session.execute(stmt)
+        detail_stmt = insert(ActivityDetail).values(detail_rows)
+        detail_stmt = detail_stmt.on_conflict_do_update(
+            index_elements=[ActivityDetail.activity_id],
+            set_={"polyline": detail_stmt.excluded.polyline, "full_data": detail_stmt.excluded.full_data},
+        )
+        await session.execute(detail_stmt)
+        await session.execute(sa.delete(IneligibleActivity).where(IneligibleActivity.id.in_(eligible_ids)))
+
+        stored = [Activity(**row) for row in rows]
+        await user_regions.store_activity_regions_bulk(session, stored)
+        for activity in stored:
+            affected_regions |= user_regions.activity_regions(activity)
+
+    if ineligible_by_id:
+        # details and activity regions are removed by foreign key cascades
+        await session.execute(sa.delete(Activity).where(Activity.id.in_(ineligible_ids)))
+        ineligible_rows = [body.model_dump(by_alias=False) for body in ineligible_by_id.values()]
+        stmt = insert(IneligibleActivity).values(ineligible_rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[IneligibleActivity.id], set_={k: stmt.excluded[k] for k in ineligible_rows[0] if k != "id"}
+        )
+        await session.execute(stmt)
+
+    await user_regions.refresh(session, user_id, affected_regions)
+
+
+@activity_svc_router.subscriber("upsert-ineligible", DEFAULT_QUEUE)
+async def upsert_ineligible(
+    body: UpsertModelIneligible,
+    session: AsyncSessionDI,
+) -> Literal["OK"]:
+    await upsert_ineligible_activity(session, body)
+    await session.commit()
+    return "OK"
+
+
+@activity_svc_router.subscriber("upsert", DEFAULT_QUEUE, max_workers=SVC_MAX_WORKERS)
+async def upsert(
+    body: UpsertModel,
+    geo_batcher: GeoCheckBatcherDI,
+    session: AsyncSessionDI,
+) -> Literal["OK"]:
+    await upsert_activity(session, geo_batcher, body)
     await session.commit()
     return "OK"
 
@@ -86,10 +202,6 @@ async def delete(
     body: DeleteModel,
     session: AsyncSessionDI,
 ) -> Literal["OK"]:
-    activity = await session.get(Activity, body.id)
-    if not activity:
-        return "OK"
-    assert activity.user_id == body.user_id
-    await session.delete(activity)
+    await delete_activity(session, body)
     await session.commit()
     return "OK"
@@ -1,22 +1,22 @@
-import asyncio
-import json
-
-import duckdb
-import geojson
-import polyline
 from faststream import Depends
 from faststream.nats import NatsRouter
 from opentelemetry import trace
 
 from rg_app.common.faststream.otel import tracer_fn
+from rg_app.common.geo import track_geometry
 from rg_app.common.internal.geo_svc import (
+    GeoSvcCheckBatchRequest,
+    GeoSvcCheckBatchResponse,
+    GeoSvcCheckPolylineBatchRequest,
     GeoSvcCheckPolylineRequest,
     GeoSvcCheckRequest,
     GeoSvcCheckResponse,
-    GeoSvcCheckResponseItem,
 )
 from rg_app.worker.common import DEFAULT_QUEUE
-from rg_app.worker.dependencies.duckdb import DuckDBConnDI
+from rg_app.worker.config import ConfigDI
+from rg_app.worker.dependencies.duckdb import DuckDBPoolDI
+from rg_app.worker.dependencies.geo_index import BorderIndexDI
+from rg_app.worker.geo_check import check_track, check_tracks, decode_track
 
 geo_svc_router = NatsRouter("rg.svc.geo.")
 
@@ -29,59 +29,46 @@ async def ping() -> str:
 @geo_svc_router.subscriber("check-polyline", DEFAULT_QUEUE)
 async def check_polyline(
     body: GeoSvcCheckPolylineRequest,
-    conn: DuckDBConnDI,
+    pool: DuckDBPoolDI,
+    index: BorderIndexDI,
+    config: ConfigDI,
     tracer: trace.Tracer = Depends(tracer_fn),
 ) -> GeoSvcCheckResponse:
-    geojson_list = polyline.decode(body.data, precision=5, geojson=True)
-    line_string = geojson.LineString(geojson_list)
-    return await _check(line_string, conn, tracer)
+    track = decode_track(body.data)
+    return await check_track(track, pool, index, config.geo, tracer)
+
+
+@geo_svc_router.subscriber("check-polyline-batch", DEFAULT_QUEUE)
+async def check_polyline_batch(
+    body: GeoSvcCheckPolylineBatchRequest,
+    pool: DuckDBPoolDI,
+    index: BorderIndexDI,
+    config: ConfigDI,
+    tracer: trace.Tracer = Depends(tracer_fn),
+) -> GeoSvcCheckBatchResponse:
+    tracks = [decode_track(item.data) for item in body.items]
+    return await check_tracks(tracks, pool, index, config.geo, tracer)
 
 
 @geo_svc_router.subscriber("check", DEFAULT_QUEUE)
 async def check(
     body: GeoSvcCheckRequest,
-    conn: DuckDBConnDI,
+    pool: DuckDBPoolDI,
+    index: BorderIndexDI,
+    config: ConfigDI,
     tracer: trace.Tracer = Depends(tracer_fn),
 ) -> GeoSvcCheckResponse:
-    line_string = geojson.LineString(body.coordinates)
-    return await _check(line_string, conn, tracer)
-
-
-def run_query(conn: duckdb.DuckDBPyConnection, geojson: str) -> list[tuple[str, str]]:
-    return conn.execute(
-        """
-        WITH shp as (
-            SELECT ST_GeomFromGeoJSON(?) as geom
-        )
-        SELECT borders.ID, borders.type
-        FROM borders
-        INNER JOIN shp ON ST_Intersects(shape, geom)
-        """,
-        [geojson],
-    ).fetchall()
+    track = track_geometry(body.coordinates)
+    return await check_track(track, pool, index, config.geo, tracer)
 
 
-async def _aio_run_query(conn: duckdb.DuckDBPyConnection, geojson: str):
-    loop = asyncio.get_running_loop()
-    return await loop.run_in_executor(None, run_query, conn, geojson)
-
-
-async def _check(
-    line_string: geojson.LineString,
-    conn: duckdb.DuckDBPyConnection,
-    tracer: trace.Tracer,
-) -> GeoSvcCheckResponse:
-    span = trace.get_current_span()
-    try:
-        with tracer.start_as_current_span("geo_svc_check") as span:
-            result = await _aio_run_query(conn, json.dumps(line_string))
-            span.set_attribute("result_count", len(result))
-            span.set_status(trace.Status(trace.StatusCode.OK))
-    except duckdb.Error as e:
-        span.record_exception(e)
-        span.set_status(trace.Status(trace.StatusCode.ERROR, str(e)))
-        result = []
-    resp = GeoSvcCheckResponse(items=[GeoSvcCheckResponseItem(id=row[0], type=row[1]) for row in result])  # type: ignore
-    trace.get_current_span().set_status(trace.Status(trace.StatusCode.OK))
-
-    return resp
+@geo_svc_router.subscriber("check-batch", DEFAULT_QUEUE)
+async def check_batch(
+    body: GeoSvcCheckBatchRequest,
+    pool: DuckDBPoolDI,
+    index: BorderIndexDI,
+    config: ConfigDI,
+    tracer: trace.Tracer = Depends(tracer_fn),
+) -> GeoSvcCheckBatchResponse:
+    tracks = [track_geometry(item.coordinates) for item in body.items]
+    return await check_tracks(tracks, pool, index, config.geo, tracer)
@@ -0,0 +1,26 @@
+from logging import Logger
+
+from faststream import Depends
+from faststream.nats import NatsRouter
+
+from rg_app.common.faststream.otel import otel_logger
+from rg_app.common.msg.regions import RegionsReloadMsg
+from rg_app.nats_defs.subjects import INTERNAL_REGIONS_RELOAD_SUBJECT
+from rg_app.worker.dependencies.db import AsyncSessionDI
+from rg_app.worker.dependencies.region_catalog import RegionCatalogDI
+
+regions_router = NatsRouter()
+
+
+# no queue group, every worker keeps its own catalog
+@regions_router.subscriber(INTERNAL_REGIONS_RELOAD_SUBJECT)
+async def reload_catalog(
+    body: RegionsReloadMsg,
+    catalog: RegionCatalogDI,
+    session: AsyncSessionDI,
+    logger: Logger = Depends(otel_logger),
+) -> None:
+    if body.version is not None and body.version == catalog.version:
+        return
+    if await catalog.reload(session):
+        logger.info(f"Region catalog reloaded, version {catalog.version}, {len(catalog)} regions")
@@ -5,13 +5,13 @@ from faststream import Depends
 from faststream.nats import NatsRouter
 from faststream.nats.annotations import NatsBroker
 from httpx import HTTPStatusError
-from sqlalchemy import text
+from sqlalchemy import select
 
 from rg_app.common.faststream.otel import otel_logger
 from rg_app.common.internal.common import BasicResponse
 from rg_app.common.internal.user_svc import AccountDeleteRequest, UnlockedRequest
 from rg_app.common.strava.user import deauthorize
-from rg_app.db.models.models import User
+from rg_app.db.models.models import User, UserRegion
 from rg_app.nats_defs.local import STREAM_ACTIVITY_CMD
 from rg_app.worker.common import DEFAULT_QUEUE
 from rg_app.worker.dependencies.db import AsyncSessionDI
@@ -26,17 +26,12 @@ async def user_unlocked(
     body: UnlockedRequest,
     session: AsyncSessionDI,
 ) -> list[str]:
-    query = text(
-        """
-        SELECT 
-        JSONB_AGG(DISTINCT element) as unique_regions
-        FROM activity,
-        JSONB_ARRAY_ELEMENTS(visited_regions) as element
-        where user_id = :uid;
-        """
+    query = select(UserRegion.region_id).where(
+        UserRegion.user_id == body.user_id,
+        UserRegion.additional.is_(False),
     )
-    result = await session.execute(query, {"uid": body.user_id})
-    return result.scalar_one()
+    result = await session.execute(query)
+    return list(result.scalars())
 
 
 @user_svc_router.subscriber("delete-account", DEFAULT_QUEUE)
@@ -0,0 +1,133 @@
+import asyncio
+from datetime import UTC, datetime
+
+import pytest
+
+from rg_app.common.strava.rate_limits import (
+    RateLimit,
+    RateLimitBudget,
+    RateLimitDeferred,
+    RateLimitManager,
+    RateLimitSet,
+    _counted,
+    _current_usage,
+    _merged,
+    reservation_wait,
+)
+
+
+def _limits(
+    updated_at: datetime, read_15m: int = 0, read_daily: int = 0, any_15m: int = 0, any_daily: int = 0
+) -> RateLimitSet:
+    return RateLimitSet(
+        read_15m=RateLimit(usage=read_15m, limit=100),
+        read_daily=RateLimit(usage=read_daily, limit=1000),
+        any_15m=RateLimit(usage=any_15m, limit=200),
+        any_daily=RateLimit(usage=any_daily, limit=2000),
+        updated_at=updated_at,
+    )
+
+
+BUDGET = RateLimitBudget()
+# 5 minutes into a quarter-hour window, 12 hours into the day
+NOW = datetime(2024, 5, 1, 12, 5, tzinfo=UTC)
+
+
+@pytest.mark.parametrize("priority", ["high", "low"])
+def test_empty_budget_does_not_wait(priority):
+    assert reservation_wait(_limits(NOW), NOW, True, priority, BUDGET) == 0
+
+
+def test_exhausted_15m_window_waits_until_reset():
+    limits = _limits(NOW, read_15m=95, read_daily=95, any_15m=95, any_daily=95)
+    assert reservation_wait(limits, NOW, True, "high", BUDGET) == pytest.approx(10 * 60)
+
+
+def test_write_requests_ignore_read_limits():
+    limits = _limits(NOW, read_15m=100, read_daily=100, any_15m=100, any_daily=100)
+    assert reservation_wait(limits, NOW, False, "high", BUDGET) == 0
+
+
+def test_low_priority_keeps_share_for_high_priority():
+    # 100 * 0.95 * 0.8 = 76 read requests per 15 minutes for low priority, 95 for high priority
+    limits = _limits(NOW, read_15m=76, read_daily=76, any_15m=76, any_daily=76)
+    assert reservation_wait(limits, NOW, True, "high", BUDGET) == 0
+    assert reservation_wait(limits, NOW, True, "low", BUDGET) == pytest.approx(10 * 60)
+
+
+def test_low_priority_paced_through_15m_window():
+    # 76 * 5 / 15 + 10 burst = 35.3 requests are due 5 minutes into the window
+    limits = _limits(NOW, read_15m=35, read_daily=35, any_15m=35, any_daily=35)
+    assert reservation_wait(limits, NOW, True, "low", BUDGET) == pytest.approx((36 - 10) * 900 / 76 - 300)
+    limits = _limits(NOW, read_15m=30, read_daily=30, any_15m=30, any_daily=30)
+    assert reservation_wait(limits, NOW, True, "low", BUDGET) == 0
+
+
+def test_low_priority_paced_through_daily_window():
+    # start of a quarter-hour, so the 15 minute window only allows the burst, which is not used yet;
+    # 760 * 6 / 24 + 10 burst = 200 daily read requests are due 6 hours into the day
+    now = datetime(2024, 5, 1, 6, 0, tzinfo=UTC)
+    limits = _limits(now, read_daily=200, any_daily=200)
+    assert reservation_wait(limits, now, True, "low", BUDGET) == pytest.approx((201 - 10) * 86400 / 760 - 6 * 3600)
+    assert reservation_wait(limits, now, True, "high", BUDGET) == 0
+    assert reservation_wait(_limits(now, read_daily=199, any_daily=199), now, True, "low", BUDGET) == 0
+
+
+def test_usage_kept_within_windows():
+    limits = _limits(datetime(2024, 5, 1, 12, 0, tzinfo=UTC), read_15m=5, read_daily=50)
+    current = _current_usage(limits, datetime(2024, 5, 1, 12, 14, 59, tzinfo=UTC))
+    assert (current.read_15m.usage, current.read_daily.usage) == (5, 50)
+
+
+def test_usage_reset_at_quarter_hour():
+    limits = _limits(datetime(2024, 5, 1, 12, 14, 59, tzinfo=UTC), read_15m=5, read_daily=50, any_15m=6)
+    current = _current_usage(limits, datetime(2024, 5, 1, 12, 15, tzinfo=UTC))
+    assert (current.read_15m.usage, current.any_15m.usage) == (0, 0)
+    assert current.read_daily.usage == 50
+
+
+def test_usage_reset_at_utc_day():
+    limits = _limits(datetime(2024, 5, 1, 23, 59, 59, tzinfo=UTC), read_15m=5, read_daily=50, any_daily=60)
+    current = _current_usage(limits, datetime(2024, 5, 2, tzinfo=UTC))
+    assert (current.read_15m.usage, current.read_daily.usage, current.any_daily.usage) == (0, 0, 0)
+
+
+def test_counted_read_and_write():
+    limits = _counted(_counted(_limits(NOW), True), False)
+    assert (limits.read_15m.usage, limits.read_daily.usage) == (1, 1)
+    assert (limits.any_15m.usage, limits.any_daily.usage) == (2, 2)
+
+
+def test_merged_raises_usage_to_reported():
+    state = _limits(NOW, read_15m=10, read_daily=30)
+    observed = RateLimitSet(
+        read_15m=RateLimit(usage=20, limit=300),
+        read_daily=RateLimit(usage=25, limit=3000),
+        any_15m=RateLimit(usage=0, limit=600),
+        any_daily=RateLimit(usage=0, limit=30000),
+        updated_at=NOW,
+    )
+    merged = _merged(state, observed, NOW)
+    assert merged.read_15m == RateLimit(usage=20, limit=300)
+    assert merged.read_daily == RateLimit(usage=30, limit=3000)
+
+
+def test_merged_ignores_usage_of_past_windows():
+    observed = _limits(datetime(2024, 5, 1, 11, 59, tzinfo=UTC), read_15m=90)
+    assert _merged(_limits(NOW), observed, NOW).read_15m.usage == 0
+
+
+def test_reserve_without_nats():
+    async def reserve():
+        rlm = RateLimitManager(budget=RateLimitBudget(max_wait=0))
+        await rlm.reserve()
+        await rlm.reserve(read=False)
+        state = rlm._local_state
+        assert state is not None
+        assert (state.read_15m.usage, state.any_15m.usage) == (1, 2)
+        # daily budget used up, the wait until the next UTC day exceeds max_wait
+        rlm._local_state = _limits(datetime.now(UTC), read_daily=1000)
+        with pytest.raises(RateLimitDeferred):
+            await rlm.reserve()
+
+    asyncio.run(reserve())
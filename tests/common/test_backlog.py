@@ -0,0 +1,53 @@
+from datetime import UTC, datetime, timedelta
+
+from rg_app.common.backlog import MAX_WINDOWS, MIN_WINDOW, adaptive_windows, split_period
+
+START = datetime(2024, 1, 1, tzinfo=UTC)
+
+
+def _contiguous(windows: list[tuple[datetime, datetime]], period_from: datetime, period_to: datetime) -> bool:
+    bounds_match = all(a[1] == b[0] for a, b in zip(windows, windows[1:]))
+    return bounds_match and windows[0][0] == period_from and windows[-1][1] == period_to
+
+
+def test_split_period():
+    end = START + timedelta(days=75)
+    windows = split_period(START, end, timedelta(days=30))
+    assert len(windows) == 3
+    assert _contiguous(windows, START, end)
+    assert windows[-1][1] - windows[-1][0] == timedelta(days=15)
+
+
+def test_split_empty_period():
+    assert split_period(START, START, timedelta(days=30)) == []
+    assert split_period(START, START - timedelta(days=1), timedelta(days=30)) == []
+
+
+def test_adaptive_windows_sized_from_density():
+    # 200 activities in the first 10 days, a page holds 200, windows are sized for 80% of it
+    cursor = START + timedelta(days=10)
+    end = START + timedelta(days=90)
+    windows = adaptive_windows(START, cursor, end, 200, page_size=200)
+    assert _contiguous(windows, cursor, end)
+    assert len(windows) == 10
+    assert all(window_to - window_from == timedelta(days=8) for window_from, window_to in windows)
+
+
+def test_adaptive_windows_capped():
+    cursor = START + timedelta(hours=1)
+    end = START + timedelta(days=3650)
+    windows = adaptive_windows(START, cursor, end, 200, page_size=200)
+    assert len(windows) == MAX_WINDOWS
+    assert _contiguous(windows, cursor, end)
+
+
+def test_adaptive_windows_short_rest():
+    cursor = START + timedelta(days=10)
+    assert adaptive_windows(START, cursor, cursor + MIN_WINDOW / 2, 200) == []
+
+
+def test_adaptive_windows_sparse():
+    # a few activities over a long time fit a single window
+    cursor = START + timedelta(days=100)
+    end = START + timedelta(days=200)
+    assert adaptive_windows(START, cursor, end, 1, page_size=200) == [(cursor, end)]